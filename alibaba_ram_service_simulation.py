@@ -1,169 +1,413 @@
-import random
-import string
-import time
-from datetime import datetime, timedelta
-from aliyunsdkcore.client import AcsClient
-from aliyunsdkram.request.v20150501.CreateUserRequest import CreateUserRequest
-from aliyunsdkram.request.v20150501.CreateAccessKeyRequest import CreateAccessKeyRequest
-from aliyunsdkram.request.v20150501.AttachPolicyToUserRequest import AttachPolicyToUserRequest
-from aliyunsdkram.request.v20150501.DeleteUserRequest import DeleteUserRequest
-from aliyunsdkram.request.v20150501.DeleteAccessKeyRequest import DeleteAccessKeyRequest
-
-# Configuration
-ACCESS_KEY_ID = "your-access-key-id"
-ACCESS_KEY_SECRET = "your-access-key-secret"
-REGION_ID = "cn-hangzhou"  # Change to your desired region
-
-# Supported Alibaba Cloud Services
-SUPPORTED_SERVICES = [
-    "Elastic Compute Service (ECS)", "Object Storage Service (OSS)",
-    "ApsaraDB RDS", "Alibaba Cloud Function Compute",
-    "Alibaba Cloud Monitoring", "Alibaba Cloud VPC",
-    "Alibaba Cloud CDN", "Alibaba Cloud Message Queue"
-]
-
-# Initialize Alibaba Cloud client
-client = AcsClient(ACCESS_KEY_ID, ACCESS_KEY_SECRET, REGION_ID)
-
-
-def generate_password():
-    """Generate a random password for RAM users."""
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(random.choice(characters) for _ in range(12))
-
-
-def create_ram_user(user_name):
-    """Create a RAM user and generate access keys."""
-    try:
-        # Create RAM user
-        request = CreateUserRequest()
-        request.set_UserName(user_name)
-        request.set_DisplayName(user_name)
-        response = client.do_action_with_exception(request)
-        print(f"Created RAM user: {user_name}")
-
-        # Create Access Key
-        access_key_request = CreateAccessKeyRequest()
-        access_key_request.set_UserName(user_name)
-        access_key_response = client.do_action_with_exception(access_key_request)
-        access_key_data = eval(access_key_response)  # Convert byte response to dict
-
-        return {
-            "UserName": user_name,
-            "AccessKeyId": access_key_data["AccessKey"]["AccessKeyId"],
-            "AccessKeySecret": access_key_data["AccessKey"]["AccessKeySecret"]
-        }
-    except Exception as e:
-        print(f"Error creating RAM user {user_name}: {e}")
-        return None
-
-
-def assign_policy_to_user(user_name, policy_name="AliyunFullAccess"):
-    """Assign a policy to a RAM user."""
-    try:
-        request = AttachPolicyToUserRequest()
-        request.set_PolicyType("System")  # Use "System" for Alibaba Cloud predefined policies
-        request.set_PolicyName(policy_name)
-        request.set_UserName(user_name)
-        client.do_action_with_exception(request)
-        print(f"Assigned policy {policy_name} to user {user_name}.")
-    except Exception as e:
-        print(f"Error assigning policy to user {user_name}: {e}")
-
-
-def deploy_service(service_name, user_name):
-    """Simulate the deployment of Alibaba Cloud services."""
-    print(f"Deploying {service_name} for user {user_name}...")
-    if service_name == "Elastic Compute Service (ECS)":
-        print(f"Simulated ECS instance deployment for user {user_name}.")
-    elif service_name == "Object Storage Service (OSS)":
-        bucket_name = f"user-{user_name}-bucket-{random.randint(1000, 9999)}"
-        print(f"Simulated OSS bucket creation: {bucket_name}.")
-    else:
-        print(f"{service_name} deployment simulation completed.")
-
-
-def delete_ram_user(user_name):
-    """Delete a RAM user and associated access keys."""
-    try:
-        # Delete Access Key
-        access_key_request = DeleteAccessKeyRequest()
-        access_key_request.set_UserName(user_name)
-        client.do_action_with_exception(access_key_request)
-
-        # Delete User
-        delete_user_request = DeleteUserRequest()
-        delete_user_request.set_UserName(user_name)
-        client.do_action_with_exception(delete_user_request)
-
-        print(f"Deleted RAM user: {user_name}")
-    except Exception as e:
-        print(f"Error deleting RAM user {user_name}: {e}")
-
-
-def display_ram_user_details(users):
-    """Display RAM user credentials."""
-    print("\nRAM User Details:")
-    print("=" * 50)
-    for user in users:
-        print(f"User Name: {user['UserName']}")
-        print(f"Access Key ID: {user['AccessKeyId']}")
-        print(f"Access Key Secret: {user['AccessKeySecret']}")
-        print("=" * 50)
-
-
-def main():
-    print("Supported Alibaba Cloud Services:")
-    for idx, service in enumerate(SUPPORTED_SERVICES, start=1):
-        print(f"{idx}. {service}")
-    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
-    services_input = input("Services: ").strip()
-    
-    try:
-        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
-        selected_services = [SUPPORTED_SERVICES[i] for i in selected_indices if 0 <= i < len(SUPPORTED_SERVICES)]
-    except ValueError:
-        print("Invalid input. Please enter valid service numbers.")
-        return
-    
-    if not selected_services:
-        print("No services selected. Exiting.")
-        return
-
-    ram_user_count = int(input("Enter the number of RAM users to create: "))
-    duration_days = int(input("Enter the number of days to run services: "))
-    duration_hours = int(input("Enter the number of hours to run services: "))
-
-    users = []
-    for i in range(ram_user_count):
-        user_name = f"user-{i+1}"
-        credentials = create_ram_user(user_name)
-        if credentials:
-            assign_policy_to_user(user_name)
-            users.append(credentials)
-
-    # Display RAM user details
-    display_ram_user_details(users)
-
-    # Deploy services for each RAM user
-    for user in users:
-        for service in selected_services:
-            deploy_service(service, user["UserName"])
-
-    # Simulate resource lifecycle
-    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
-    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    while datetime.now() < end_time:
-        time.sleep(10)  # Simulating active resources
-
-    print("\nTime's up! Cleaning up RAM users...")
-
-    # Delete RAM users
-    for user in users:
-        delete_ram_user(user["UserName"])
-
-    print("\nCleanup completed.")
-
-if __name__ == "__main__":
-    main()
+import json
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cloud_provider import CloudProvider, lazy_client, load_service_catalog, run_cli
+from credential_generator import unique_name
+from credential_export import MAX_DISPLAYED_USERS, print_truncation_note, redact
+from provisioning_journal import (
+    ProvisioningJournal, roll_back_attempts, teardown_resource, teardown_resources, undo_steps
+)
+from rate_limiter import ConcurrencyGovernor, TokenBucket, get_error_code, is_throttling_error
+
+# Configuration
+ACCESS_KEY_ID = "your-access-key-id"
+ACCESS_KEY_SECRET = "your-access-key-secret"
+REGION_ID = "cn-hangzhou"  # Change to your desired region
+
+# Supported Alibaba Cloud Services
+SUPPORTED_SERVICES = load_service_catalog("alibaba")
+
+# Request rate shared by every thread; keep it under the account's RAM QPS quota
+RAM_QPS_LIMIT = 20
+MAX_THROTTLE_RETRIES = 5
+MAX_PIPELINE_WORKERS = 8
+DEFAULT_POLICY_NAME = "AliyunFullAccess"
+LIST_PAGE_SIZE = 1000  # Largest page ListUsers returns
+
+# Typed views of the RAM responses we use
+RamUser = namedtuple("RamUser", ["user_id", "user_name", "display_name"])
+AccessKey = namedtuple("AccessKey", ["access_key_id", "access_key_secret", "status"])
+
+
+class RamApiError(Exception):
+    """A failed RAM call, classified as throttling or permanent."""
+
+    def __init__(self, action, error):
+        self.action = action
+        self.code = get_error_code(error)
+        self.kind = classify_error(error)
+        super().__init__(f"{action} failed ({self.kind}): {error}")
+
+
+ram_rate_limiter = TokenBucket(RAM_QPS_LIMIT)
+# The QPS quota caps the request rate; the governor adapts concurrency to what RAM sustains
+ram_governor = ConcurrencyGovernor(max_retries=MAX_THROTTLE_RETRIES)
+
+# Every completed RAM step is journaled so teardown can undo exactly what exists
+provisioning_journal = ProvisioningJournal("provisioning_journal_alibaba.jsonl")
+
+# Alibaba Cloud client (created on first use)
+@lazy_client
+def get_acs_client():
+    """Return the process-wide Alibaba Cloud client."""
+    from aliyunsdkcore.client import AcsClient
+    return AcsClient(ACCESS_KEY_ID, ACCESS_KEY_SECRET, REGION_ID)
+
+
+def classify_error(error):
+    """Classify an SDK exception as "throttling" (worth retrying later) or "permanent"."""
+    if isinstance(error, RamApiError):
+        return error.kind
+    return "throttling" if is_throttling_error(error) else "permanent"
+
+
+def decode_response(raw):
+    """Decode a raw RAM response body with json.loads, which accepts bytes: no eval, no explicit .decode()."""
+    return json.loads(raw)
+
+
+def call_ram(request):
+    """Send a RAM request and return its decoded JSON body, raising RamApiError on failure.
+
+    Every call takes a token from the shared rate limiter and runs in a
+    ram_governor slot; throttled calls are retried with jittered
+    exponential backoff.
+    """
+    def send():
+        ram_rate_limiter.acquire()
+        return decode_response(get_acs_client().do_action_with_exception(request))
+
+    try:
+        return ram_governor.call(send)
+    except Exception as e:
+        raise RamApiError(request.get_action_name(), e) from e
+
+
+def parse_user(body):
+    """Build a RamUser from a CreateUser/GetUser response body."""
+    user = body["User"]
+    return RamUser(user["UserId"], user["UserName"], user.get("DisplayName"))
+
+
+def parse_access_key(body):
+    """Build an AccessKey from a CreateAccessKey response body."""
+    access_key = body["AccessKey"]
+    return AccessKey(access_key["AccessKeyId"], access_key["AccessKeySecret"], access_key.get("Status"))
+
+
+def create_ram_account(user_name):
+    """Create a RAM user without credentials and return it as a RamUser."""
+    from aliyunsdkram.request.v20150501.CreateUserRequest import CreateUserRequest
+
+    try:
+        request = CreateUserRequest()
+        request.set_UserName(user_name)
+        request.set_DisplayName(user_name)
+        user = parse_user(call_ram(request))
+        provisioning_journal.record(user_name, "user")
+        print(f"Created RAM user: {user.user_name}")
+        return user
+    except Exception as e:
+        print(f"Error creating RAM user {user_name}: {e}")
+        return None
+
+
+def create_access_key(user_name):
+    """Create an access key for a RAM user and return it as an AccessKey."""
+    from aliyunsdkram.request.v20150501.CreateAccessKeyRequest import CreateAccessKeyRequest
+
+    try:
+        access_key_request = CreateAccessKeyRequest()
+        access_key_request.set_UserName(user_name)
+        access_key = parse_access_key(call_ram(access_key_request))
+        provisioning_journal.record(user_name, "access_key", AccessKeyId=access_key.access_key_id)
+        return access_key
+    except Exception as e:
+        print(f"Error creating access key for RAM user {user_name}: {e}")
+        return None
+
+
+def create_ram_user(user_name):
+    """Create a RAM user and generate access keys, rolling the user back if the key fails."""
+    user = create_ram_account(user_name)
+    if not user:
+        return None
+    access_key = create_access_key(user_name)
+    if not access_key:
+        # Only the user this call created; a name that already existed never got this far
+        undo_steps(provisioning_journal, user_name, [("user", {})], RAM_UNDO_ACTIONS)
+        return None
+    return {
+        "UserName": user.user_name,
+        "AccessKeyId": access_key.access_key_id,
+        "AccessKeySecret": access_key.access_key_secret
+    }
+
+
+def assign_policy_to_user(user_name, policy_name=DEFAULT_POLICY_NAME):
+    """Assign a policy to a RAM user and return True on success."""
+    from aliyunsdkram.request.v20150501.AttachPolicyToUserRequest import AttachPolicyToUserRequest
+
+    try:
+        request = AttachPolicyToUserRequest()
+        request.set_PolicyType("System")  # Use "System" for Alibaba Cloud predefined policies
+        request.set_PolicyName(policy_name)
+        request.set_UserName(user_name)
+        call_ram(request)
+        provisioning_journal.record(user_name, "policy", PolicyName=policy_name)
+        print(f"Assigned policy {policy_name} to user {user_name}.")
+        return True
+    except Exception as e:
+        print(f"Error assigning policy to user {user_name}: {e}")
+        return False
+
+
+def provision_ram_users_pipelined(user_names, policy_name=DEFAULT_POLICY_NAME,
+                                  max_workers=MAX_PIPELINE_WORKERS, on_created=None):
+    """Provision RAM users with the create and grant stages overlapping across users.
+
+    Stage one creates users. As soon as a user exists, its access key and
+    policy attachment are handed to stage two, so user N+1 is being created
+    while user N gets its key and policy. Returns {user_name: credentials},
+    with None for users that failed at any stage; the steps this call
+    completed for them are rolled back, and users whose creation failed
+    (an existing name, say) are left alone. `on_created` is called with
+    each user's credentials as soon as both grants are in place.
+    """
+    results = {}
+    rollbacks = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as create_pool, \
+            ThreadPoolExecutor(max_workers=max_workers) as grant_pool:
+        created = {create_pool.submit(create_ram_account, name): name for name in user_names}
+        grants = {}
+        for future in as_completed(created):
+            user_name = created[future]
+            if future.result() is None:
+                results[user_name] = None
+                continue
+            grants[user_name] = (
+                grant_pool.submit(create_access_key, user_name),
+                grant_pool.submit(assign_policy_to_user, user_name, policy_name),
+            )
+        for user_name, (key_future, policy_future) in grants.items():
+            access_key = key_future.result()
+            attached = policy_future.result()
+            results[user_name] = {
+                "UserName": user_name,
+                "AccessKeyId": access_key.access_key_id,
+                "AccessKeySecret": access_key.access_key_secret
+            } if access_key and attached else None
+            if results[user_name] is None:
+                steps = [("user", {})]
+                if access_key:
+                    steps.append(("access_key", {"AccessKeyId": access_key.access_key_id}))
+                if attached:
+                    steps.append(("policy", {"PolicyName": policy_name}))
+                rollbacks[user_name] = steps
+            elif on_created:
+                on_created(results[user_name])
+    if rollbacks:
+        roll_back_attempts(provisioning_journal, rollbacks, RAM_UNDO_ACTIONS, max_workers)
+    return results
+
+
+def deploy_service(service_name, user_name):
+    """Simulate the deployment of Alibaba Cloud services."""
+    print(f"Deploying {service_name} for user {user_name}...")
+    if service_name == "Elastic Compute Service (ECS)":
+        print(f"Simulated ECS instance deployment for user {user_name}.")
+    elif service_name == "Object Storage Service (OSS)":
+        bucket_name = unique_name(f"user-{user_name}-bucket")
+        print(f"Simulated OSS bucket creation: {bucket_name}.")
+        return bucket_name
+    else:
+        print(f"{service_name} deployment simulation completed.")
+
+
+def ignore_missing(request):
+    """Send a RAM delete request, treating an already-deleted entity as success."""
+    try:
+        call_ram(request)
+    except RamApiError as e:
+        if not (e.code or "").startswith("EntityNotExist"):
+            raise
+
+
+def undo_access_key(user_name, details):
+    """Delete a journaled access key."""
+    from aliyunsdkram.request.v20150501.DeleteAccessKeyRequest import DeleteAccessKeyRequest
+
+    request = DeleteAccessKeyRequest()
+    request.set_UserName(user_name)
+    request.set_UserAccessKeyId(details["AccessKeyId"])
+    ignore_missing(request)
+
+
+def undo_policy(user_name, details):
+    """Detach a journaled system policy; RAM refuses to delete users that still have one."""
+    from aliyunsdkram.request.v20150501.DetachPolicyFromUserRequest import DetachPolicyFromUserRequest
+
+    request = DetachPolicyFromUserRequest()
+    request.set_PolicyType(details.get("PolicyType", "System"))
+    request.set_PolicyName(details["PolicyName"])
+    request.set_UserName(user_name)
+    ignore_missing(request)
+
+
+def undo_user(user_name, details):
+    """Delete a journaled RAM user."""
+    from aliyunsdkram.request.v20150501.DeleteUserRequest import DeleteUserRequest
+
+    request = DeleteUserRequest()
+    request.set_UserName(user_name)
+    ignore_missing(request)
+
+
+# How to undo each journaled provisioning step
+RAM_UNDO_ACTIONS = {
+    "user": undo_user,
+    "access_key": undo_access_key,
+    "policy": undo_policy,
+}
+
+
+def ram_user_steps(user, policy_name=DEFAULT_POLICY_NAME):
+    """Return the provisioning steps of a RAM user missing from the journal."""
+    steps = [("user", {})]
+    access_key_ids = user.get("AccessKeyIds") or ([user["AccessKeyId"]] if user.get("AccessKeyId") else [])
+    for access_key_id in access_key_ids:
+        steps.append(("access_key", {"AccessKeyId": access_key_id}))
+    default_policies = [{"PolicyName": policy_name}] if policy_name else []
+    for policy in user.get("Policies", default_policies):
+        steps.append(("policy", policy))
+    return steps
+
+
+def iter_ram_user_names():
+    """Yield the name of every RAM user in the account, following ListUsers markers page by page."""
+    from aliyunsdkram.request.v20150501.ListUsersRequest import ListUsersRequest
+
+    marker = None
+    while True:
+        request = ListUsersRequest()
+        request.set_MaxItems(LIST_PAGE_SIZE)
+        if marker:
+            request.set_Marker(marker)
+        body = call_ram(request)
+        for user in body["Users"]["User"]:
+            yield user["UserName"]
+        if not body.get("IsTruncated"):
+            return
+        marker = body["Marker"]
+
+
+def describe_ram_user(user_name):
+    """Return a user dict listing the access keys and policies a RAM user still has."""
+    from aliyunsdkram.request.v20150501.ListAccessKeysRequest import ListAccessKeysRequest
+    from aliyunsdkram.request.v20150501.ListPoliciesForUserRequest import ListPoliciesForUserRequest
+
+    try:
+        keys_request = ListAccessKeysRequest()
+        keys_request.set_UserName(user_name)
+        keys = call_ram(keys_request)["AccessKeys"]["AccessKey"]
+        policies_request = ListPoliciesForUserRequest()
+        policies_request.set_UserName(user_name)
+        policies = call_ram(policies_request)["Policies"]["Policy"]
+    except Exception as e:
+        print(f"Error describing RAM user {user_name}: {e}")
+        return {"UserName": user_name}
+    return {
+        "UserName": user_name,
+        "AccessKeyIds": [key["AccessKeyId"] for key in keys],
+        "Policies": [
+            {"PolicyName": policy["PolicyName"], "PolicyType": policy["PolicyType"]} for policy in policies
+        ],
+    }
+
+
+def delete_ram_user(user_name, access_key_id=None, policy_name=DEFAULT_POLICY_NAME):
+    """Delete a RAM user after its access keys and policy, and return True on success."""
+    steps = ram_user_steps({"UserName": user_name, "AccessKeyId": access_key_id}, policy_name)
+    if teardown_resource(provisioning_journal, user_name, RAM_UNDO_ACTIONS, steps):
+        print(f"Deleted RAM user: {user_name}")
+        return True
+    print(f"Error deleting RAM user {user_name}; remaining steps stay journaled.")
+    return False
+
+
+def delete_ram_users_parallel(users, max_workers=MAX_PIPELINE_WORKERS):
+    """Tear down RAM users concurrently and return {user_name: deleted}."""
+    results = teardown_resources(
+        provisioning_journal,
+        [user["UserName"] for user in users],
+        RAM_UNDO_ACTIONS,
+        {user["UserName"]: ram_user_steps(user) for user in users},
+        max_workers,
+    )
+    deleted = sum(1 for ok in results.values() if ok)
+    print(f"Deleted {deleted} of {len(users)} RAM users.")
+    return results
+
+
+def display_ram_user_details(users):
+    """Display RAM user details with secrets redacted."""
+    print("\nRAM User Details:")
+    print("=" * 50)
+    for user in users[:MAX_DISPLAYED_USERS]:
+        print(f"User Name: {user['UserName']}")
+        print(f"Access Key ID: {user['AccessKeyId']}")
+        print(f"Access Key Secret: {redact(user['AccessKeySecret'])}")
+        print("=" * 50)
+    print_truncation_note(users)
+
+
+class AlibabaProvider(CloudProvider):
+    """Alibaba Cloud RAM implementation of the provider interface."""
+
+    name = "alibaba"
+    label = "Alibaba Cloud"
+    user_label = "RAM users"
+    resource_fields = {"AccessKeyId": "access_key"}
+    services = SUPPORTED_SERVICES
+
+    def create_user(self, user_name):
+        return create_ram_user(user_name)
+
+    def create_users(self, user_names):
+        # The pipeline attaches the policy too, so attach_policies() has nothing left to do
+        results = provision_ram_users_pipelined(user_names, on_created=self.export_credentials)
+        return [results[user_name] for user_name in user_names if results[user_name]]
+
+    def attach_policy(self, user):
+        assign_policy_to_user(user["UserName"])
+
+    def attach_policies(self, users):
+        pass
+
+    def deploy(self, service_name, user):
+        return deploy_service(service_name, user["UserName"])
+
+    def delete(self, user):
+        return delete_ram_user(user["UserName"], user.get("AccessKeyId"))
+
+    def delete_users(self, users):
+        return delete_ram_users_parallel(users)
+
+    def display(self, users):
+        display_ram_user_details(users)
+
+    def list_cloud_users(self):
+        return ({"UserName": user_name} for user_name in iter_ram_user_names())
+
+    def delete_orphans(self, users):
+        # Orphans were never journaled, so look up what still hangs off each one first
+        with ThreadPoolExecutor(max_workers=MAX_PIPELINE_WORKERS) as executor:
+            users = list(executor.map(describe_ram_user, [user["UserName"] for user in users]))
+        delete_ram_users_parallel(users)
+
+
+def main():
+    run_cli(AlibabaProvider())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Provision AWS cohorts into many accounts and regions at once.
+
+Each target is one account, reached through a role, and the regions to
+deploy services to. Accounts provision in parallel. IAM is global to an
+account, so each account gets one set of users, created through one IAM
+worker pool, governor and journal however many regions it spans; only
+the regional CloudFormation stacks are deployed once per region, each
+region with its own CloudFormation governor. Throttling in one account
+never slows another. Every role is assumed up front and reused from the
+shared session. Results are reported per account with ready-latency
+percentiles, and every account's cohort is cleaned up together when the
+run expires:
+
+    python aws_fanout.py --accounts 111122223333 444455556666 --regions us-east-1 eu-west-1 \\
+        --users 30 --services 1,2 --hours 4
+
+Accounts may be given as IDs, which are reached through `--role-name`,
+or as full role ARNs.
+"""
+import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import aws_service_selector as aws
+from cloud_provider import COHORT_TOKEN_LENGTH
+from cohort_spec import resolve_services
+from credential_export import CredentialExporter, add_credentials_format_argument
+from inventory_store import DEFAULT_INVENTORY_FILE, InventoryStore
+from latency_stats import summarize_latencies
+from lifecycle_scheduler import LifecycleScheduler
+from provisioning_journal import ProvisioningJournal
+
+DEFAULT_ROLE_NAME = "OrganizationAccountAccessRole"
+MAX_PARALLEL_ACCOUNTS = 8  # Accounts provisioned at once
+WORKERS_PER_ACCOUNT = 8  # IAM workers, and pooled connections, per account
+LIFECYCLE_STATE_FILE = "lifecycle_state_aws_fanout.json"
+
+
+def role_arn_for(account, role_name=DEFAULT_ROLE_NAME):
+    """Return the role ARN for an account ID, or the account itself if it already is an ARN."""
+    return account if account.startswith("arn:") else f"arn:aws:iam::{account}:role/{role_name}"
+
+
+def build_targets(accounts, regions, role_name=DEFAULT_ROLE_NAME):
+    """Return one target per account, each covering every region."""
+    return [
+        {"role_arn": role_arn, "account_id": role_arn.split(":")[4], "regions": list(dict.fromkeys(regions))}
+        for role_arn in dict.fromkeys(role_arn_for(account, role_name) for account in accounts)
+    ]
+
+
+def accounts_for_target(target):
+    """Return the AWSAccount that creates a target's IAM users and one AWSAccount per region for its stacks.
+
+    The users, their journal and the IAM governor are shared by every
+    region; each region has its own session and CloudFormation governor.
+    """
+    journal = ProvisioningJournal(f"provisioning_journal_aws_{target['account_id']}.jsonl")
+    iam_account = aws.AWSAccount(
+        aws.aws_session.for_account(target["role_arn"], next(iter(target["regions"]), None)), journal
+    )
+    region_accounts = {
+        region: aws.AWSAccount(
+            aws.aws_session.for_account(target["role_arn"], region), journal, iam_account.iam_governor
+        )
+        for region in target["regions"]
+    }
+    return iam_account, region_accounts
+
+
+class AccountProvider(aws.AWSProvider):
+    """AWSProvider for one fan-out account: one set of IAM users, with service stacks in every region.
+
+    Stacks are recorded per region on each user, under RegionStacks.
+    """
+
+    def __init__(self, target, region_accounts, max_workers=WORKERS_PER_ACCOUNT):
+        super().__init__(max_workers)
+        # One name per account, so the same user name in two accounts gets two inventory rows;
+        # the reconciler checks these rows when it lists this account
+        self.name = f"aws:{target['account_id']}"
+        self.region_accounts = region_accounts
+
+    def in_each_region(self, func, users):
+        """Call `func(region, users)` in every region's account context at once; return {region: result}."""
+        def run(region):
+            with aws.use_account(self.region_accounts[region]):
+                return func(region, users)
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.region_accounts))) as executor:
+            return dict(zip(self.region_accounts, executor.map(run, self.region_accounts)))
+
+    def deploy_services(self, services, users):
+        def deploy(region, users):
+            # Each region records its stacks and buckets on its own copies of the users
+            region_users = [{"UserName": user["UserName"]} for user in users]
+            aws.deploy_cohort_stacks(services, region_users)
+            return region_users
+
+        for region, region_users in self.in_each_region(deploy, users).items():
+            for user, region_user in zip(users, region_users):
+                if region_user.get("Stacks"):
+                    user.setdefault("RegionStacks", {}).setdefault(region, []).extend(region_user["Stacks"])
+                if region_user.get("Buckets"):
+                    user.setdefault("Buckets", []).extend(region_user["Buckets"])
+
+    def inventory_records(self, user):
+        records = super().inventory_records(user)
+        for region, stack_names in user.get("RegionStacks", {}).items():
+            records.extend(
+                ("stack", stack_name, {"user": user["UserName"], "region": region}) for stack_name in stack_names
+            )
+        return records
+
+    def delete_users(self, users):
+        def delete_stacks(region, users):
+            aws.delete_cohort_stacks([{"Stacks": user.get("RegionStacks", {}).get(region, [])} for user in users])
+
+        self.in_each_region(delete_stacks, users)
+        return super().delete_users(users)
+
+
+def target_cohort_id(cohort_id, target):
+    """Return the inventory cohort ID of one account of a fan-out run."""
+    return f"{cohort_id}-{target['account_id']}"
+
+
+class TargetSink:
+    """Credential sink for one target: tags each user with its target and records when it was ready."""
+
+    def __init__(self, target, credential_sink=None):
+        self.target = target
+        self.credential_sink = credential_sink
+        self.start = time.perf_counter()
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def write(self, user):
+        user["RoleArn"] = self.target["role_arn"]
+        user["Regions"] = self.target["regions"]
+        with self._lock:
+            self.latencies.append(time.perf_counter() - self.start)
+        if self.credential_sink:
+            self.credential_sink.write(user)
+
+
+def provision_target(target, services, user_count, user_prefix, max_workers=WORKERS_PER_ACCOUNT,
+                     inventory=None, cohort_id=None, expires_at=None, credential_sink=None):
+    """Create one account's users, then deploy its stacks in every region; return a result dict."""
+    result = {"target": target, "requested": user_count, "users": [], "latencies": [], "error": None}
+    start = time.perf_counter()
+    iam_account, region_accounts = accounts_for_target(target)
+    with aws.use_account(iam_account):
+        provider = AccountProvider(target, region_accounts, max_workers)
+        provider.user_prefix = user_prefix
+        if not provider.prepare():
+            result["error"] = "could not resolve the account"
+            return result
+        sink = TargetSink(target, credential_sink)
+        provider.credential_sink = sink
+        users = provider.create_users([f"{user_prefix}-{i+1}" for i in range(user_count)])
+        if inventory:
+            provider.record_inventory(inventory, target_cohort_id(cohort_id, target), users, expires_at)
+        provider.attach_policies(users)
+        provider.deploy_services(services, users)
+        if inventory:
+            provider.record_inventory(inventory, target_cohort_id(cohort_id, target), users, expires_at)
+    result.update(users=users, latencies=sink.latencies, elapsed=time.perf_counter() - start)
+    return result
+
+
+def new_fan_out_cohort(user_prefix=None):
+    """Return a new fan-out cohort ID and the user prefix for it, `user-<cohort token>` unless given.
+
+    Like start_cohort, the token keeps runs that are live at the same time
+    from reusing each other's user names.
+    """
+    token = uuid.uuid4().hex[:COHORT_TOKEN_LENGTH]
+    return f"aws-fanout-{token}", user_prefix or f"{aws.AWSProvider.user_prefix}-{token}"
+
+
+def fan_out(targets, services, user_count, user_prefix=None, max_accounts=MAX_PARALLEL_ACCOUNTS,
+            max_workers=WORKERS_PER_ACCOUNT, inventory=None, cohort_id=None, expires_at=None,
+            credential_sink=None):
+    """Provision a cohort into every target, `max_accounts` at a time; return the per-account results."""
+    if not user_prefix:
+        user_prefix = new_fan_out_cohort()[1]
+    aws.aws_session.max_pool_connections = max_workers
+    failed_roles = aws.aws_session.assume_roles(
+        [target["role_arn"] for target in targets], max_accounts
+    )
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_accounts, len(targets)))) as executor:
+        futures = {}
+        for target in targets:
+            if target["role_arn"] in failed_roles:
+                error = f"could not assume {target['role_arn']}: {failed_roles[target['role_arn']]}"
+                results.append({"target": target, "requested": user_count, "users": [], "latencies": [],
+                                "error": error})
+                continue
+            future = executor.submit(
+                provision_target, target, services, user_count, user_prefix, max_workers,
+                inventory, cohort_id, expires_at, credential_sink
+            )
+            futures[future] = target
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"target": futures[future], "requested": user_count, "users": [],
+                                "latencies": [], "error": str(e)})
+    return results
+
+
+def format_ms(seconds):
+    """Render a latency in milliseconds for the results table."""
+    return f"{seconds * 1000:8.1f}" if seconds is not None else "       -"
+
+
+def print_results(results, elapsed):
+    """Print one row per account and a total row, with users/s and ready-latency percentiles."""
+    print(f"\n{'account':14} {'regions':14} {'ready':>11}  {'seconds':>8}  {'users/s':>8}  "
+          f"{'p50 ms':>8}  {'p99 ms':>8}  status")
+    all_latencies = []
+    created = requested = 0
+    for result in sorted(results, key=lambda result: result["target"]["account_id"]):
+        target = result["target"]
+        users = len(result["users"])
+        created += users
+        requested += result["requested"]
+        all_latencies.extend(result["latencies"])
+        ready = summarize_latencies(result["latencies"])
+        seconds = result.get("elapsed") or 0
+        ready_count = f"{users}/{result['requested']}"
+        print(f"{target['account_id']:14} {','.join(target['regions']):14} {ready_count:>11}  {seconds:8.2f}  "
+              f"{users / seconds if seconds else 0:8.1f}  {format_ms(ready['p50'])}  {format_ms(ready['p99'])}  "
+              f"{result['error'] or 'ok'}")
+    ready = summarize_latencies(all_latencies)
+    ready_count = f"{created}/{requested}"
+    print(f"{'total':29} {ready_count:>11}  {elapsed:8.2f}  {created / elapsed if elapsed else 0:8.1f}  "
+          f"{format_ms(ready['p50'])}  {format_ms(ready['p99'])}")
+
+
+def cleanup_fan_out(resources, cohort_id, inventory=None, max_accounts=MAX_PARALLEL_ACCOUNTS,
+                    max_workers=WORKERS_PER_ACCOUNT):
+    """Tear down a fan-out run's users and stacks, each account in its own context, several at a time."""
+    by_account = {}
+    for user in resources:
+        by_account.setdefault(user["RoleArn"], []).append(user)
+
+    def cleanup_target(role_arn, users):
+        regions = list(dict.fromkeys(region for user in users for region in user.get("Regions", [])))
+        target = {"role_arn": role_arn, "account_id": role_arn.split(":")[4], "regions": regions}
+        iam_account, region_accounts = accounts_for_target(target)
+        with aws.use_account(iam_account):
+            provider = AccountProvider(target, region_accounts, max_workers)
+            provider.cleanup_users(users, inventory, target_cohort_id(cohort_id, target))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_accounts, len(by_account)))) as executor:
+        futures = [executor.submit(cleanup_target, role_arn, users) for role_arn, users in by_account.items()]
+        for future in futures:
+            future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--accounts", nargs="+", required=True, help="Account IDs or role ARNs")
+    parser.add_argument("--regions", nargs="+", default=["us-east-1"])
+    parser.add_argument("--role-name", default=DEFAULT_ROLE_NAME,
+                        help="Role assumed in accounts given by ID")
+    parser.add_argument("--users", type=int, required=True, help="Users per account")
+    parser.add_argument("--services", default="", help="Comma-separated service numbers, e.g. 1,2")
+    parser.add_argument("--user-prefix", help="User name prefix (default: user-<cohort token>)")
+    parser.add_argument("--max-accounts", type=int, default=MAX_PARALLEL_ACCOUNTS,
+                        help="Accounts provisioned at once")
+    parser.add_argument("--workers-per-account", type=int, default=WORKERS_PER_ACCOUNT,
+                        help="Concurrent IAM workers in each account")
+    parser.add_argument("--days", type=int, default=0, help="Days to run services")
+    parser.add_argument("--hours", type=int, default=1, help="Hours to run services")
+    add_credentials_format_argument(parser)
+    args = parser.parse_args()
+    lifetime = timedelta(days=args.days, hours=args.hours)
+    if lifetime <= timedelta(0):
+        parser.error("--days and --hours must add up to a positive lifetime")
+
+    targets = build_targets(args.accounts, args.regions, args.role_name)
+    try:
+        numbers = [int(i.strip()) for i in args.services.split(",") if i.strip()]
+    except ValueError:
+        parser.error("Invalid input. Please enter numbers separated by commas.")
+    services = resolve_services(aws.AWSProvider(), numbers)
+    end_time = datetime.now() + lifetime
+    cohort_id, user_prefix = new_fan_out_cohort(args.user_prefix)
+    inventory = InventoryStore(DEFAULT_INVENTORY_FILE)
+
+    print(f"Provisioning {args.users} users into each of {len(targets)} accounts across "
+          f"{len(args.regions)} regions, {args.max_accounts} accounts at a time...")
+    start = time.perf_counter()
+    with CredentialExporter(f"credentials_{cohort_id}.{args.credentials_format}") as credential_sink:
+        results = fan_out(
+            targets, services, args.users, user_prefix, args.max_accounts, args.workers_per_account,
+            inventory, cohort_id, end_time.timestamp(), credential_sink
+        )
+    print_results(results, time.perf_counter() - start)
+    print(f"\nCredentials for {credential_sink.count} users written to {credential_sink.path}")
+
+    users = [user for result in results for user in result["users"]]
+    scheduler = LifecycleScheduler(LIFECYCLE_STATE_FILE)
+    if users:
+        scheduler.add_cohort("aws-fanout", end_time, users, cohort_id)
+        print(f"Resources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    scheduler.run(
+        lambda name, resources, cohort_id: cleanup_fan_out(
+            resources, cohort_id, inventory, args.max_accounts, args.workers_per_account
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
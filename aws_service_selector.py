@@ -1,156 +1,562 @@
-import boto3
-import random
-import string
-import time
-from datetime import datetime, timedelta
-
-# AWS Clients
-iam_client = boto3.client('iam')
-sts_client = boto3.client('sts')
-
-# List of Supported Services
-SUPPORTED_SERVICES = [
-    "Amazon EC2", "Amazon S3", "Amazon RDS", "Amazon DynamoDB",
-    "AWS Lambda", "Amazon CloudWatch", "Amazon VPC", "AWS IAM",
-    "Amazon API Gateway", "Amazon Route 53", "AWS Elastic Beanstalk",
-    "Amazon SNS", "Amazon SQS", "AWS CloudFormation", "AWS Glue",
-    "AWS Step Functions", "Amazon Redshift"
-]
-
-def get_account_id():
-    """Retrieve AWS account ID."""
-    try:
-        return sts_client.get_caller_identity()["Account"]
-    except Exception as e:
-        print(f"Error retrieving account ID: {e}")
-        return None
-
-def generate_password():
-    """Generate a random password for IAM users."""
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(random.choice(characters) for _ in range(12))
-
-def create_iam_user(user_name, account_id):
-    """Create an IAM user and return credentials."""
-    try:
-        # Create IAM user
-        iam_client.create_user(UserName=user_name)
-
-        # Create login profile for console access
-        password = generate_password()
-        iam_client.create_login_profile(
-            UserName=user_name,
-            Password=password,
-            PasswordResetRequired=False
-        )
-
-        # Attach policies
-        iam_client.attach_user_policy(
-            UserName=user_name,
-            PolicyArn="arn:aws:iam::aws:policy/AdministratorAccess"
-        )
-
-        # Generate access keys
-        keys = iam_client.create_access_key(UserName=user_name)
-
-        login_url = f"https://{account_id}.signin.aws.amazon.com/console"
-
-        return {
-            "UserName": user_name,
-            "Password": password,
-            "AccessKeyId": keys["AccessKey"]["AccessKeyId"],
-            "SecretAccessKey": keys["AccessKey"]["SecretAccessKey"],
-            "AccountId": account_id,
-            "LoginURL": login_url
-        }
-    except Exception as e:
-        print(f"Error creating IAM user {user_name}: {e}")
-        return None
-
-def deploy_service(service_name, iam_user):
-    """Simulate the deployment of AWS services for a given IAM user."""
-    print(f"Deploying {service_name} for user {iam_user['UserName']}...")
-    if service_name == "Amazon EC2":
-        print(f"Simulated EC2 instance deployment for user {iam_user['UserName']}.")
-    elif service_name == "Amazon S3":
-        bucket_name = f"user-{iam_user['UserName']}-bucket-{random.randint(1000, 9999)}"
-        print(f"Simulated S3 bucket creation: {bucket_name}.")
-    else:
-        print(f"{service_name} deployment simulation completed.")
-
-def display_iam_details(users):
-    """Display IAM user credentials in the Bash console."""
-    print("\nIAM User Details:")
-    print("=" * 50)
-    for user in users:
-        print(f"User Name: {user['UserName']}")
-        print(f"Password: {user['Password']}")
-        print(f"Access Key ID: {user['AccessKeyId']}")
-        print(f"Secret Access Key: {user['SecretAccessKey']}")
-        print(f"Account ID: {user['AccountId']}")
-        print(f"Login URL: {user['LoginURL']}")
-        print("=" * 50)
-
-def main():
-    print("Supported AWS Services:")
-    for idx, service in enumerate(SUPPORTED_SERVICES, start=1):
-        print(f"{idx}. {service}")
-    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
-    services_input = input("Services: ").strip()
-    
-    try:
-        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
-        selected_services = [SUPPORTED_SERVICES[i] for i in selected_indices if 0 <= i < len(SUPPORTED_SERVICES)]
-    except ValueError:
-        print("Invalid input. Please enter valid service numbers.")
-        return
-    
-    if not selected_services:
-        print("No services selected. Exiting.")
-        return
-
-    iam_user_count = int(input("Enter the number of IAM users to create: "))
-    duration_days = int(input("Enter the number of days to run services: "))
-    duration_hours = int(input("Enter the number of hours to run services: "))
-
-    account_id = get_account_id()
-    if not account_id:
-        print("Unable to retrieve AWS account ID. Exiting.")
-        return
-
-    users = []
-    for i in range(iam_user_count):
-        user_name = f"user-{i+1}"
-        credentials = create_iam_user(user_name, account_id)
-        if credentials:
-            users.append(credentials)
-
-    # Display IAM user details
-    display_iam_details(users)
-
-    # Deploy services for each IAM user
-    for user in users:
-        for service in selected_services:
-            deploy_service(service, user)
-
-    # Simulate resource lifecycle
-    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
-    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    while datetime.now() < end_time:
-        time.sleep(10)  # Simulating active resources
-
-    print("\nTime's up! Cleaning up IAM users...")
-
-    # Delete IAM users
-    for user in users:
-        try:
-            iam_client.delete_user(UserName=user["UserName"])
-            print(f"Deleted IAM user: {user['UserName']}")
-        except Exception as e:
-            print(f"Error deleting IAM user {user['UserName']}: {e}")
-
-    print("\nCleanup completed.")
-
-if __name__ == "__main__":
-    main()
+import contextlib
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from aws_session import AWSSessionManager
+from cloud_provider import CloudProvider, load_service_catalog, run_cli
+from credential_generator import generate_password, unique_name
+from credential_export import MAX_DISPLAYED_USERS, print_truncation_note, redact
+from provisioning_journal import ProvisioningJournal, teardown_resource, teardown_resources, undo_steps
+from rate_limiter import ConcurrencyGovernor, get_error_code
+
+# List of Supported Services
+SUPPORTED_SERVICES = load_service_catalog("aws")
+
+# Concurrent provisioning settings; iam_governor decides how many calls are really in flight
+MAX_PROVISIONING_WORKERS = 32
+ADMIN_POLICY_ARN = "arn:aws:iam::aws:policy/AdministratorAccess"
+LIST_PAGE_SIZE = 1000  # Largest page list_users returns
+
+# Service deployments: one CloudFormation stack per slice of the cohort
+STACK_PREFIX = "cohort"
+MAX_STACK_RESOURCES = 500  # Most resources one stack may hold
+MAX_PARAMETER_BYTES = 4096  # Longest parameter value, which caps the UserNames list
+MAX_STACK_WORKERS = 8  # Stacks created or deleted at once
+STACK_POLL_INTERVAL = 10  # Seconds between status checks of the stacks in progress
+STACK_WAIT_TIMEOUT = 3600  # Seconds to wait for stacks to finish creating or deleting
+EC2_INSTANCE_TYPE = "t3.micro"
+EC2_IMAGE_PARAMETER = "/aws/service/ami-amazon-linux-latest/al2023-ami-kernel-default-x86_64"
+STACK_FAILED_STATUSES = {"CREATE_FAILED", "ROLLBACK_COMPLETE", "ROLLBACK_FAILED", "DELETE_FAILED"}
+
+# One boto3 Session for the run; its clients are shared by every worker thread,
+# with a connection pool per client as large as the worker pool
+aws_session = AWSSessionManager(max_pool_connections=MAX_PROVISIONING_WORKERS)
+
+# IAM and CloudFormation calls each go through a governor that adapts concurrency to throttling
+iam_governor = ConcurrencyGovernor()
+cloudformation_governor = ConcurrencyGovernor()
+
+# Every completed IAM step is journaled so teardown can undo exactly what exists
+provisioning_journal = ProvisioningJournal("provisioning_journal_aws.jsonl")
+
+class AWSAccount:
+    """The session, governors and journal used to provision into one account and region."""
+
+    def __init__(self, session, journal, iam_governor=None, cloudformation_governor=None):
+        self.session = session
+        self.journal = journal
+        self.iam_governor = iam_governor or ConcurrencyGovernor()
+        self.cloudformation_governor = cloudformation_governor or ConcurrencyGovernor()
+
+# Account the current task provisions into; unset means the module-level session, governors and journal
+_current_account = contextvars.ContextVar("aws_account", default=None)
+
+def current_account():
+    """Return the AWSAccount the current task provisions into."""
+    account = _current_account.get()
+    if account is None:
+        return AWSAccount(aws_session, provisioning_journal, iam_governor, cloudformation_governor)
+    return account
+
+@contextlib.contextmanager
+def use_account(account):
+    """Provision into `account` for the duration of a with block, in this thread and its tasks."""
+    token = _current_account.set(account)
+    try:
+        yield account
+    finally:
+        _current_account.reset(token)
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """Submit a task to an executor so that it provisions into the caller's account."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+# AWS Clients (created on first use)
+def get_iam_client():
+    """Return the shared IAM client of the current account."""
+    return current_account().session.client('iam')
+
+def get_cloudformation_client():
+    """Return the shared CloudFormation client of the current account."""
+    return current_account().session.client('cloudformation')
+
+def get_account_id():
+    """Retrieve AWS account ID, reusing the cached caller identity."""
+    try:
+        return current_account().session.account_id()
+    except Exception as e:
+        print(f"Error retrieving account ID: {e}")
+        return None
+
+def create_iam_user(user_name, account_id):
+    """Create an IAM user and return credentials.
+
+    Each step is journaled once it succeeds; if a later step fails, only
+    the steps this call completed are rolled back, so a user that already
+    existed (EntityAlreadyExists) is left alone.
+    """
+    account = current_account()
+    iam_client = get_iam_client()
+    completed = []
+
+    def done(step, **details):
+        account.journal.record(user_name, step, **details)
+        completed.append((step, details))
+
+    try:
+        # Create IAM user
+        account.iam_governor.call(iam_client.create_user, UserName=user_name)
+        done("user")
+
+        # Create login profile for console access
+        password = generate_password("aws")
+        account.iam_governor.call(
+            iam_client.create_login_profile,
+            UserName=user_name,
+            Password=password,
+            PasswordResetRequired=False
+        )
+        done("login_profile")
+
+        # Attach policies
+        account.iam_governor.call(
+            iam_client.attach_user_policy,
+            UserName=user_name,
+            PolicyArn=ADMIN_POLICY_ARN
+        )
+        done("policy", PolicyArn=ADMIN_POLICY_ARN)
+
+        # Generate access keys
+        keys = account.iam_governor.call(iam_client.create_access_key, UserName=user_name)
+        done("access_key", AccessKeyId=keys["AccessKey"]["AccessKeyId"])
+
+        login_url = f"https://{account_id}.signin.aws.amazon.com/console"
+
+        return {
+            "UserName": user_name,
+            "Password": password,
+            "AccessKeyId": keys["AccessKey"]["AccessKeyId"],
+            "SecretAccessKey": keys["AccessKey"]["SecretAccessKey"],
+            "AccountId": account_id,
+            "LoginURL": login_url
+        }
+    except Exception as e:
+        print(f"Error creating IAM user {user_name}: {e}")
+        undo_steps(account.journal, user_name, completed, IAM_UNDO_ACTIONS)
+        return None
+
+def create_iam_users_concurrently(user_names, account_id, max_workers=MAX_PROVISIONING_WORKERS, on_created=None):
+    """Create IAM users in a bounded thread pool and return a per-user result map.
+
+    `on_created` is called with each user's credentials as soon as that user is ready.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            submit_in_context(executor, create_iam_user, user_name, account_id): user_name
+            for user_name in user_names
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_created and results[futures[future]]:
+                on_created(results[futures[future]])
+    return results
+
+# Per-user template resources for each service a cohort stack can deploy.
+# `&{UserName}` is the user name with its hyphens dropped, as logical IDs need.
+STACK_SERVICE_RESOURCES = {
+    "Amazon S3": {
+        "Bucket&{UserName}": {
+            "Type": "AWS::S3::Bucket",
+            "Properties": {
+                "BucketName": {"Fn::Sub": "${UserName}-${BucketSuffix}"},
+                "PublicAccessBlockConfiguration": {
+                    "BlockPublicAcls": True, "BlockPublicPolicy": True,
+                    "IgnorePublicAcls": True, "RestrictPublicBuckets": True,
+                },
+                "Tags": [{"Key": "Owner", "Value": {"Ref": "UserName"}}],
+            },
+        },
+    },
+    "Amazon EC2": {
+        "Instance&{UserName}": {
+            "Type": "AWS::EC2::Instance",
+            "Properties": {
+                "ImageId": {"Ref": "ImageId"},
+                "InstanceType": {"Ref": "InstanceType"},
+                "Tags": [{"Key": "Owner", "Value": {"Ref": "UserName"}}],
+            },
+        },
+    },
+    "Amazon DynamoDB": {
+        "Table&{UserName}": {
+            "Type": "AWS::DynamoDB::Table",
+            "Properties": {
+                "BillingMode": "PAY_PER_REQUEST",
+                "AttributeDefinitions": [{"AttributeName": "id", "AttributeType": "S"}],
+                "KeySchema": [{"AttributeName": "id", "KeyType": "HASH"}],
+                "Tags": [{"Key": "Owner", "Value": {"Ref": "UserName"}}],
+            },
+        },
+    },
+    "Amazon SQS": {
+        "Queue&{UserName}": {
+            "Type": "AWS::SQS::Queue",
+            "Properties": {"Tags": [{"Key": "Owner", "Value": {"Ref": "UserName"}}]},
+        },
+    },
+    "Amazon SNS": {
+        "Topic&{UserName}": {
+            "Type": "AWS::SNS::Topic",
+            "Properties": {"Tags": [{"Key": "Owner", "Value": {"Ref": "UserName"}}]},
+        },
+    },
+}
+
+def render_cohort_template(services):
+    """Return a CloudFormation template that deploys the given services once per name in UserNames."""
+    parameters = {"UserNames": {"Type": "CommaDelimitedList"}}
+    if "Amazon S3" in services:
+        parameters["BucketSuffix"] = {"Type": "String"}
+    if "Amazon EC2" in services:
+        parameters["ImageId"] = {
+            "Type": "AWS::SSM::Parameter::Value<AWS::EC2::Image::Id>", "Default": EC2_IMAGE_PARAMETER
+        }
+        parameters["InstanceType"] = {"Type": "String", "Default": EC2_INSTANCE_TYPE}
+    resources = {}
+    for service in services:
+        resources[f"Fn::ForEach::{service.split()[-1]}"] = [
+            "UserName", {"Ref": "UserNames"}, STACK_SERVICE_RESOURCES[service]
+        ]
+    return {
+        "AWSTemplateFormatVersion": "2010-09-09",
+        "Transform": "AWS::LanguageExtensions",
+        "Parameters": parameters,
+        "Resources": resources,
+    }
+
+def split_cohort(users, users_per_stack):
+    """Split users into stack-sized slices whose comma-joined names fit in one parameter value."""
+    chunks = [[]]
+    size = 0
+    for user in users:
+        name_bytes = len(user["UserName"].encode()) + 1
+        if len(chunks[-1]) == users_per_stack or size + name_bytes > MAX_PARAMETER_BYTES + 1:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(user)
+        size += name_bytes
+    return chunks
+
+def start_stack(stack_name, services, users):
+    """Create one cohort stack for a slice of users and record it, and any buckets, on them."""
+    parameters = [{"ParameterKey": "UserNames", "ParameterValue": ",".join(user["UserName"] for user in users)}]
+    if "Amazon S3" in services:
+        parameters.append({"ParameterKey": "BucketSuffix", "ParameterValue": stack_name})
+    current_account().cloudformation_governor.call(
+        get_cloudformation_client().create_stack,
+        StackName=stack_name,
+        TemplateBody=json.dumps(render_cohort_template(services)),
+        Parameters=parameters,
+        Capabilities=["CAPABILITY_AUTO_EXPAND"],
+        Tags=[{"Key": "Cohort", "Value": stack_name}],
+    )
+    for user in users:
+        user.setdefault("Stacks", []).append(stack_name)
+        if "Amazon S3" in services:
+            user.setdefault("Buckets", []).append(f"{user['UserName']}-{stack_name}")
+
+def stack_failure_reason(stack_name):
+    """Return the reason of the most recent failed event of a stack."""
+    try:
+        events = current_account().cloudformation_governor.call(
+            get_cloudformation_client().describe_stack_events, StackName=stack_name
+        )["StackEvents"]
+    except Exception as e:
+        return str(e)
+    for event in events:
+        if event["ResourceStatus"].endswith("FAILED") and event.get("ResourceStatusReason"):
+            return f"{event['LogicalResourceId']}: {event['ResourceStatusReason']}"
+    return "no failure reason reported"
+
+def wait_for_stacks(stack_names, deleting=False, timeout=None):
+    """Track stacks with one describe_stacks listing per round until all finish; return {name: error}.
+
+    Deleted stacks drop out of the listing, so a stack that is no longer
+    listed has finished deleting. Stacks still pending after `timeout`
+    seconds (STACK_WAIT_TIMEOUT by default) are reported with a "timed
+    out" error.
+    """
+    pending = set(stack_names)
+    outcomes = {}
+    deadline = time.monotonic() + (STACK_WAIT_TIMEOUT if timeout is None else timeout)
+    while pending:
+        statuses = {}
+        paginator = get_cloudformation_client().get_paginator("describe_stacks")
+        for page in current_account().cloudformation_governor.call(lambda: list(paginator.paginate())):
+            for stack in page["Stacks"]:
+                if stack["StackName"] in pending:
+                    statuses[stack["StackName"]] = stack["StackStatus"]
+        for stack_name in list(pending):
+            status = statuses.get(stack_name, "DELETE_COMPLETE" if deleting else None)
+            if status in STACK_FAILED_STATUSES:
+                outcomes[stack_name] = f"{status} ({stack_failure_reason(stack_name)})"
+            elif status in ("CREATE_COMPLETE", "DELETE_COMPLETE"):
+                outcomes[stack_name] = None
+            else:
+                continue
+            pending.discard(stack_name)
+        if pending and time.monotonic() >= deadline:
+            print(f"Stopped waiting for {len(pending)} stacks still in progress: {', '.join(sorted(pending))}")
+            for stack_name in pending:
+                outcomes[stack_name] = f"timed out ({statuses.get(stack_name) or 'not listed yet'})"
+            break
+        if pending:
+            time.sleep(STACK_POLL_INTERVAL)
+    return outcomes
+
+def deploy_cohort_stacks(services, users):
+    """Deploy the selected services for a cohort as a few CloudFormation stacks, created concurrently."""
+    for service in services:
+        if service not in STACK_SERVICE_RESOURCES:
+            print(f"{service} is not part of the cohort template yet; skipped.")
+    services = [service for service in services if service in STACK_SERVICE_RESOURCES]
+    if not services or not users:
+        return
+    chunks = {
+        unique_name(STACK_PREFIX): chunk
+        for chunk in split_cohort(users, MAX_STACK_RESOURCES // len(services))
+    }
+    started = []
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_STACK_WORKERS, len(chunks)))) as executor:
+        futures = {
+            submit_in_context(executor, start_stack, stack_name, services, chunk): stack_name
+            for stack_name, chunk in chunks.items()
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                started.append(futures[future])
+                print(f"Started stack {futures[future]} for {', '.join(services)}.")
+            except Exception as e:
+                print(f"Error creating stack {futures[future]}: {e}")
+    for stack_name, error in wait_for_stacks(started).items():
+        if error and error.startswith("timed out"):
+            # Still in progress: the stack and its buckets stay recorded for teardown
+            print(f"Stack {stack_name} did not finish: {error}")
+        elif error:
+            # The stack stays recorded for teardown; its buckets were rolled back
+            for user in chunks[stack_name]:
+                user["Buckets"] = [name for name in user.get("Buckets", []) if not name.endswith(f"-{stack_name}")]
+            print(f"Stack {stack_name} failed: {error}")
+        else:
+            print(f"Deployed {', '.join(services)} for {len(chunks[stack_name])} users in stack {stack_name}.")
+
+def delete_cohort_stacks(users):
+    """Delete the stacks recorded on a cohort's users in parallel and wait for them all."""
+    stack_names = sorted({stack_name for user in users for stack_name in user.get("Stacks", [])})
+    if not stack_names:
+        return
+    account = current_account()
+    client = get_cloudformation_client()
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_STACK_WORKERS, len(stack_names)))) as executor:
+        futures = {
+            executor.submit(account.cloudformation_governor.call, client.delete_stack, StackName=name): name
+            for name in stack_names
+        }
+        deleting = []
+        for future in as_completed(futures):
+            try:
+                future.result()
+                deleting.append(futures[future])
+            except Exception as e:
+                print(f"Error deleting stack {futures[future]}: {e}")
+    for stack_name, error in wait_for_stacks(deleting, deleting=True).items():
+        if error:
+            print(f"Error deleting stack {stack_name}: {error}")
+        else:
+            print(f"Deleted stack: {stack_name}")
+
+def display_iam_details(users):
+    """Display IAM user details in the Bash console with secrets redacted."""
+    print("\nIAM User Details:")
+    print("=" * 50)
+    for user in users[:MAX_DISPLAYED_USERS]:
+        print(f"User Name: {user['UserName']}")
+        print(f"Password: {redact(user['Password'])}")
+        print(f"Access Key ID: {user['AccessKeyId']}")
+        print(f"Secret Access Key: {redact(user['SecretAccessKey'])}")
+        print(f"Account ID: {user['AccountId']}")
+        print(f"Login URL: {user['LoginURL']}")
+        print("=" * 50)
+    print_truncation_note(users)
+
+def ignore_missing(operation, **kwargs):
+    """Call an IAM delete operation, treating an already-deleted entity as success."""
+    try:
+        current_account().iam_governor.call(operation, **kwargs)
+    except Exception as e:
+        if get_error_code(e) != "NoSuchEntity":
+            raise
+
+def undo_access_key(user_name, details):
+    """Delete a journaled access key."""
+    ignore_missing(get_iam_client().delete_access_key, UserName=user_name, AccessKeyId=details["AccessKeyId"])
+
+def undo_policy(user_name, details):
+    """Detach a journaled managed policy."""
+    ignore_missing(get_iam_client().detach_user_policy, UserName=user_name, PolicyArn=details["PolicyArn"])
+
+def undo_login_profile(user_name, details):
+    """Delete a journaled console login profile."""
+    ignore_missing(get_iam_client().delete_login_profile, UserName=user_name)
+
+def undo_user(user_name, details):
+    """Delete a journaled IAM user."""
+    ignore_missing(get_iam_client().delete_user, UserName=user_name)
+
+# How to undo each journaled step of create_iam_user
+IAM_UNDO_ACTIONS = {
+    "user": undo_user,
+    "login_profile": undo_login_profile,
+    "policy": undo_policy,
+    "access_key": undo_access_key,
+}
+
+def iam_user_steps(user):
+    """Return every step create_iam_user performs, for users missing from the journal."""
+    steps = [("user", {}), ("login_profile", {})]
+    for policy_arn in user.get("PolicyArns", [ADMIN_POLICY_ARN]):
+        steps.append(("policy", {"PolicyArn": policy_arn}))
+    access_key_ids = user.get("AccessKeyIds") or ([user["AccessKeyId"]] if user.get("AccessKeyId") else [])
+    for access_key_id in access_key_ids:
+        steps.append(("access_key", {"AccessKeyId": access_key_id}))
+    return steps
+
+def iter_iam_user_names(path_prefix="/"):
+    """Yield the name of every IAM user in the account, one list_users page at a time."""
+    paginator = get_iam_client().get_paginator("list_users")
+    pages = paginator.paginate(PathPrefix=path_prefix, PaginationConfig={"PageSize": LIST_PAGE_SIZE})
+    for page in pages:
+        for user in page["Users"]:
+            yield user["UserName"]
+
+def describe_iam_user(user_name):
+    """Return a user dict listing the access keys and managed policies an IAM user still has."""
+    account = current_account()
+    iam_client = get_iam_client()
+    try:
+        keys = account.iam_governor.call(iam_client.list_access_keys, UserName=user_name)["AccessKeyMetadata"]
+        policies = account.iam_governor.call(
+            iam_client.list_attached_user_policies, UserName=user_name
+        )["AttachedPolicies"]
+    except Exception as e:
+        print(f"Error describing IAM user {user_name}: {e}")
+        return {"UserName": user_name}
+    return {
+        "UserName": user_name,
+        "AccessKeyIds": [key["AccessKeyId"] for key in keys],
+        "PolicyArns": [policy["PolicyArn"] for policy in policies],
+    }
+
+def delete_iam_user(user):
+    """Delete an IAM user after removing its access key, policy and login profile."""
+    if teardown_resource(current_account().journal, user["UserName"], IAM_UNDO_ACTIONS, iam_user_steps(user)):
+        print(f"Deleted IAM user: {user['UserName']}")
+        return True
+    print(f"Error deleting IAM user {user['UserName']}; remaining steps stay journaled.")
+    return False
+
+def delete_iam_users_concurrently(users, max_workers=MAX_PROVISIONING_WORKERS):
+    """Tear down IAM users in a bounded thread pool and return {user_name: deleted}."""
+    results = teardown_resources(
+        current_account().journal,
+        [user["UserName"] for user in users],
+        IAM_UNDO_ACTIONS,
+        {user["UserName"]: iam_user_steps(user) for user in users},
+        max_workers,
+    )
+    deleted = sum(1 for ok in results.values() if ok)
+    print(f"Deleted {deleted} of {len(users)} IAM users.")
+    return results
+
+class AWSProvider(CloudProvider):
+    """AWS IAM implementation of the provider interface."""
+
+    name = "aws"
+    label = "AWS"
+    user_label = "IAM users"
+    resource_fields = {"AccessKeyId": "access_key"}
+    services = SUPPORTED_SERVICES
+
+    def __init__(self, max_workers=MAX_PROVISIONING_WORKERS):
+        self.max_workers = max_workers
+        self.account_id = None
+
+    def prepare(self):
+        self.account_id = get_account_id()
+        if not self.account_id:
+            print("Unable to retrieve AWS account ID. Exiting.")
+            return False
+        return True
+
+    def prompt_settings(self):
+        workers_input = input(
+            f"Enter the number of concurrent provisioning workers (default {MAX_PROVISIONING_WORKERS}): "
+        ).strip()
+        if workers_input:
+            self.max_workers = int(workers_input)
+            # Clients are created on first use, after this, so their pools match the workers
+            aws_session.max_pool_connections = self.max_workers
+
+    def create_user(self, user_name):
+        return create_iam_user(user_name, self.account_id)
+
+    def create_users(self, user_names):
+        results = create_iam_users_concurrently(
+            user_names, self.account_id, self.max_workers, self.export_credentials
+        )
+        return [results[user_name] for user_name in user_names if results[user_name]]
+
+    def deploy(self, service_name, user):
+        deploy_cohort_stacks([service_name], [user])
+
+    def deploy_services(self, services, users):
+        deploy_cohort_stacks(services, users)
+
+    def inventory_records(self, user):
+        records = super().inventory_records(user)
+        records.extend(("stack", stack_name, {"user": user["UserName"]}) for stack_name in user.get("Stacks", []))
+        return records
+
+    def delete(self, user):
+        return delete_iam_user(user)
+
+    def delete_users(self, users):
+        delete_cohort_stacks(users)
+        return delete_iam_users_concurrently(users, self.max_workers)
+
+    def display(self, users):
+        display_iam_details(users)
+
+    def list_cloud_users(self):
+        return ({"UserName": user_name} for user_name in iter_iam_user_names())
+
+    def inventory_providers(self):
+        # Fan-out runs record users under `aws:<account id>`, which may be this same account
+        account_id = self.account_id or get_account_id()
+        return [self.name, f"{self.name}:{account_id}"] if account_id else [self.name]
+
+    def delete_orphans(self, users):
+        # Orphans were never journaled, so look up what still hangs off each one first
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = [submit_in_context(executor, describe_iam_user, user["UserName"]) for user in users]
+            users = [future.result() for future in futures]
+        delete_iam_users_concurrently(users, self.max_workers)
+
+def main():
+    run_cli(AWSProvider())
+
+if __name__ == "__main__":
+    main()
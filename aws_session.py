@@ -0,0 +1,147 @@
+"""Share one boto3 Session, its clients and its STS lookups across provisioning threads and accounts.
+
+An AWSSessionManager creates each service client once, with a connection
+pool as large as the worker pool that uses it, so concurrent calls reuse
+warm TLS connections instead of queueing for one or opening new ones.
+The caller identity is looked up once per IDENTITY_TTL, and roles in
+other accounts are assumed once and re-assumed shortly before their
+credentials expire:
+
+    manager = AWSSessionManager(max_pool_connections=32)
+    manager.account_id()
+    sandbox = manager.for_account("arn:aws:iam::210987654321:role/Provisioning", "eu-west-1")
+    sandbox.client("iam").list_users()
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+IDENTITY_TTL = 900  # Seconds a caller identity lookup is reused
+ASSUME_ROLE_DURATION = 3600  # Seconds assumed-role credentials are requested for
+CREDENTIAL_REFRESH_MARGIN = 300  # Seconds before expiry to assume a role again
+ROLE_SESSION_NAME = "cloud-services-provisioning"
+DEFAULT_MAX_POOL_CONNECTIONS = 10  # botocore's own default
+MAX_ASSUME_ROLE_WORKERS = 16
+
+
+def default_session_factory(**credentials):
+    """Return a boto3 Session for the given credentials and region."""
+    import boto3
+
+    return boto3.Session(**credentials)
+
+
+def client_config(max_pool_connections):
+    """Return the botocore Config every client is created with."""
+    from botocore.config import Config
+
+    return Config(max_pool_connections=max_pool_connections)
+
+
+class AWSSessionManager:
+    """One boto3 Session with shared clients, a cached caller identity and cached assumed roles.
+
+    boto3 clients are thread-safe but Session.client() is not, so clients
+    are created under a lock and then shared by every thread. Managers for
+    other accounts and regions come from `for_account` and draw their
+    credentials from the manager that created them.
+    """
+
+    def __init__(self, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS, region_name=None,
+                 session_factory=default_session_factory, role_arn=None, parent=None):
+        self.max_pool_connections = max_pool_connections
+        self.region_name = region_name
+        self.role_arn = role_arn
+        self._session_factory = session_factory
+        self._parent = parent
+        self._session = None
+        self._credentials = None
+        self._clients = {}
+        self._identity = None
+        self._identity_expires_at = 0
+        self._role_credentials = {}
+        self._role_locks = {}
+        self._accounts = {}
+        self._lock = threading.RLock()
+        self._identity_lock = threading.Lock()
+
+    def _current_session(self):
+        # Assumed-role managers rebuild their session, and its clients, whenever the role is re-assumed
+        credentials = self._parent.role_credentials(self.role_arn) if self.role_arn else None
+        if self._session is None or credentials is not self._credentials:
+            session_credentials = dict(credentials or {})
+            session_credentials.pop("expires_at", None)
+            self._session = self._session_factory(region_name=self.region_name, **session_credentials)
+            self._credentials = credentials
+            self._clients.clear()
+        return self._session
+
+    def client(self, service_name):
+        """Return the shared client for a service, creating it on first use."""
+        with self._lock:
+            session = self._current_session()
+            client = self._clients.get(service_name)
+            if client is None:
+                client = session.client(service_name, config=client_config(self.max_pool_connections))
+                self._clients[service_name] = client
+            return client
+
+    def caller_identity(self):
+        """Return the STS caller identity, looked up at most once per IDENTITY_TTL."""
+        with self._identity_lock:
+            if self._identity is None or time.time() >= self._identity_expires_at:
+                self._identity = self.client("sts").get_caller_identity()
+                self._identity_expires_at = time.time() + IDENTITY_TTL
+            return self._identity
+
+    def account_id(self):
+        """Return the ID of the account this manager's credentials belong to."""
+        return self.caller_identity()["Account"]
+
+    def role_credentials(self, role_arn):
+        """Return cached credentials for a role, assuming it again shortly before they expire.
+
+        Concurrent callers for the same role wait for one AssumeRole call
+        rather than each making their own.
+        """
+        with self._lock:
+            role_lock = self._role_locks.setdefault(role_arn, threading.Lock())
+        with role_lock:
+            credentials = self._role_credentials.get(role_arn)
+            if credentials is None or time.time() >= credentials["expires_at"] - CREDENTIAL_REFRESH_MARGIN:
+                response = self.client("sts").assume_role(
+                    RoleArn=role_arn, RoleSessionName=ROLE_SESSION_NAME, DurationSeconds=ASSUME_ROLE_DURATION
+                )["Credentials"]
+                credentials = {
+                    "aws_access_key_id": response["AccessKeyId"],
+                    "aws_secret_access_key": response["SecretAccessKey"],
+                    "aws_session_token": response["SessionToken"],
+                    "expires_at": response["Expiration"].timestamp(),
+                }
+                self._role_credentials[role_arn] = credentials
+            return credentials
+
+    def for_account(self, role_arn=None, region_name=None):
+        """Return the manager for a role (or these credentials, if None) in a region, creating it once."""
+        key = (role_arn, region_name or self.region_name)
+        with self._lock:
+            manager = self._accounts.get(key)
+            if manager is None:
+                manager = AWSSessionManager(
+                    self.max_pool_connections, key[1], self._session_factory, role_arn, self if role_arn else None
+                )
+                self._accounts[key] = manager
+            return manager
+
+    def assume_roles(self, role_arns, max_workers=MAX_ASSUME_ROLE_WORKERS):
+        """Assume many roles at once; return {role_arn: error} for the ones that failed."""
+        def assume(role_arn):
+            try:
+                self.role_credentials(role_arn)
+            except Exception as e:
+                return role_arn, e
+            return role_arn, None
+
+        role_arns = list(dict.fromkeys(role_arns))
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(role_arns)))) as executor:
+            return {role_arn: error for role_arn, error in executor.map(assume, role_arns) if error}
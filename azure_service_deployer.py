@@ -1,133 +1,637 @@
-import random
-import string
-import time
-from datetime import datetime, timedelta
-from azure.identity import ClientSecretCredential
-from azure.mgmt.authorization import AuthorizationManagementClient
-from azure.mgmt.compute import ComputeManagementClient
-from azure.mgmt.resource import ResourceManagementClient
-from azure.mgmt.storage import StorageManagementClient
-
-# Azure credentials
-tenant_id = "your-tenant-id"
-client_id = "your-client-id"
-client_secret = "your-client-secret"
-subscription_id = "your-subscription-id"
-
-# Initialize clients
-credentials = ClientSecretCredential(tenant_id, client_id, client_secret)
-auth_client = AuthorizationManagementClient(credentials, subscription_id)
-resource_client = ResourceManagementClient(credentials, subscription_id)
-compute_client = ComputeManagementClient(credentials, subscription_id)
-storage_client = StorageManagementClient(credentials, subscription_id)
-
-# List of Supported Azure Services
-SUPPORTED_SERVICES = [
-    "Azure Virtual Machines", "Azure Blob Storage", "Azure SQL Database", "Azure Active Directory",
-    "Azure Kubernetes Service", "Azure App Service", "Azure Functions", "Azure Virtual Networks"
-]
-
-def generate_password():
-    """Generate a random password for Azure users."""
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(random.choice(characters) for _ in range(12))
-
-def create_azure_user(user_name):
-    """Create an Azure AD user and return credentials."""
-    try:
-        # Here we simulate creating an Azure AD user
-        password = generate_password()
-        
-        # Normally we would use Azure Graph API to create users here, but for the sake of simulation,
-        # we just return the generated password as an Azure AD user.
-        login_url = f"https://portal.azure.com"
-        
-        # Simulate assigning a role (for example, Contributor)
-        role_assignment = {
-            "UserName": user_name,
-            "Password": password,
-            "Role": "Contributor",
-            "LoginURL": login_url
-        }
-
-        return role_assignment
-    except Exception as e:
-        print(f"Error creating Azure user {user_name}: {e}")
-        return None
-
-def deploy_azure_service(service_name, user):
-    """Simulate the deployment of Azure services for a given user."""
-    print(f"Deploying {service_name} for user {user['UserName']}...")
-    if service_name == "Azure Virtual Machines":
-        print(f"Simulated Azure VM creation for user {user['UserName']}.")
-    elif service_name == "Azure Blob Storage":
-        storage_account = f"user{user['UserName']}-storage-{random.randint(1000, 9999)}"
-        print(f"Simulated Blob Storage creation: {storage_account}.")
-    else:
-        print(f"{service_name} deployment simulation completed.")
-
-def display_azure_details(users):
-    """Display Azure user credentials in the Bash console."""
-    print("\nAzure User Details:")
-    print("=" * 50)
-    for user in users:
-        print(f"User Name: {user['UserName']}")
-        print(f"Password: {user['Password']}")
-        print(f"Role: {user['Role']}")
-        print(f"Login URL: {user['LoginURL']}")
-        print("=" * 50)
-
-def main():
-    print("Supported Azure Services:")
-    for idx, service in enumerate(SUPPORTED_SERVICES, start=1):
-        print(f"{idx}. {service}")
-    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
-    services_input = input("Services: ").strip()
-    
-    try:
-        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
-        selected_services = [SUPPORTED_SERVICES[i] for i in selected_indices if 0 <= i < len(SUPPORTED_SERVICES)]
-    except ValueError:
-        print("Invalid input. Please enter valid service numbers.")
-        return
-    
-    if not selected_services:
-        print("No services selected. Exiting.")
-        return
-
-    azure_user_count = int(input("Enter the number of Azure users to create: "))
-    duration_days = int(input("Enter the number of days to run services: "))
-    duration_hours = int(input("Enter the number of hours to run services: "))
-
-    users = []
-    for i in range(azure_user_count):
-        user_name = f"user-{i+1}"
-        credentials = create_azure_user(user_name)
-        if credentials:
-            users.append(credentials)
-
-    # Display Azure user details
-    display_azure_details(users)
-
-    # Deploy services for each Azure user
-    for user in users:
-        for service in selected_services:
-            deploy_azure_service(service, user)
-
-    # Simulate resource lifecycle
-    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
-    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    while datetime.now() < end_time:
-        time.sleep(10)  # Simulating active resources
-
-    print("\nTime's up! Cleaning up Azure users...")
-
-    # Simulate cleanup (for actual deletion, we would interact with Azure AD)
-    for user in users:
-        print(f"Deleted Azure user: {user['UserName']}")
-
-    print("\nCleanup completed.")
-
-if __name__ == "__main__":
-    main()
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, urlsplit
+from cloud_provider import CloudProvider, lazy_client, load_service_catalog, run_cli
+from credential_generator import generate_passwords, unique_name
+from credential_export import MAX_DISPLAYED_USERS, print_truncation_note, redact
+from rate_limiter import ConcurrencyGovernor, is_throttling_error
+
+# Azure credentials
+tenant_id = "your-tenant-id"
+client_id = "your-client-id"
+client_secret = "your-client-secret"
+subscription_id = "your-subscription-id"
+
+# Clients (created on first use)
+@lazy_client
+def get_credentials():
+    """Return the process-wide Azure credential."""
+    from azure.identity import ClientSecretCredential
+    return ClientSecretCredential(tenant_id, client_id, client_secret)
+
+@lazy_client
+def get_auth_client():
+    """Return the process-wide authorization management client."""
+    from azure.mgmt.authorization import AuthorizationManagementClient
+    return AuthorizationManagementClient(get_credentials(), subscription_id)
+
+@lazy_client
+def get_resource_client():
+    """Return the process-wide resource management client."""
+    from azure.mgmt.resource import ResourceManagementClient
+    return ResourceManagementClient(get_credentials(), subscription_id)
+
+# List of Supported Azure Services
+SUPPORTED_SERVICES = load_service_catalog("azure")
+
+# Microsoft Graph settings
+GRAPH_ENDPOINT = "https://graph.microsoft.com/v1.0"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+GRAPH_TIMEOUT = 30  # Seconds per HTTP request
+GRAPH_BATCH_SIZE = 20  # Largest $batch Graph accepts
+GRAPH_MEMBERS_PER_PATCH = 20  # Largest members@odata.bind list in one group PATCH
+# Methods safe to resend when a kept-alive connection drops mid-request
+GRAPH_IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+MAX_GRAPH_WORKERS = 8  # $batch calls in flight at once
+TOKEN_REFRESH_MARGIN = 300  # Seconds before expiry to fetch a new token
+LIST_PAGE_SIZE = 999  # Largest page /users returns
+USER_DOMAIN = "your-tenant.onmicrosoft.com"
+LOGIN_URL = "https://portal.azure.com"
+
+# Role granted to each cohort's group at subscription scope
+COHORT_ROLE_NAME = "Contributor"
+CONTRIBUTOR_ROLE_ID = "b24988ac-6180-42a0-ab88-20f7382dd24c"
+# New groups take a moment to replicate to ARM; retry the role assignment meanwhile
+MAX_ROLE_ASSIGNMENT_RETRIES = 5
+ROLE_ASSIGNMENT_RETRY_DELAY = 2.0  # Seconds; doubled on every retry
+
+# ARM deployments: one template per resource group covers every user's resources
+LOCATION = "eastus"
+RESOURCE_GROUP_PREFIX = "rg-cohort"
+# A template holds at most 800 resources and a copy loop 800 iterations; VMs take two per user
+USERS_PER_RESOURCE_GROUP = 250
+MAX_DEPLOYMENT_WORKERS = 8  # Resource groups created and deployments started at once
+DEPLOYMENT_POLL_INTERVAL = 5  # Seconds between status checks of the running deployments
+VM_SIZE = "Standard_B1s"
+VM_ADMIN_USERNAME = "azureuser"
+VM_IMAGE = {
+    "publisher": "Canonical",
+    "offer": "0001-com-ubuntu-server-jammy",
+    "sku": "22_04-lts-gen2",
+    "version": "latest",
+}
+
+# Graph and ARM calls each go through a governor that adapts concurrency to throttling
+graph_governor = ConcurrencyGovernor()
+arm_governor = ConcurrencyGovernor()
+
+# One token serves every Graph call until it nears expiry
+_graph_token = {"token": None, "expires_on": 0}
+_graph_token_lock = threading.Lock()
+
+# Keep-alive Graph connection per worker thread
+_graph_local = threading.local()
+
+class GraphError(Exception):
+    """A failed Graph call; `status` is the HTTP status."""
+
+    def __init__(self, status, code, message, retry_after=None):
+        super().__init__(f"Graph request failed ({status} {code}): {message}")
+        self.status = status
+        self.code = code
+        self.retry_after = retry_after
+
+def get_graph_token():
+    """Return a Graph access token from ClientSecretCredential, reused until shortly before it expires."""
+    with _graph_token_lock:
+        if time.time() >= _graph_token["expires_on"] - TOKEN_REFRESH_MARGIN:
+            access_token = get_credentials().get_token(GRAPH_SCOPE)
+            _graph_token.update(token=access_token.token, expires_on=access_token.expires_on)
+        return _graph_token["token"]
+
+def get_graph_connection():
+    """Return this thread's keep-alive connection to the Graph endpoint."""
+    import http.client
+    endpoint = urlsplit(GRAPH_ENDPOINT)
+    connection = getattr(_graph_local, "connection", None)
+    if connection is None or _graph_local.netloc != endpoint.netloc:
+        if endpoint.scheme == "https":
+            connection = http.client.HTTPSConnection(endpoint.netloc, timeout=GRAPH_TIMEOUT)
+        else:
+            connection = http.client.HTTPConnection(endpoint.netloc, timeout=GRAPH_TIMEOUT)
+        _graph_local.connection = connection
+        _graph_local.netloc = endpoint.netloc
+    return connection
+
+def graph_error(status, body, retry_after=None):
+    """Build a GraphError from an error response body."""
+    error = (body or {}).get("error", {})
+    return GraphError(status, error.get("code"), error.get("message"), retry_after)
+
+def graph_request(method, path, body=None):
+    """Send one Graph request and return its decoded JSON body, raising GraphError on failure.
+
+    A dropped keep-alive connection is reopened and the request resent
+    only for idempotent methods: a POST (a $batch of creates) may already
+    have been applied, so its failure is raised instead.
+    """
+    import http.client
+    headers = {"Authorization": f"Bearer {get_graph_token()}", "Content-Type": "application/json"}
+    payload = json.dumps(body).encode() if body is not None else None
+    url = urlsplit(GRAPH_ENDPOINT).path.rstrip("/") + path
+    for attempt in range(2):
+        connection = get_graph_connection()
+        try:
+            connection.request(method, url, body=payload, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            break
+        except (http.client.HTTPException, OSError):
+            # The server closed the kept-alive connection; reconnect once
+            connection.close()
+            _graph_local.connection = None
+            if attempt or method not in GRAPH_IDEMPOTENT_METHODS:
+                raise
+    decoded = json.loads(data) if data else {}
+    if response.status >= 400:
+        raise graph_error(response.status, decoded, response.getheader("Retry-After"))
+    return decoded
+
+def graph_batch(requests):
+    """Send up to GRAPH_BATCH_SIZE requests in one $batch call; return a (status, body) per request.
+
+    The call holds one graph_governor slot and counts as throttled if any
+    request in it was. Throttled requests are resent in a smaller batch
+    after a jittered backoff that honours Retry-After.
+    """
+    pending = {str(index): request for index, request in enumerate(requests)}
+    results = {}
+    for attempt in range(graph_governor.max_retries + 1):
+        batch = {"requests": [
+            dict(request, id=request_id, headers={"Content-Type": "application/json"})
+            if "body" in request else dict(request, id=request_id)
+            for request_id, request in pending.items()
+        ]}
+        retry_after = 0
+        started = graph_governor.acquire()
+        try:
+            responses = graph_request("POST", "/$batch", batch)["responses"]
+        except Exception as e:
+            graph_governor.release(started, is_throttling_error(e))
+            if not is_throttling_error(e) or attempt == graph_governor.max_retries:
+                raise
+            retry_after = float(getattr(e, "retry_after", None) or 0)
+        else:
+            throttled = {}
+            for response in responses:
+                if response["status"] == 429 and attempt < graph_governor.max_retries:
+                    throttled[response["id"]] = pending[response["id"]]
+                    retry_after = max(retry_after, float(response.get("headers", {}).get("Retry-After", 0)))
+                else:
+                    results[response["id"]] = (response["status"], response.get("body") or {})
+            graph_governor.release(started, bool(throttled))
+            if not throttled:
+                break
+            pending = throttled
+        delay = graph_governor.base_delay * (2 ** attempt)
+        time.sleep(max(retry_after, delay + random.uniform(0, delay)))
+    return [results[str(index)] for index in range(len(requests))]
+
+def run_graph_batches(requests, on_results=None, max_workers=MAX_GRAPH_WORKERS):
+    """Send requests in $batch calls of GRAPH_BATCH_SIZE, several calls at a time.
+
+    Returns a (status, body) per request, in order; requests whose whole
+    $batch call failed get status None. `on_results` is called with
+    (first index, results) as each call completes.
+    """
+    results = [None] * len(requests)
+    starts = range(0, len(requests), GRAPH_BATCH_SIZE)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(starts)))) as executor:
+        futures = {
+            executor.submit(graph_batch, requests[start:start + GRAPH_BATCH_SIZE]): start
+            for start in starts
+        }
+        for future in as_completed(futures):
+            start = futures[future]
+            size = len(requests[start:start + GRAPH_BATCH_SIZE])
+            try:
+                chunk = future.result()
+            except Exception as e:
+                chunk = [(None, {"error": {"code": type(e).__name__, "message": str(e)}})] * size
+            results[start:start + size] = chunk
+            if on_results:
+                on_results(start, chunk)
+    return results
+
+def error_message(body):
+    """Return the message of a Graph error body."""
+    error = (body or {}).get("error", {})
+    return f"{error.get('code')}: {error.get('message')}"
+
+def create_azure_users(user_names, on_created=None):
+    """Create Azure AD users through Graph $batch calls and return the credentials of those created.
+
+    20 users go in each $batch call and several calls run at once, so a
+    1000-user cohort takes 50 HTTP requests. `on_created` is called with
+    each user's credentials as soon as its batch returns.
+    """
+    passwords = generate_passwords(len(user_names), "azure")
+    requests = [
+        {"method": "POST", "url": "/users", "body": {
+            "accountEnabled": True,
+            "displayName": user_name,
+            "mailNickname": user_name,
+            "userPrincipalName": f"{user_name}@{USER_DOMAIN}",
+            "passwordProfile": {"password": password, "forceChangePasswordNextSignIn": False},
+        }}
+        for user_name, password in zip(user_names, passwords)
+    ]
+    users = [None] * len(user_names)
+
+    def collect(start, results):
+        for index, (status, body) in enumerate(results, start):
+            if status != 201:
+                print(f"Error creating Azure user {user_names[index]}: {error_message(body)}")
+                continue
+            users[index] = {
+                "UserName": user_names[index],
+                "UserId": body["id"],
+                "UserPrincipalName": body["userPrincipalName"],
+                "Password": passwords[index],
+                "Role": COHORT_ROLE_NAME,
+                "LoginURL": LOGIN_URL
+            }
+            if on_created:
+                on_created(users[index])
+
+    run_graph_batches(requests, collect)
+    created = [user for user in users if user]
+    print(f"Created {len(created)} of {len(user_names)} Azure users.")
+    return created
+
+def create_cohort_group(group_name):
+    """Create the security group that every user of a cohort joins and return its object ID."""
+    group = graph_governor.call(graph_request, "POST", "/groups", {
+        "displayName": group_name,
+        "mailEnabled": False,
+        "mailNickname": group_name,
+        "securityEnabled": True,
+    })
+    print(f"Created Azure AD group: {group_name}")
+    return group["id"]
+
+def add_users_to_group(users, group_id):
+    """Add users to a group, 20 per PATCH and 20 PATCHes per $batch call; return the number added."""
+    chunks = [
+        users[start:start + GRAPH_MEMBERS_PER_PATCH] for start in range(0, len(users), GRAPH_MEMBERS_PER_PATCH)
+    ]
+    requests = [
+        {"method": "PATCH", "url": f"/groups/{group_id}", "body": {
+            "members@odata.bind": [f"{GRAPH_ENDPOINT}/directoryObjects/{user['UserId']}" for user in chunk]
+        }}
+        for chunk in chunks
+    ]
+    added = 0
+    for chunk, (status, body) in zip(chunks, run_graph_batches(requests)):
+        if status == 204:
+            added += len(chunk)
+        else:
+            print(f"Error adding {len(chunk)} users to group {group_id}: {error_message(body)}")
+    return added
+
+def assign_group_role(group_id, role_definition_id=CONTRIBUTOR_ROLE_ID):
+    """Assign a role to a group at subscription scope and return the role assignment ID."""
+    scope = f"/subscriptions/{subscription_id}"
+    role_definitions = f"{scope}/providers/Microsoft.Authorization/roleDefinitions"
+    parameters = {
+        "role_definition_id": f"{role_definitions}/{role_definition_id}",
+        "principal_id": group_id,
+        "principal_type": "Group",
+    }
+    for attempt in range(MAX_ROLE_ASSIGNMENT_RETRIES):
+        try:
+            assignment = arm_governor.call(
+                get_auth_client().role_assignments.create, scope, str(uuid.uuid4()), parameters
+            )
+            return assignment.id
+        except Exception as e:
+            if "PrincipalNotFound" not in str(e) or attempt == MAX_ROLE_ASSIGNMENT_RETRIES - 1:
+                raise
+            time.sleep(ROLE_ASSIGNMENT_RETRY_DELAY * (2 ** attempt))
+
+def assign_cohort_role(users):
+    """Grant a cohort its role through one group and one role assignment.
+
+    However large the cohort, this is one group, one role assignment and
+    a $batch call per 400 members. Each user dict is annotated with the
+    group and role assignment IDs so cleanup can find them again.
+    """
+    group_name = f"cohort-{uuid.uuid4().hex[:8]}"
+    try:
+        group_id = create_cohort_group(group_name)
+        for user in users:
+            user["GroupId"] = group_id
+        added = add_users_to_group(users, group_id)
+        assignment_id = assign_group_role(group_id)
+    except Exception as e:
+        print(f"Error granting {COHORT_ROLE_NAME} to {group_name}: {e}")
+        return
+    for user in users:
+        user["RoleAssignmentId"] = assignment_id
+    print(f"Added {added} of {len(users)} users to {group_name} and assigned it {COHORT_ROLE_NAME}.")
+
+def storage_account_name(user_name):
+    """Return a unique storage account name (3-24 lowercase letters and digits) for a user."""
+    suffix = re.sub(r"[^a-z0-9]", "", unique_name("").lower())
+    base = re.sub(r"[^a-z0-9]", "", f"st{user_name}".lower())
+    return base[:24 - len(suffix)] + suffix
+
+def storage_resources():
+    """Return the template resources that give every user a Blob Storage account."""
+    return [{
+        "type": "Microsoft.Storage/storageAccounts",
+        "apiVersion": "2023-01-01",
+        "name": "[parameters('storageAccountNames')[copyIndex()]]",
+        "location": "[parameters('location')]",
+        "sku": {"name": "Standard_LRS"},
+        "kind": "StorageV2",
+        "properties": {"minimumTlsVersion": "TLS1_2", "allowBlobPublicAccess": False},
+        "copy": {"name": "storageLoop", "count": "[length(parameters('userNames'))]"},
+    }]
+
+def vm_resources():
+    """Return the template resources that give every user a VM on one shared virtual network."""
+    nic_name = "concat('nic-', parameters('userNames')[copyIndex()])"
+    nic_id = f"[resourceId('Microsoft.Network/networkInterfaces', {nic_name})]"
+    return [
+        {
+            "type": "Microsoft.Network/virtualNetworks",
+            "apiVersion": "2023-04-01",
+            "name": "cohort-vnet",
+            "location": "[parameters('location')]",
+            "properties": {
+                "addressSpace": {"addressPrefixes": ["10.0.0.0/16"]},
+                "subnets": [{"name": "default", "properties": {"addressPrefix": "10.0.0.0/22"}}],
+            },
+        },
+        {
+            "type": "Microsoft.Network/networkInterfaces",
+            "apiVersion": "2023-04-01",
+            "name": f"[{nic_name}]",
+            "location": "[parameters('location')]",
+            "dependsOn": ["[resourceId('Microsoft.Network/virtualNetworks', 'cohort-vnet')]"],
+            "properties": {"ipConfigurations": [{"name": "ipconfig1", "properties": {
+                "privateIPAllocationMethod": "Dynamic",
+                "subnet": {
+                    "id": "[resourceId('Microsoft.Network/virtualNetworks/subnets', 'cohort-vnet', 'default')]"
+                },
+            }}]},
+            "copy": {"name": "nicLoop", "count": "[length(parameters('userNames'))]"},
+        },
+        {
+            "type": "Microsoft.Compute/virtualMachines",
+            "apiVersion": "2023-03-01",
+            "name": "[concat('vm-', parameters('userNames')[copyIndex()])]",
+            "location": "[parameters('location')]",
+            "dependsOn": [nic_id],
+            "properties": {
+                "hardwareProfile": {"vmSize": "[parameters('vmSize')]"},
+                "osProfile": {
+                    "computerName": "[concat('vm-', parameters('userNames')[copyIndex()])]",
+                    "adminUsername": "[parameters('adminUsername')]",
+                    "adminPassword": "[parameters('adminPasswords').values[copyIndex()]]",
+                },
+                "storageProfile": {
+                    "imageReference": VM_IMAGE,
+                    "osDisk": {"createOption": "FromImage", "deleteOption": "Delete"},
+                },
+                "networkProfile": {"networkInterfaces": [{"id": nic_id}]},
+            },
+            "copy": {"name": "vmLoop", "count": "[length(parameters('userNames'))]"},
+        },
+    ]
+
+# Services the cohort template can deploy -> function returning their template resources
+TEMPLATE_SERVICES = {
+    "Azure Blob Storage": storage_resources,
+    "Azure Virtual Machines": vm_resources,
+}
+
+def render_cohort_template(services):
+    """Return an ARM template that deploys the given services once per user, using copy loops."""
+    parameters = {
+        "location": {"type": "string"},
+        "userNames": {"type": "array"},
+    }
+    if "Azure Blob Storage" in services:
+        parameters["storageAccountNames"] = {"type": "array"}
+    if "Azure Virtual Machines" in services:
+        parameters.update(
+            vmSize={"type": "string", "defaultValue": VM_SIZE},
+            adminUsername={"type": "string", "defaultValue": VM_ADMIN_USERNAME},
+            adminPasswords={"type": "secureObject"},
+        )
+    return {
+        "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#",
+        "contentVersion": "1.0.0.0",
+        "parameters": parameters,
+        "resources": [resource for service in services for resource in TEMPLATE_SERVICES[service]()],
+    }
+
+def template_parameters(services, users):
+    """Return the deployment parameters for one resource group's users, recording storage names on them."""
+    parameters = {
+        "location": {"value": LOCATION},
+        "userNames": {"value": [user["UserName"] for user in users]},
+    }
+    if "Azure Blob Storage" in services:
+        names = [storage_account_name(user["UserName"]) for user in users]
+        for user, name in zip(users, names):
+            user.setdefault("Buckets", []).append(name)
+        parameters["storageAccountNames"] = {"value": names}
+    if "Azure Virtual Machines" in services:
+        parameters["adminPasswords"] = {"value": {"values": [user["Password"] for user in users]}}
+    return parameters
+
+def start_deployment(resource_group, services, users):
+    """Create a resource group and start the deployment of its users' template; return the poller."""
+    client = get_resource_client()
+    arm_governor.call(client.resource_groups.create_or_update, resource_group, {"location": LOCATION})
+    deployment = {"properties": {
+        "mode": "Incremental",
+        "template": render_cohort_template(services),
+        "parameters": template_parameters(services, users),
+    }}
+    poller = arm_governor.call(
+        client.deployments.begin_create_or_update, resource_group, unique_name("cohort"), deployment
+    )
+    for user in users:
+        user["ResourceGroup"] = resource_group
+    return poller
+
+def wait_for_pollers(pollers):
+    """Poll long-running operations together until all finish; return {key: (result, error)}."""
+    pending = dict(pollers)
+    outcomes = {}
+    while pending:
+        for key, poller in list(pending.items()):
+            if not poller.done():
+                continue
+            del pending[key]
+            try:
+                outcomes[key] = (poller.result(), None)
+            except Exception as e:
+                outcomes[key] = (None, e)
+        if pending:
+            time.sleep(DEPLOYMENT_POLL_INTERVAL)
+    return outcomes
+
+def deploy_cohort_resources(services, users, resource_group=None):
+    """Deploy the templated services for a cohort: one deployment per resource group, polled together.
+
+    Users are split into new resource groups of USERS_PER_RESOURCE_GROUP,
+    unless `resource_group` names an existing one to deploy them all into.
+    """
+    for service in services:
+        if service not in TEMPLATE_SERVICES:
+            print(f"{service} is not part of the cohort template yet; skipped.")
+    services = [service for service in services if service in TEMPLATE_SERVICES]
+    if not services or not users:
+        return
+    if resource_group:
+        chunks = {resource_group: users}
+    else:
+        chunks = {
+            unique_name(RESOURCE_GROUP_PREFIX): users[start:start + USERS_PER_RESOURCE_GROUP]
+            for start in range(0, len(users), USERS_PER_RESOURCE_GROUP)
+        }
+    pollers = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_DEPLOYMENT_WORKERS, len(chunks)))) as executor:
+        futures = {
+            executor.submit(start_deployment, resource_group, services, chunk): resource_group
+            for resource_group, chunk in chunks.items()
+        }
+        for future in as_completed(futures):
+            resource_group = futures[future]
+            try:
+                pollers[resource_group] = future.result()
+                print(f"Started deployment of {', '.join(services)} to {resource_group}.")
+            except Exception as e:
+                print(f"Error starting deployment to {resource_group}: {e}")
+    for resource_group, (result, error) in wait_for_pollers(pollers).items():
+        if error:
+            print(f"Deployment to {resource_group} failed: {error}")
+        else:
+            print(f"Deployed {', '.join(services)} for {len(chunks[resource_group])} users in {resource_group}.")
+
+def display_azure_details(users):
+    """Display Azure user details in the Bash console with secrets redacted."""
+    print("\nAzure User Details:")
+    print("=" * 50)
+    for user in users[:MAX_DISPLAYED_USERS]:
+        print(f"User Name: {user['UserName']}")
+        print(f"Password: {redact(user['Password'])}")
+        print(f"Role: {user['Role']}")
+        print(f"Login URL: {user['LoginURL']}")
+        print("=" * 50)
+    print_truncation_note(users)
+
+def delete_azure_users(users):
+    """Delete Azure AD users through Graph $batch calls and return {user name: deleted}."""
+    requests = [{"method": "DELETE", "url": f"/users/{user['UserId']}"} for user in users]
+    results = {}
+    for user, (status, body) in zip(users, run_graph_batches(requests)):
+        # 404: already gone
+        results[user["UserName"]] = status in (204, 404)
+        if not results[user["UserName"]]:
+            print(f"Error deleting Azure user {user['UserName']}: {error_message(body)}")
+    print(f"Deleted {sum(results.values())} of {len(users)} Azure users.")
+    return results
+
+def delete_resource_groups(users):
+    """Delete the resource groups recorded on a cohort's users, waiting on all deletions together."""
+    pollers = {}
+    for resource_group in {user["ResourceGroup"] for user in users if user.get("ResourceGroup")}:
+        try:
+            pollers[resource_group] = arm_governor.call(get_resource_client().resource_groups.begin_delete,
+                                                        resource_group)
+        except Exception as e:
+            print(f"Error deleting resource group {resource_group}: {e}")
+    for resource_group, (result, error) in wait_for_pollers(pollers).items():
+        if error:
+            print(f"Error deleting resource group {resource_group}: {error}")
+        else:
+            print(f"Deleted resource group: {resource_group}")
+
+def delete_cohort_role(users):
+    """Delete the role assignments and groups recorded on a cohort's users."""
+    for assignment_id in {user["RoleAssignmentId"] for user in users if user.get("RoleAssignmentId")}:
+        scope, assignment_name = assignment_id.split("/providers/Microsoft.Authorization/roleAssignments/")
+        try:
+            arm_governor.call(get_auth_client().role_assignments.delete, scope, assignment_name)
+        except Exception as e:
+            print(f"Error deleting role assignment {assignment_id}: {e}")
+    for group_id in {user["GroupId"] for user in users if user.get("GroupId")}:
+        try:
+            graph_governor.call(graph_request, "DELETE", f"/groups/{group_id}")
+            print(f"Deleted Azure AD group: {group_id}")
+        except Exception as e:
+            print(f"Error deleting group {group_id}: {e}")
+
+def iter_azure_users(user_prefix):
+    """Yield the Graph user objects whose UPN starts with `<user_prefix>-`, one page at a time."""
+    user_filter = quote(f"startswith(userPrincipalName,'{user_prefix}-')")
+    path = f"/users?$select=id,userPrincipalName&$top={LIST_PAGE_SIZE}&$filter={user_filter}"
+    while path:
+        page = graph_governor.call(graph_request, "GET", path)
+        yield from page.get("value", [])
+        next_link = page.get("@odata.nextLink")
+        path = next_link[len(GRAPH_ENDPOINT):] if next_link else None
+
+class AzureProvider(CloudProvider):
+    """Azure AD (Microsoft Graph) implementation of the provider interface."""
+
+    name = "azure"
+    label = "Azure"
+    user_label = "Azure users"
+    resource_fields = {"GroupId": "group", "RoleAssignmentId": "role_assignment", "ResourceGroup": "resource_group"}
+    services = SUPPORTED_SERVICES
+
+    def create_user(self, user_name):
+        users = create_azure_users([user_name])
+        return users[0] if users else None
+
+    def create_users(self, user_names):
+        return create_azure_users(user_names, self.export_credentials)
+
+    def attach_policy(self, user):
+        assign_cohort_role([user])
+
+    def attach_policies(self, users):
+        if users:
+            assign_cohort_role(users)
+
+    def deploy(self, service_name, user):
+        deploy_cohort_resources([service_name], [user], user.get("ResourceGroup"))
+
+    def deploy_services(self, services, users):
+        deploy_cohort_resources(services, users)
+
+    def delete(self, user):
+        # Leaves the cohort group and role assignment in place for the remaining users
+        return delete_azure_users([user])[user["UserName"]]
+
+    def delete_users(self, users):
+        delete_resource_groups(users)
+        delete_cohort_role(users)
+        return delete_azure_users(users)
+
+    def display(self, users):
+        display_azure_details(users)
+
+    def list_cloud_users(self):
+        return (
+            {"UserName": user["userPrincipalName"].split("@")[0], "UserId": user["id"]}
+            for user in iter_azure_users(self.user_prefix)
+        )
+
+def main():
+    run_cli(AzureProvider())
+
+if __name__ == "__main__":
+    main()
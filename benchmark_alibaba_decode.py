@@ -0,0 +1,86 @@
+"""Compare per-user RAM response decoding: the old eval() path against json.loads."""
+import argparse
+import json
+import time
+import uuid
+
+import alibaba_ram_service_simulation as alibaba
+
+
+def sample_responses(count):
+    """Build raw CreateUser and CreateAccessKey response bodies like the RAM API returns."""
+    responses = []
+    for i in range(count):
+        user_name = f"user-{i+1}"
+        create_user = {
+            "RequestId": str(uuid.uuid4()).upper(),
+            "User": {
+                "UserId": str(uuid.uuid4().int)[:16],
+                "UserName": user_name,
+                "DisplayName": user_name,
+                "MobilePhone": "",
+                "Email": "",
+                "Comments": "",
+                "CreateDate": "2024-01-23T12:33:18Z",
+            },
+        }
+        create_access_key = {
+            "RequestId": str(uuid.uuid4()).upper(),
+            "AccessKey": {
+                "AccessKeyId": "LTAI" + uuid.uuid4().hex[:20],
+                "AccessKeySecret": uuid.uuid4().hex,
+                "Status": "Active",
+                "CreateDate": "2024-01-23T12:33:18Z",
+            },
+        }
+        responses.append((json.dumps(create_user).encode(), json.dumps(create_access_key).encode()))
+    return responses
+
+
+def decode_with_eval(responses):
+    """The original path: eval() the access key response bytes."""
+    for _, access_key_response in responses:
+        access_key_data = eval(access_key_response)
+        access_key_data["AccessKey"]["AccessKeyId"]
+
+
+def decode_with_json(responses):
+    """The new path: json.loads both bodies and build typed results."""
+    for user_response, access_key_response in responses:
+        alibaba.parse_user(alibaba.decode_response(user_response))
+        alibaba.parse_access_key(alibaba.decode_response(access_key_response))
+
+
+def best_time(func, responses, repeats):
+    """Return the fastest of `repeats` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(responses)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    responses = sample_responses(args.users)
+    eval_time = best_time(decode_with_eval, responses, args.repeats)
+    json_time = best_time(decode_with_json, responses, args.repeats)
+    print(f"{args.users} users")
+    print(f"  eval (access key only):    {eval_time * 1e6 / args.users:7.2f} us/user")
+    print(f"  json.loads (both, typed):  {json_time * 1e6 / args.users:7.2f} us/user")
+    print(f"  speedup:                   {eval_time / json_time:7.1f}x")
+
+    # eval() cannot even read JSON literals such as true/false/null
+    try:
+        eval(b'{"IsTruncated": false}')
+    except NameError as e:
+        print(f"  eval on a body containing false: {e}")
+
+
+if __name__ == "__main__":
+    main()
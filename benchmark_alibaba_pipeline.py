@@ -0,0 +1,90 @@
+"""Measure RAM provisioning and teardown throughput against a fake AcsClient.
+
+Compares the original one-user-at-a-time flow with the pipelined executor
+and parallel teardown. The fake client enforces a per-second quota so the
+effect of the shared token bucket is visible in the throttled-call count.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from fake_clouds import FakeAcsClient, install_fake_ram_requests
+from provisioning_journal import ProvisioningJournal
+
+install_fake_ram_requests()
+import alibaba_ram_service_simulation as alibaba  # noqa: E402
+
+
+def sequential_provision(user_names):
+    """The original main() loop: create, key and attach one user at a time."""
+    users = []
+    for user_name in user_names:
+        credentials = alibaba.create_ram_user(user_name)
+        if credentials:
+            alibaba.assign_policy_to_user(user_name)
+            users.append(credentials)
+    return users
+
+
+def pipelined_provision(user_names):
+    """The pipelined executor, returning credentials in cohort order."""
+    results = alibaba.provision_ram_users_pipelined(user_names)
+    return [results[user_name] for user_name in user_names if results[user_name]]
+
+
+def sequential_teardown(users):
+    """The original cleanup loop: delete one user at a time."""
+    for user in users:
+        alibaba.delete_ram_user(user["UserName"], user["AccessKeyId"])
+
+
+def timed(func, *args):
+    """Run `func` with its console output suppressed and return (result, seconds)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark(user_count, latency, qps_quota, journal_dir):
+    """Provision and tear down one cohort in each mode and print the throughput."""
+    user_names = [f"user-{i+1}" for i in range(user_count)]
+    modes = [
+        ("sequential", sequential_provision, sequential_teardown),
+        ("pipelined", pipelined_provision, alibaba.delete_ram_users_parallel),
+    ]
+    for mode, provision, teardown in modes:
+        client = FakeAcsClient(latency=latency, qps_quota=qps_quota)
+        alibaba.get_acs_client = lambda: client
+        alibaba.provisioning_journal = ProvisioningJournal(
+            os.path.join(journal_dir, f"{mode}-{user_count}.jsonl")
+        )
+        users, provision_time = timed(provision, user_names)
+        _, teardown_time = timed(teardown, users)
+        print(f"{user_count:>6} users  {mode:<10}  provision {provision_time:7.2f}s "
+              f"({len(users) / provision_time:7.1f} users/s)  teardown {teardown_time:7.2f}s  "
+              f"calls={client.calls}  throttled={client.throttled}  leftover={len(client.users)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAM provisioning against a fake AcsClient.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake RAM call")
+    parser.add_argument("--qps", type=float, default=alibaba.RAM_QPS_LIMIT,
+                        help="Client-side token bucket rate")
+    parser.add_argument("--quota", type=int, default=None,
+                        help="Server-side calls allowed per second (default: unlimited)")
+    args = parser.parse_args()
+
+    alibaba.ram_rate_limiter = alibaba.TokenBucket(args.qps)
+    alibaba.ram_governor.base_delay = 0.05
+    with tempfile.TemporaryDirectory() as journal_dir:
+        for count in args.counts:
+            benchmark(count, args.latency, args.quota, journal_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare deploying AWS services per (user, service) pair with one CloudFormation stack per cohort slice.
+
+Both modes run against the fake CloudFormation client in fake_clouds,
+where every call takes `--latency` seconds and every stack takes
+`--operation-time` seconds to create or delete.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import aws_service_selector as aws
+from fake_clouds import FakeCloudFormationClient
+from rate_limiter import ConcurrencyGovernor
+
+SERVICES = ["Amazon S3", "Amazon EC2", "Amazon SQS"]
+
+
+def per_pair(users):
+    """The CloudProvider.deploy_services loop: one stack per user and service, each waited on in turn."""
+    provider = aws.AWSProvider()
+    for user in users:
+        for service in SERVICES:
+            provider.deploy(service, user)
+
+
+def cohort_stacks(users):
+    """AWSProvider.deploy_services: a few stacks covering the whole cohort, created together."""
+    aws.AWSProvider().deploy_services(SERVICES, users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds per fake CloudFormation call")
+    parser.add_argument("--operation-time", type=float, default=0.05, help="Seconds each stack operation runs")
+    args = parser.parse_args()
+    aws.STACK_POLL_INTERVAL = args.operation_time / 5
+
+    print(f"{args.users} users x {len(SERVICES)} services")
+    for mode, run in (("one stack per pair (old)", per_pair), ("stacks per cohort", cohort_stacks)):
+        client = FakeCloudFormationClient(args.latency, operation_time=args.operation_time)
+        aws.get_cloudformation_client = lambda: client
+        aws.cloudformation_governor = ConcurrencyGovernor(base_delay=args.latency)
+        users = [{"UserName": f"user-{i+1}"} for i in range(args.users)]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(users)
+        elapsed = time.perf_counter() - start
+        stacks = len(client.stacks)
+        resources = client.live_resources()
+        calls = client.calls
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            aws.delete_cohort_stacks(users)
+        teardown = time.perf_counter() - start
+        print(f"  {mode:26} {elapsed:7.2f}s  calls={calls:<5} stacks={stacks:<4} resources={resources:<5} "
+              f"teardown {teardown:5.2f}s  left={len(client.stacks)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Compare provisioning sandbox accounts one after another with aws_fanout's parallel fan-out.
+
+Every account is a set of fakes from fake_clouds.FakeAWSAccounts; each
+account throttles on its own, as IAM quotas are per account. The
+sequential mode is the old workflow of running the script once per
+account, with the same per-account worker pool. With --services, every
+account also deploys one stack per region in each of --regions.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import aws_fanout
+import aws_service_selector as aws
+import fake_clouds
+from aws_session import AWSSessionManager
+
+fake_clouds.install_fake_botocore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=40)
+    parser.add_argument("--users", type=int, default=25, help="Users per account")
+    parser.add_argument("--regions", nargs="+", default=["us-east-1"])
+    parser.add_argument("--services", nargs="*", default=[], help="Service names, e.g. 'Amazon S3'")
+    parser.add_argument("--max-accounts", type=int, default=aws_fanout.MAX_PARALLEL_ACCOUNTS)
+    parser.add_argument("--workers-per-account", type=int, default=aws_fanout.WORKERS_PER_ACCOUNT)
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds per fake API call")
+    parser.add_argument("--throttle-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    account_ids = [f"{100000000000 + i}" for i in range(args.accounts)]
+    targets = aws_fanout.build_targets(account_ids, args.regions)
+
+    print(f"{args.accounts} accounts x {args.users} users across {len(args.regions)} regions, "
+          f"{args.workers_per_account} workers per account")
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        for mode, max_accounts in (("one account at a time (old)", 1), ("fan-out", args.max_accounts)):
+            accounts = fake_clouds.FakeAWSAccounts(account_ids, args.latency, args.throttle_rate, seed=1)
+            aws.aws_session = AWSSessionManager(session_factory=accounts.session)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = aws_fanout.fan_out(targets, args.services, args.users, max_accounts=max_accounts,
+                                             max_workers=args.workers_per_account)
+            elapsed = time.perf_counter() - start
+            created = sum(len(result["users"]) for result in results)
+            with contextlib.redirect_stdout(io.StringIO()):
+                aws_fanout.cleanup_fan_out([user for result in results for user in result["users"]], "bench",
+                                           max_accounts=args.max_accounts, max_workers=args.workers_per_account)
+            left = sum(len(accounts.service("iam", account_id).users) for account_id in account_ids)
+            stacks_left = sum(len(accounts.service("cloudformation", account_id, region).stacks)
+                              for account_id in account_ids for region in args.regions)
+            print(f"  {mode:28} {elapsed:7.2f}s  {created / elapsed:>8,.0f} users/s  created={created}  "
+                  f"sts calls={accounts.sts_calls}  left after cleanup={left} users, {stacks_left} stacks")
+        os.chdir("/")
+
+
+if __name__ == "__main__":
+    main()
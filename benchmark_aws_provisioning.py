@@ -0,0 +1,62 @@
+"""Compare sequential and pooled IAM user provisioning against a stub IAM client."""
+import argparse
+import os
+import tempfile
+import time
+
+import aws_service_selector
+from fake_clouds import StubIAMClient
+from provisioning_journal import ProvisioningJournal
+from rate_limiter import ConcurrencyGovernor
+
+
+def run_sequential(user_names, account_id):
+    """Provision users one at a time, as the original main() loop did."""
+    return [aws_service_selector.create_iam_user(name, account_id) for name in user_names]
+
+
+def run_concurrent(user_names, account_id, max_workers):
+    """Provision users through the bounded thread pool."""
+    return aws_service_selector.create_iam_users_concurrently(user_names, account_id, max_workers)
+
+
+def benchmark(user_count, latency, max_workers, throttle_rate, journal_dir):
+    """Time both provisioning modes for one cohort size and print the speedup."""
+    user_names = [f"user-{i+1}" for i in range(user_count)]
+    timings = {}
+    for mode in ("sequential", "concurrent"):
+        client = StubIAMClient(latency=latency, throttle_rate=throttle_rate, seed=user_count)
+        aws_service_selector.get_iam_client = lambda: client
+        aws_service_selector.iam_governor = ConcurrencyGovernor(base_delay=latency)
+        aws_service_selector.provisioning_journal = ProvisioningJournal(
+            os.path.join(journal_dir, f"{mode}-{user_count}.jsonl")
+        )
+        start = time.perf_counter()
+        if mode == "sequential":
+            results = run_sequential(user_names, "123456789012")
+            created = sum(1 for result in results if result)
+        else:
+            results = run_concurrent(user_names, "123456789012", max_workers)
+            created = sum(1 for result in results.values() if result)
+        timings[mode] = time.perf_counter() - start
+        print(f"{user_count:>6} users  {mode:<10}  {timings[mode]:8.2f}s  "
+              f"created={created}  calls={client.calls}  throttled={client.throttled}  "
+              f"concurrency limit={aws_service_selector.iam_governor.limit:.1f}")
+    print(f"{user_count:>6} users  speedup     {timings['sequential'] / timings['concurrent']:8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds per stub IAM call")
+    parser.add_argument("--workers", type=int, default=aws_service_selector.MAX_PROVISIONING_WORKERS)
+    parser.add_argument("--throttle-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as journal_dir:
+        for count in args.counts:
+            benchmark(count, args.latency, args.workers, args.throttle_rate, journal_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare a fresh STS session per task with AWSSessionManager across many accounts.
+
+Each task provisions one user in one of `--accounts` sandbox accounts: it
+needs that account's ID and an IAM client, then makes one IAM call. The
+fakes in fake_clouds charge `--latency` per API call and
+`--client-creation-time` per client, standing in for loading the service
+model and the first TLS handshake.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_clouds
+from aws_session import AWSSessionManager, ROLE_SESSION_NAME
+
+fake_clouds.install_fake_botocore()
+
+
+def role_arn(account_id):
+    return f"arn:aws:iam::{account_id}:role/Provisioning"
+
+
+def fresh_session_task(accounts, account_id, user_name):
+    """Assume the role, build a session and clients, and look up the account for every task."""
+    base = accounts.session()
+    credentials = base.client("sts").assume_role(RoleArn=role_arn(account_id), RoleSessionName=ROLE_SESSION_NAME)
+    session = accounts.session(aws_access_key_id=credentials["Credentials"]["AccessKeyId"])
+    session.client("sts").get_caller_identity()
+    session.client("iam").create_user(UserName=user_name)
+
+
+def managed_task(manager, account_id, user_name):
+    """Reuse the cached role credentials, account ID and shared client."""
+    account = manager.for_account(role_arn(account_id))
+    account.account_id()
+    account.client("iam").create_user(UserName=user_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=40)
+    parser.add_argument("--users", type=int, default=25, help="Users per account")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds per fake API call")
+    parser.add_argument("--client-creation-time", type=float, default=0.03, help="Seconds to create a client")
+    args = parser.parse_args()
+    account_ids = [f"{100000000000 + i}" for i in range(args.accounts)]
+    tasks = [(account_id, f"user-{i+1}") for account_id in account_ids for i in range(args.users)]
+
+    print(f"{args.accounts} accounts x {args.users} users, {args.workers} workers")
+    for mode in ("fresh session per task (old)", "AWSSessionManager"):
+        accounts = fake_clouds.FakeAWSAccounts(account_ids, args.latency,
+                                               client_creation_time=args.client_creation_time)
+        if mode == "AWSSessionManager":
+            manager = AWSSessionManager(args.workers, session_factory=accounts.session)
+            run = lambda task: managed_task(manager, *task)
+        else:
+            run = lambda task: fresh_session_task(accounts, *task)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(run, tasks))
+        elapsed = time.perf_counter() - start
+        print(f"  {mode:30} {elapsed:7.2f}s  {len(tasks) / elapsed:>8,.0f} users/s  "
+              f"sts calls={accounts.sts_calls:<6} clients created={accounts.clients_created}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare deploying Azure services per (user, service) pair with one ARM template per resource group.
+
+Both modes run against the fake ResourceManagementClient in fake_clouds,
+where every call takes `--latency` seconds and every deployment runs for
+`--operation-time` seconds before it succeeds.
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import azure_service_deployer as azure
+from fake_clouds import FakeResourceManagementClient
+from rate_limiter import ConcurrencyGovernor
+
+SERVICES = ["Azure Blob Storage", "Azure Virtual Machines"]
+
+
+def make_users(count):
+    """Return Azure-shaped user dicts for `count` users."""
+    return [{"UserName": f"user-{i+1}", "Password": "Pa55word!Pa55word"} for i in range(count)]
+
+
+def per_pair(users):
+    """The CloudProvider.deploy_services loop: one deployment per user and service, each waited on in turn."""
+    provider = azure.AzureProvider()
+    for user in users:
+        for service in SERVICES:
+            provider.deploy(service, user)
+
+
+def cohort_template(users):
+    """AzureProvider.deploy_services: one templated deployment per resource group, all polled together."""
+    azure.AzureProvider().deploy_services(SERVICES, users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds per fake ARM call")
+    parser.add_argument("--operation-time", type=float, default=0.05, help="Seconds each deployment runs")
+    args = parser.parse_args()
+    azure.DEPLOYMENT_POLL_INTERVAL = args.operation_time / 5
+
+    print(f"{args.users} users x {len(SERVICES)} services")
+    for mode, run in (("one deployment per pair (old)", per_pair), ("one template per group", cohort_template)):
+        client = FakeResourceManagementClient(args.latency, operation_time=args.operation_time)
+        azure.get_resource_client = lambda: client
+        azure.arm_governor = ConcurrencyGovernor(base_delay=args.latency)
+        users = make_users(args.users)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(users)
+        elapsed = time.perf_counter() - start
+        resources = sum(len(group["resources"]) for group in client.resource_groups.groups.values())
+        groups = len(client.resource_groups.groups)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            azure.delete_resource_groups(users)
+        teardown = time.perf_counter() - start
+        deployments = len(client.deployments.deployments)
+        print(f"  {mode:30} {elapsed:7.2f}s  calls={client.calls:<5} deployments={deployments:<4} groups={groups:<4} resources={resources:<5} teardown {teardown:5.2f}s "
+              f"left={len(client.resource_groups.groups)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare a fixed worker count with the AIMD ConcurrencyGovernor against a capacity-limited fake API.
+
+The fake API serves up to `--capacity` calls at once and rejects the rest
+with a throttling error, as provider IAM APIs do. A fixed concurrency that
+is too high spends its time in backoff; one that is too low leaves
+capacity unused. The governor finds the capacity on its own.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_clouds import FakeClientError
+from rate_limiter import ConcurrencyGovernor
+
+
+class CapacityLimitedAPI:
+    """Serve `capacity` concurrent calls of `latency` seconds; throttle anything beyond that."""
+
+    def __init__(self, capacity, latency):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def call(self):
+        with self._lock:
+            self.in_flight += 1
+            overloaded = self.in_flight > self.capacity
+            if overloaded:
+                self.throttled += 1
+        try:
+            if overloaded:
+                raise FakeClientError("Throttling", "CreateUser")
+            time.sleep(self.latency)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run(governor, api, calls, workers):
+    """Push `calls` through the governor from `workers` threads and return the seconds taken."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda _: governor.call(api.call), range(calls)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--capacity", type=int, default=12, help="Concurrent calls the fake API serves")
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds per fake API call")
+    parser.add_argument("--workers", type=int, default=64)
+    args = parser.parse_args()
+
+    modes = [(f"fixed {limit}", limit, limit) for limit in (4, args.workers)]
+    modes.append(("adaptive", 8, args.workers))
+    print(f"{args.calls} calls, API capacity {args.capacity} concurrent, {args.workers} workers")
+    for mode, initial, maximum in modes:
+        api = CapacityLimitedAPI(args.capacity, args.latency)
+        minimum = initial if initial == maximum else 1
+        governor = ConcurrencyGovernor(initial, minimum, maximum, base_delay=args.latency, max_retries=20)
+        elapsed = run(governor, api, args.calls, args.workers)
+        print(f"  {mode:10} {elapsed:7.2f}s  {args.calls / elapsed:>8,.0f} calls/s  "
+              f"throttled={api.throttled:<6} final limit={governor.limit:.1f}")
+
+
+if __name__ == "__main__":
+    main()
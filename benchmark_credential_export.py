@@ -0,0 +1,82 @@
+"""Compare printing every credential line by line with streaming them to a CredentialExporter.
+
+The console side writes to a line-buffered file, which flushes on every
+newline the way a terminal does, so the numbers do not depend on how fast
+the terminal running the benchmark scrolls.
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+import tracemalloc
+
+from aws_service_selector import display_iam_details
+from credential_export import CredentialExporter
+from credential_generator import generate_passwords
+
+
+def make_users(count):
+    """Return AWS-shaped credential dicts for `count` users."""
+    return [
+        {
+            "UserName": f"user-{i+1}",
+            "Password": password,
+            "AccessKeyId": f"AKIA{i:016d}",
+            "SecretAccessKey": password * 2 + "SECRETKEY",
+            "AccountId": "123456789012",
+            "LoginURL": "https://123456789012.signin.aws.amazon.com/console",
+        }
+        for i, password in enumerate(generate_passwords(count, "aws"))
+    ]
+
+
+def print_every_user(users, path):
+    """The old display_iam_details: six lines per user, secrets included."""
+    with open(path, "w", buffering=1) as console:
+        for user in users:
+            print(f"User Name: {user['UserName']}", file=console)
+            print(f"Password: {user['Password']}", file=console)
+            print(f"Access Key ID: {user['AccessKeyId']}", file=console)
+            print(f"Secret Access Key: {user['SecretAccessKey']}", file=console)
+            print(f"Account ID: {user['AccountId']}", file=console)
+            print(f"Login URL: {user['LoginURL']}", file=console)
+            print("=" * 50, file=console)
+
+
+def export_users(users, path):
+    """Stream every user to an export file, then show the redacted, capped listing."""
+    with CredentialExporter(path) as exporter:
+        for user in users:
+            exporter.write(user)
+    with open(os.devnull, "w", buffering=1) as console, contextlib.redirect_stdout(console):
+        display_iam_details(users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+    users = make_users(args.users)
+
+    with tempfile.TemporaryDirectory() as root:
+        modes = (
+            ("print every user (old)", print_every_user, "console.txt"),
+            ("export to JSON Lines", export_users, "credentials.jsonl"),
+            ("export to CSV", export_users, "credentials.csv"),
+        )
+        print(f"{args.users} users")
+        for mode, run, file_name in modes:
+            path = os.path.join(root, file_name)
+            tracemalloc.start()
+            start = time.perf_counter()
+            run(users, path)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {mode:24} {elapsed:7.3f}s  {args.users / elapsed:>10,.0f} users/s  "
+                  f"peak {peak / 1024:8.1f} KiB  file {os.path.getsize(path) / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compare the old per-module password and bucket-name helpers with credential_generator."""
+import argparse
+import random
+import string
+import time
+
+from credential_generator import generate_password, generate_passwords, unique_name
+
+
+def legacy_password():
+    """The generate_password() every module used to carry."""
+    characters = string.ascii_letters + string.digits + "!@#$%^&*"
+    return ''.join(random.choice(characters) for _ in range(12))
+
+
+def timed(func):
+    """Return (result, seconds) for one call."""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+    count = args.count
+
+    _, legacy_time = timed(lambda: [legacy_password() for _ in range(count)])
+    _, single_time = timed(lambda: [generate_password() for _ in range(count)])
+    passwords, bulk_time = timed(lambda: generate_passwords(count))
+    print(f"{count} passwords")
+    print(f"  random.choice loop (old):     {legacy_time:7.3f}s  {count / legacy_time:>10,.0f}/s")
+    print(f"  secrets, one at a time:       {single_time:7.3f}s  {count / single_time:>10,.0f}/s")
+    print(f"  secrets, one bulk buffer:     {bulk_time:7.3f}s  {count / bulk_time:>10,.0f}/s")
+    print(f"  bulk vs old:                  {legacy_time / bulk_time:7.1f}x")
+    print(f"  unique bulk passwords:        {len(set(passwords))} of {count}")
+
+    legacy_names = [f"user-user-{i}-bucket-{random.randint(1000, 9999)}" for i in range(count)]
+    # Names only collide within one user's buckets, so count repeats per user name
+    per_user = [f"user-user-1-bucket-{random.randint(1000, 9999)}" for _ in range(count)]
+    new_names, name_time = timed(lambda: [unique_name("user-user-1-bucket") for _ in range(count)])
+    print(f"{count} bucket names")
+    print(f"  randint(1000, 9999) repeats:  {count - len(set(per_user))} for one user, "
+          f"{count - len(set(legacy_names))} across users")
+    print(f"  unique_name repeats:          {count - len(set(new_names))}  ({name_time:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
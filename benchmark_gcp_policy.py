@@ -0,0 +1,79 @@
+"""Compare per-account and batched IAM role assignment against a fake IAM service."""
+import argparse
+import contextlib
+import io
+import json
+import time
+
+import gcp_iam_service_simulation as gcp
+from fake_clouds import FakeGCPIAMService
+
+ROLE = "roles/editor"
+PROJECT_ID = "benchmark-project"
+
+
+def legacy_assign(emails):
+    """The original implementation: append one new binding per service account, no retries."""
+    for email in emails:
+        try:
+            policy = gcp.get_iam_client().projects().getIamPolicy(resource=PROJECT_ID).execute()
+            bindings = policy.get('bindings', [])
+            bindings.append({"role": ROLE, "members": [f"serviceAccount:{email}"]})
+            policy['bindings'] = bindings
+            gcp.get_iam_client().projects().setIamPolicy(
+                resource=PROJECT_ID,
+                body={"policy": policy}
+            ).execute()
+        except Exception as e:
+            print(f"Error assigning role to {email}: {e}")
+
+
+def per_account_assign(emails):
+    """One merged read-modify-write per service account."""
+    for email in emails:
+        gcp.assign_role_to_service_account(email, ROLE, PROJECT_ID)
+
+
+def batched_assign(emails):
+    """One read-modify-write for the whole cohort."""
+    gcp.assign_roles_in_batch({ROLE: [f"serviceAccount:{email}" for email in emails]}, PROJECT_ID)
+
+
+MODES = {
+    "legacy": legacy_assign,
+    "per-account": per_account_assign,
+    "batched": batched_assign,
+}
+
+
+def benchmark(account_count, latency, conflict_rate):
+    """Run every assignment mode for one cohort size and print the results."""
+    emails = [f"sa-{i+1}@{PROJECT_ID}.iam.gserviceaccount.com" for i in range(account_count)]
+    for mode, assign in MODES.items():
+        service = FakeGCPIAMService(latency=latency, conflict_rate=conflict_rate, seed=account_count)
+        gcp.get_iam_client = lambda: service
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            assign(emails)
+        elapsed = time.perf_counter() - start
+        policy = service.policy
+        print(f"{account_count:>6} accounts  {mode:<12} {elapsed:8.2f}s  requests={service.requests:<6} "
+              f"conflicts={service.conflicts:<4} bindings={len(policy['bindings']):<6} "
+              f"policy={len(json.dumps(policy)):,} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--latency", type=float, default=0.005, help="Seconds per fake IAM request")
+    parser.add_argument("--conflict-rate", type=float, default=0.05,
+                        help="Chance that another writer changes the policy before each write")
+    args = parser.parse_args()
+
+    gcp.POLICY_RETRY_BASE_DELAY = args.latency
+    for count in args.counts:
+        benchmark(count, args.latency, args.conflict_rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare per-user and batched local account management against a fake passwd backend.
+
+Nothing touches the real /etc/passwd: commands are applied to a passwd file
+and home directories in a temporary directory, while each process the real
+command line would start is spawned for real so fork/exec cost is measured.
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+import time
+
+import local_server_user_simulation as local
+from fake_clouds import FakePasswdBackend
+
+
+def per_user(user_names):
+    """The original flow: useradd + chpasswd per user, then userdel per user."""
+    users = [local.create_local_user(user_name) for user_name in user_names]
+    create_done = time.perf_counter()
+    for user in users:
+        local.delete_local_user(user["UserName"])
+    return create_done
+
+
+def batched(user_names):
+    """One newusers call and one chpasswd stream, then one sudo xargs userdel."""
+    users = local.create_local_users_in_bulk(user_names)
+    create_done = time.perf_counter()
+    local.delete_local_users_in_bulk([user["UserName"] for user in users])
+    return create_done
+
+
+def benchmark(user_count):
+    """Run both modes for one cohort size and print spawn counts and wall time."""
+    user_names = [f"user-{i+1}" for i in range(user_count)]
+    for mode, run in (("per-user", per_user), ("batched", batched)):
+        with tempfile.TemporaryDirectory() as root:
+            backend = FakePasswdBackend(root)
+            local.run_command = backend
+            local.get_passwd_entry = backend.getpwnam
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_done = run(user_names)
+            end = time.perf_counter()
+            print(f"{user_count:>6} users  {mode:<9}  create {create_done - start:7.2f}s  "
+                  f"delete {end - create_done:7.2f}s  sudo calls={backend.sudo_calls:<6} "
+                  f"processes={backend.processes:<6} leftover={len(backend.users)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local account creation and deletion.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000])
+    args = parser.parse_args()
+    for count in args.counts:
+        benchmark(count)
+
+
+if __name__ == "__main__":
+    main()
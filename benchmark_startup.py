@@ -0,0 +1,72 @@
+"""Measure how long each entry point takes to import and print its service menu.
+
+Every module builds its cloud clients lazily, so this path must not load any
+cloud SDK. Each measurement runs in a fresh interpreter, the way CI shells out
+to the scripts, and the script exits non-zero if any module exceeds the budget
+or pulls in its SDK.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from multi_cloud_orchestrator import PROVIDER_MODULES
+
+# Top-level SDK packages that must stay unloaded on the menu path
+SDK_PACKAGES = {
+    "aws": "boto3",
+    "alibaba": "aliyunsdkcore",
+    "azure": "azure",
+    "gcp": "googleapiclient",
+    "ibm": "ibm_platform_services",
+    "local": None,
+    "oci": "oci",
+}
+
+PROBE = """
+import io, json, sys, time, contextlib
+start = time.perf_counter()
+import {module}
+from cloud_provider import print_service_menu
+with contextlib.redirect_stdout(io.StringIO()):
+    print_service_menu({module}.{provider_class}())
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "sdk_loaded": {sdk!r} in sys.modules}}))
+"""
+
+
+def measure(name, runs):
+    """Return the best in-process menu time and process wall time for one provider, in ms."""
+    module, provider_class = PROVIDER_MODULES[name]
+    code = PROBE.format(module=module, provider_class=provider_class, sdk=SDK_PACKAGES[name])
+    best_menu, best_process, sdk_loaded = float("inf"), float("inf"), False
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        best_process = min(best_process, (time.perf_counter() - start) * 1000)
+        result = json.loads(output)
+        best_menu = min(best_menu, result["elapsed"] * 1000)
+        sdk_loaded = sdk_loaded or result["sdk_loaded"]
+    return best_menu, best_process, sdk_loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark entry point startup time.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per module; the best is kept")
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'provider':<10}{'import+menu':>14}{'process':>12}  sdk loaded")
+    for name in PROVIDER_MODULES:
+        menu_ms, process_ms, sdk_loaded = measure(name, args.runs)
+        print(f"{name:<10}{menu_ms:>11.1f} ms{process_ms:>9.1f} ms  {'yes' if sdk_loaded else 'no'}")
+        failed = failed or sdk_loaded or menu_ms > args.budget_ms
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
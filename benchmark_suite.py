@@ -0,0 +1,200 @@
+"""Measure provisioning throughput for every provider offline, against the fakes in fake_clouds.
+
+For each provider and cohort size this reports users created per second,
+the p50/p99 time until each user's credentials were ready, teardown time,
+and how many principals teardown left behind. Latency and throttling are
+injected into every fake, so any performance change can be measured
+without credentials:
+
+    python benchmark_suite.py
+    python benchmark_suite.py --providers aws gcp --counts 10 100 --latency 0.02 --throttle-rate 0.05
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+import fake_clouds
+from aws_session import AWSSessionManager
+from fake_clouds import (
+    FakeAcsClient, FakeAuthorizationManagementClient, FakeAWSAccounts, FakeGCPIAMService, FakeGraphServer,
+    FakeIamIdentityV1, FakeOCIIdentityClient, FakePasswdBackend, FakeResourceManagementClient, FakeTokenCredential,
+)
+from latency_stats import summarize_latencies
+from provisioning_journal import ProvisioningJournal
+from rate_limiter import ConcurrencyGovernor, TokenBucket
+
+fake_clouds.install_fake_botocore()
+fake_clouds.install_fake_ram_requests()
+
+DEFAULT_COUNTS = [10, 100, 1000]
+
+
+class ReadyClock:
+    """Credential sink that records how long after the start each user's credentials arrived."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def write(self, user):
+        with self._lock:
+            self.latencies.append(time.perf_counter() - self.start)
+
+
+def setup_aws(args, workdir, cleanup):
+    """Point the AWS session at fake accounts; return (provider, fake, leftover count)."""
+    import aws_service_selector as aws
+
+    accounts = FakeAWSAccounts(latency=args.latency, throttle_rate=args.throttle_rate, seed=args.seed)
+    aws.aws_session = AWSSessionManager(aws.MAX_PROVISIONING_WORKERS, session_factory=accounts.session)
+    client = accounts.service("iam", accounts.account_ids[0])
+    aws.iam_governor = ConcurrencyGovernor(base_delay=args.latency)
+    aws.provisioning_journal = ProvisioningJournal(os.path.join(workdir, "aws.jsonl"))
+    return aws.AWSProvider(), client, lambda: len(client.users)
+
+
+def setup_alibaba(args, workdir, cleanup):
+    """Point the Alibaba module at a fake AcsClient with a RAM QPS quota."""
+    import alibaba_ram_service_simulation as alibaba
+
+    client = FakeAcsClient(args.latency, args.ram_qps, args.throttle_rate, args.seed)
+    alibaba.get_acs_client = lambda: client
+    alibaba.ram_rate_limiter = TokenBucket(args.ram_qps)
+    alibaba.ram_governor = ConcurrencyGovernor(base_delay=args.latency)
+    alibaba.provisioning_journal = ProvisioningJournal(os.path.join(workdir, "alibaba.jsonl"))
+    return alibaba.AlibabaProvider(), client, lambda: len(client.users)
+
+
+def setup_azure(args, workdir, cleanup):
+    """Point the Azure module at a local Graph server and fake ARM clients."""
+    import azure_service_deployer as azure
+
+    server = FakeGraphServer(args.latency, args.throttle_rate, args.seed)
+    azure.GRAPH_ENDPOINT = server.start()
+    cleanup.callback(server.stop)
+    credential = FakeTokenCredential(server.token)
+    auth_client = FakeAuthorizationManagementClient(args.latency, args.throttle_rate, args.seed)
+    azure.get_credentials = lambda: credential
+    azure.get_auth_client = lambda: auth_client
+    resource_client = FakeResourceManagementClient(args.latency, args.throttle_rate, args.seed)
+    azure.get_resource_client = lambda: resource_client
+    azure._graph_token.update(token=None, expires_on=0)
+    azure.graph_governor = ConcurrencyGovernor(base_delay=args.latency)
+    azure.arm_governor = ConcurrencyGovernor(base_delay=args.latency)
+    return azure.AzureProvider(), server, lambda: len(server.users)
+
+
+def setup_gcp(args, workdir, cleanup):
+    """Point the GCP module at a fake IAM API."""
+    import gcp_iam_service_simulation as gcp
+
+    service = FakeGCPIAMService(args.latency, seed=args.seed, throttle_rate=args.throttle_rate)
+    gcp.get_iam_client = lambda: service
+    gcp.iam_governor = ConcurrencyGovernor(base_delay=args.latency)
+    gcp.BATCH_RETRY_BASE_DELAY = args.latency
+    gcp.POLICY_RETRY_BASE_DELAY = args.latency
+
+    def leftover():
+        # Role members left in the project policy count as leftovers too
+        members = sum(len(binding["members"]) for binding in service.policy["bindings"])
+        return len(service.service_accounts) + members
+    return gcp.GCPProvider(), service, leftover
+
+
+def setup_ibm(args, workdir, cleanup):
+    """Point the IBM module at a fake IamIdentityV1."""
+    import ibm_iam_service_simulation as ibm
+
+    client = FakeIamIdentityV1(args.latency, args.throttle_rate, args.seed)
+    ibm.get_iam_client = lambda: client
+    ibm.iam_governor = ConcurrencyGovernor(base_delay=args.latency)
+    return ibm.IBMProvider(), client, lambda: len(client.api_keys)
+
+
+def setup_local(args, workdir, cleanup):
+    """Point the local module at a fake passwd backend under the work directory."""
+    import local_server_user_simulation as local
+
+    backend = FakePasswdBackend(os.path.join(workdir, "local"))
+    local.run_command = backend
+    local.get_passwd_entry = backend.getpwnam
+    return local.LocalProvider(), backend, lambda: len(backend.users)
+
+
+def setup_oci(args, workdir, cleanup):
+    """Install a stand-in `oci` package around a fake IdentityClient."""
+    client = FakeOCIIdentityClient(args.latency, args.throttle_rate, args.seed, settle_time=args.latency)
+    fake_clouds.install_fake_oci(client)
+    import oci_iam_service_simulation as oci_module
+
+    oci_module.get_config.cache_clear()
+    oci_module._thread_clients = threading.local()
+    oci_module.iam_governor = ConcurrencyGovernor(base_delay=args.latency)
+
+    def leftover():
+        with client._lock:
+            return sum(1 for user in client.users.values() if client._state(user) != "DELETED")
+    return oci_module.OCIProvider(), client, leftover
+
+
+SETUPS = {
+    "aws": setup_aws,
+    "alibaba": setup_alibaba,
+    "azure": setup_azure,
+    "gcp": setup_gcp,
+    "ibm": setup_ibm,
+    "local": setup_local,
+    "oci": setup_oci,
+}
+
+
+def benchmark(name, user_count, args):
+    """Provision and tear down one cohort and print a summary row."""
+    with tempfile.TemporaryDirectory() as workdir, contextlib.ExitStack() as cleanup:
+        provider, fake, leftover = SETUPS[name](args, workdir, cleanup)
+        user_names = [f"{provider.user_prefix}-{i+1}" for i in range(user_count)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            provider.prepare()
+            clock = ReadyClock()
+            provider.credential_sink = clock
+            users = provider.create_users(user_names)
+            provider.attach_policies(users)
+            create_time = time.perf_counter() - clock.start
+            start = time.perf_counter()
+            provider.delete_users(users)
+            teardown_time = time.perf_counter() - start
+        ready = summarize_latencies(clock.latencies)
+        calls = next((getattr(fake, attr) for attr in ("calls", "requests", "processes", "http_requests")
+                     if hasattr(fake, attr)), 0)
+        p50 = f"{ready['p50'] * 1000:8.1f}" if ready["count"] else "       -"
+        p99 = f"{ready['p99'] * 1000:8.1f}" if ready["count"] else "       -"
+        print(f"{name:8} {user_count:>6}  {len(users):>6}  {len(users) / create_time:>9,.0f}  {p50}  {p99}  "
+              f"{teardown_time:9.2f}  {leftover():>8}  {calls:>7}  {getattr(fake, 'throttled', 0):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", nargs="+", choices=sorted(SETUPS), default=sorted(SETUPS))
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS)
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds per fake API call")
+    parser.add_argument("--throttle-rate", type=float, default=0.01, help="Share of fake calls throttled")
+    parser.add_argument("--ram-qps", type=float, default=500,
+                        help="RAM QPS quota of the fake AcsClient and the client-side token bucket")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"latency {args.latency * 1000:.0f} ms/call, throttle rate {args.throttle_rate:.1%}")
+    print(f"{'provider':8} {'users':>6}  {'ready':>6}  {'users/s':>9}  {'p50 ms':>8}  {'p99 ms':>8}  "
+          f"{'teardown':>9}  {'leftover':>8}  {'calls':>7}  {'throttled':>9}")
+    for name in args.providers:
+        for count in args.counts:
+            benchmark(name, count, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Common interface implemented by each cloud simulation module."""
+import argparse
+import functools
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta
+from credential_export import DEFAULT_EXPORT_EXTENSION, CredentialExporter, add_credentials_format_argument
+from inventory_store import InventoryStore
+from lifecycle_scheduler import LifecycleScheduler
+
+# Service catalogs (`<provider>_services.json`) live next to the modules
+CATALOG_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Hex digits of the random token shared by a cohort's ID and its default user prefix
+COHORT_TOKEN_LENGTH = 8
+
+
+def load_service_catalog(provider_name):
+    """Return the services listed in a provider's catalog file."""
+    with open(os.path.join(CATALOG_DIR, f"{provider_name}_services.json")) as f:
+        return json.load(f)
+
+
+def lazy_client(factory):
+    """Build a client on first call and return the same instance for the rest of the process.
+
+    SDK imports belong inside `factory`, so importing a module or printing
+    its service menu never pays for SDK loading or credential lookups.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def get_client():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    get_client.cache_clear = instance.clear
+    return get_client
+
+
+class CloudProvider:
+    """Provision, deploy to and delete the users of one cloud.
+
+    Subclasses implement the per-user operations. The cohort-level methods
+    loop over them and can be overridden with bulk implementations.
+    """
+
+    name = None
+    label = None
+    user_label = "users"
+    user_prefix = "user"
+    services = []
+    # Field of a user dict that identifies the user in the inventory
+    user_id_field = "UserName"
+    # User dict fields naming further resources issued to a user -> inventory resource type
+    resource_fields = {}
+    # Inventory resource type, and the user dict field holding its ID, that reconciliation compares
+    reconcile_resource_type = "user"
+    reconcile_field = None
+    # Open CredentialExporter that receives each user's credentials as it is created
+    credential_sink = None
+
+    def prepare(self):
+        """Resolve anything needed before provisioning; return False to abort."""
+        return True
+
+    def prompt_settings(self):
+        """Ask for provider-specific settings in interactive mode."""
+
+    def create_user(self, user_name):
+        """Create one user and return its credentials, or None on failure."""
+        raise NotImplementedError
+
+    def attach_policy(self, user):
+        """Grant a created user its permissions; a no-op where creation already does it."""
+
+    def deploy(self, service_name, user):
+        """Deploy one service for a user and return the name of any bucket it created."""
+        raise NotImplementedError
+
+    def delete(self, user):
+        """Delete one user and the credentials issued to it; return True if it is gone."""
+        raise NotImplementedError
+
+    def display(self, users):
+        """Display created users with their secrets redacted."""
+        raise NotImplementedError
+
+    def export_credentials(self, user):
+        """Stream one created user's credentials to the export sink, if one is open."""
+        if self.credential_sink:
+            self.credential_sink.write(user)
+
+    def list_cloud_users(self):
+        """Yield a user dict for every principal the cloud reports, one page at a time."""
+        raise NotImplementedError
+
+    def managed_name_pattern(self):
+        """Return the regex of the user names this tool generates: `<user_prefix>[-<cohort token>]-N`."""
+        return rf"{re.escape(self.user_prefix)}(?:-[0-9a-f]{{{COHORT_TOKEN_LENGTH}}})?-\d+"
+
+    def inventory_providers(self):
+        """Return the inventory provider names whose users live in the cloud account this provider lists."""
+        return [self.name]
+
+    def is_managed(self, user):
+        """Return True if a listed principal follows the naming this tool uses."""
+        return re.fullmatch(self.managed_name_pattern(), user[self.user_id_field]) is not None
+
+    def delete_orphans(self, users):
+        """Delete principals found in the cloud that the inventory does not know about."""
+        self.delete_users(users)
+
+    def create_users(self, user_names):
+        """Create a cohort of users and return the credentials of those created."""
+        users = []
+        for user_name in user_names:
+            user = self.create_user(user_name)
+            if user:
+                self.export_credentials(user)
+                users.append(user)
+        return users
+
+    def attach_policies(self, users):
+        """Grant every user of a cohort its permissions."""
+        for user in users:
+            self.attach_policy(user)
+
+    def deploy_services(self, services, users):
+        """Deploy every selected service for every user of a cohort."""
+        for user in users:
+            for service in services:
+                bucket_name = self.deploy(service, user)
+                if bucket_name:
+                    user.setdefault("Buckets", []).append(bucket_name)
+
+    def delete_users(self, users):
+        """Delete every user of a cohort and return {user ID: deleted}."""
+        return {user[self.user_id_field]: bool(self.delete(user)) for user in users}
+
+    def inventory_records(self, user):
+        """Return the `(resource_type, resource_id, details)` tuples to record for a user."""
+        user_id = user[self.user_id_field]
+        records = [("user", user_id, user)]
+        for field, resource_type in self.resource_fields.items():
+            if user.get(field):
+                records.append((resource_type, user[field], {"user": user_id}))
+        for bucket in user.get("Buckets", []):
+            records.append(("bucket", bucket, {"user": user_id}))
+        return records
+
+    def record_inventory(self, inventory, cohort_id, users, expires_at):
+        """Write a cohort's users and the resources issued to them to the inventory."""
+        records = [record for user in users for record in self.inventory_records(user)]
+        inventory.record(self.name, cohort_id, records, expires_at)
+
+    def provision_cohort(self, services, user_count, inventory=None, cohort_id=None, expires_at=None,
+                         credential_sink=None):
+        """Create, authorize and deploy services for a cohort; return the created users.
+
+        With an `inventory`, users are recorded as soon as they exist and
+        again once their policies and services are in place. With a
+        `credential_sink`, credentials are exported as users are created.
+        """
+        self.credential_sink = credential_sink
+        user_names = [f"{self.user_prefix}-{i+1}" for i in range(user_count)]
+        users = self.create_users(user_names)
+        if inventory:
+            self.record_inventory(inventory, cohort_id, users, expires_at)
+        self.attach_policies(users)
+        if credential_sink:
+            credential_sink.flush()
+            print(f"\nCredentials for {credential_sink.count} {self.user_label} "
+                  f"written to {credential_sink.path}")
+        self.display(users)
+        self.deploy_services(services, users)
+        if inventory:
+            self.record_inventory(inventory, cohort_id, users, expires_at)
+        return users
+
+    def mark_users_deleted(self, inventory, deleted, remaining):
+        """Mark the deleted users, and resources only they held, as deleted in the inventory.
+
+        Resources shared with a user in `remaining` (a cohort group, a
+        stack) stay live, since that user still holds them.
+        """
+        kept = {(resource_type, resource_id)
+                for user in remaining for resource_type, resource_id, _ in self.inventory_records(user)}
+        resource_ids = {}
+        for user in deleted:
+            for resource_type, resource_id, _ in self.inventory_records(user):
+                if (resource_type, resource_id) not in kept:
+                    resource_ids.setdefault(resource_type, set()).add(resource_id)
+        for resource_type, ids in resource_ids.items():
+            inventory.mark_deleted(self.name, resource_type, ids)
+
+    def cleanup_users(self, users, inventory=None, cohort_id=None):
+        """Delete the users of an expired cohort; only those actually deleted leave the inventory."""
+        print(f"\nTime's up! Cleaning up {self.label} {self.user_label}...")
+        results = self.delete_users(users)
+        deleted = [user for user in users if results.get(user[self.user_id_field])]
+        remaining = [user for user in users if not results.get(user[self.user_id_field])]
+        if inventory and not remaining:
+            inventory.mark_cohort_deleted(cohort_id)
+        elif inventory:
+            self.mark_users_deleted(inventory, deleted, remaining)
+        if remaining:
+            print(f"\n{len(remaining)} {self.user_label} could not be deleted and stay live in the inventory.")
+        print("\nCleanup completed.")
+
+
+def start_cohort(provider, user_prefix=None):
+    """Return a new cohort ID and set the user prefix of the provider that provisions it.
+
+    Without an explicit `user_prefix`, users are named
+    `<default prefix>-<cohort token>-N`, so cohorts that are live at the
+    same time never reuse each other's names.
+    """
+    token = uuid.uuid4().hex[:COHORT_TOKEN_LENGTH]
+    provider.user_prefix = user_prefix or f"{provider.user_prefix}-{token}"
+    return f"{provider.name}-{token}"
+
+
+def print_service_menu(provider):
+    """Print the numbered list of services a provider supports."""
+    print(f"Supported {provider.label} Services:")
+    for idx, service in enumerate(provider.services, start=1):
+        print(f"{idx}. {service}")
+
+
+def select_services(provider):
+    """Print the service menu and return the services the user picked."""
+    print_service_menu(provider)
+    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
+    services_input = input("Services: ").strip()
+
+    try:
+        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
+    except ValueError:
+        print("Invalid input. Please enter valid service numbers.")
+        return None
+    return [provider.services[i] for i in selected_indices if 0 <= i < len(provider.services)]
+
+
+def run_interactive(provider, credentials_extension=DEFAULT_EXPORT_EXTENSION):
+    """Run the prompt-driven provision/expire/cleanup flow shared by every module."""
+    selected_services = select_services(provider)
+    if selected_services is None:
+        return
+    if not selected_services:
+        print("No services selected. Exiting.")
+        return
+
+    user_count = int(input(f"Enter the number of {provider.user_label} to create: "))
+    duration_days = int(input("Enter the number of days to run services: "))
+    duration_hours = int(input("Enter the number of hours to run services: "))
+    provider.prompt_settings()
+
+    if not provider.prepare():
+        return
+
+    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
+    cohort_id = start_cohort(provider)
+    inventory = InventoryStore()
+    with CredentialExporter(f"credentials_{cohort_id}{credentials_extension}") as credential_sink:
+        users = provider.provision_cohort(
+            selected_services, user_count, inventory, cohort_id, end_time.timestamp(), credential_sink
+        )
+
+    # Schedule cleanup for when the resources expire
+    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+
+    scheduler = LifecycleScheduler(f"lifecycle_state_{provider.name}.json")
+    scheduler.add_cohort(provider.name, end_time, users, cohort_id)
+    scheduler.run(
+        lambda name, resources, cohort_id: provider.cleanup_users(resources, inventory, cohort_id)
+    )
+
+
+def run_cli(provider):
+    """Entry point of every provider module: run `--spec` files if given, otherwise prompt."""
+    parser = argparse.ArgumentParser(description=f"Provision {provider.label} {provider.user_label}.")
+    parser.add_argument(
+        "--spec", action="append", default=[],
+        help="JSON or YAML cohort spec file to run without prompting (repeatable)"
+    )
+    add_credentials_format_argument(parser)
+    args = parser.parse_args()
+    credentials_extension = f".{args.credentials_format}"
+    if not args.spec:
+        run_interactive(provider, credentials_extension)
+        return
+
+    # Imported here so the interactive path stays as light as before
+    from cohort_spec import load_cohorts
+    from multi_cloud_orchestrator import run_cohorts
+
+    cohorts = []
+    try:
+        for path in args.spec:
+            cohorts.extend(load_cohorts(path, default_provider=provider.name))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    for cohort in cohorts:
+        if cohort["provider"] != provider.name:
+            print(f"Skipping {cohort['provider']} cohort; run it through multi_cloud_orchestrator.py.")
+    cohorts = [cohort for cohort in cohorts if cohort["provider"] == provider.name]
+    run_cohorts(cohorts, state_file=f"lifecycle_state_{provider.name}.json",
+                credentials_extension=credentials_extension)
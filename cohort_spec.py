@@ -0,0 +1,108 @@
+"""Declarative cohort specs, read from JSON or YAML files.
+
+A spec names a provider, the services to deploy (catalog names or menu
+numbers), how many users to create, an optional naming prefix (without
+one, each cohort gets a unique prefix) and how long the cohort lives.
+A file holds one spec, a list of specs, or a mapping with a `cohorts`
+list whose entries inherit its `defaults`::
+
+    defaults:
+      hours: 8
+    cohorts:
+      - provider: aws
+        services: [Amazon EC2, Amazon S3]
+        user_count: 25
+        user_prefix: lab-a
+      - provider: gcp
+        services: [2]
+        user_count: 10
+        days: 1
+
+YAML needs PyYAML; JSON files work without it.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+SPEC_FIELDS = {"provider", "services", "user_count", "user_prefix", "days", "hours"}
+
+
+class SpecError(ValueError):
+    """A spec file that cannot be turned into cohorts."""
+
+
+def read_spec_file(path):
+    """Parse a JSON or YAML spec file and return its raw contents."""
+    with open(path) as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise SpecError(f"{path}: YAML specs need PyYAML (pip install pyyaml); use JSON instead")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def build_cohort(spec, now, default_provider=None):
+    """Validate one spec and return it as a cohort dict with an absolute end time."""
+    unknown = set(spec) - SPEC_FIELDS
+    if unknown:
+        raise SpecError(f"Unknown spec field(s): {', '.join(sorted(unknown))}")
+    provider = spec.get("provider", default_provider)
+    if not provider:
+        raise SpecError("Spec is missing 'provider'")
+    services = spec.get("services")
+    if not services or not isinstance(services, list):
+        raise SpecError(f"{provider} spec needs a non-empty 'services' list")
+    user_count = spec.get("user_count")
+    if not isinstance(user_count, int) or user_count < 1:
+        raise SpecError(f"{provider} spec needs a positive integer 'user_count'")
+    for field in ("days", "hours"):
+        value = spec.get(field, 0)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise SpecError(f"{provider} spec needs a number for '{field}', not {value!r}")
+    lifetime = timedelta(days=spec.get("days", 0), hours=spec.get("hours", 0))
+    if lifetime <= timedelta(0):
+        raise SpecError(f"{provider} spec needs a positive lifetime ('days' and/or 'hours')")
+    cohort = {
+        "provider": provider,
+        "services": services,
+        "user_count": user_count,
+        "end_time": now + lifetime,
+    }
+    if spec.get("user_prefix"):
+        cohort["user_prefix"] = spec["user_prefix"]
+    return cohort
+
+
+def load_cohorts(path, default_provider=None, now=None):
+    """Read a spec file and return its cohorts, each with an absolute `end_time`."""
+    now = now or datetime.now()
+    data = read_spec_file(path)
+    defaults = {}
+    if isinstance(data, dict) and "cohorts" in data:
+        defaults = data.get("defaults") or {}
+        specs = data["cohorts"]
+    elif isinstance(data, dict):
+        specs = [data]
+    else:
+        specs = data
+    if not isinstance(specs, list):
+        raise SpecError(f"{path}: expected a spec, a list of specs or a 'cohorts' list")
+    try:
+        return [build_cohort({**defaults, **spec}, now, default_provider) for spec in specs]
+    except SpecError as e:
+        raise SpecError(f"{path}: {e}")
+
+
+def resolve_services(provider, services):
+    """Map catalog names or 1-based menu numbers to a provider's service names."""
+    resolved = []
+    for service in services:
+        if isinstance(service, int) and 1 <= service <= len(provider.services):
+            resolved.append(provider.services[service - 1])
+        elif service in provider.services:
+            resolved.append(service)
+        else:
+            print(f"Ignoring unknown {provider.label} service: {service}")
+    return resolved
@@ -0,0 +1,180 @@
+"""Stream created users' credentials to a CSV, JSON Lines or encrypted file instead of the console.
+
+Rows are buffered and written in chunks, so memory stays flat and a large
+cohort never waits on terminal I/O. The format follows the file extension:
+`.csv`, `.jsonl`, or `.enc` for Fernet-encrypted JSON Lines (needs the
+`cryptography` package). Files are created readable by the owner only.
+
+    python credential_export.py decrypt credentials_aws-1a2b3c4d.enc
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import threading
+
+EXPORT_BUFFER_BYTES = 64 * 1024
+EXPORT_KEY_ENV = "CREDENTIAL_EXPORT_KEY"
+EXPORT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".enc": "encrypted"}
+DEFAULT_EXPORT_EXTENSION = ".jsonl"
+
+# Console listings stop after this many users; the export file has them all
+MAX_DISPLAYED_USERS = 20
+
+
+def redact(value):
+    """Mask a secret for console output."""
+    return "********" if value else value
+
+
+def print_truncation_note(users):
+    """Tell the reader how many users a capped console listing left out."""
+    if len(users) > MAX_DISPLAYED_USERS:
+        print(f"... and {len(users) - MAX_DISPLAYED_USERS} more; see the credentials export file.")
+
+
+def add_credentials_format_argument(parser):
+    """Add the --credentials-format option to a provisioning command line."""
+    parser.add_argument(
+        "--credentials-format", default=DEFAULT_EXPORT_EXTENSION.lstrip("."),
+        choices=[extension.lstrip(".") for extension in EXPORT_FORMATS],
+        help="Credential export file format; enc is encrypted JSON Lines and needs cryptography"
+    )
+
+
+def read_key(path):
+    """Return the Fernet key from the environment or `<path>.key`, or None if neither holds one."""
+    key = os.environ.get(EXPORT_KEY_ENV)
+    if key:
+        return key.encode()
+    key_file = f"{path}.key"
+    if os.path.exists(key_file):
+        with open(key_file, "rb") as f:
+            return f.read().strip()
+    return None
+
+
+def load_key(path):
+    """Return the Fernet key from the environment or `<path>.key`, creating the key file if needed."""
+    key = read_key(path)
+    if key:
+        return key
+    from cryptography.fernet import Fernet
+
+    key_file = f"{path}.key"
+    key = Fernet.generate_key()
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    print(f"Encryption key written to {key_file}; store it apart from the export.")
+    return key
+
+
+class CredentialExporter:
+    """Append credentials to an export file in buffered chunks; safe to share between threads.
+
+    Encrypted exports hold one Fernet token per line, each covering one
+    flushed chunk of JSON Lines.
+    """
+
+    def __init__(self, path, key=None, buffer_bytes=EXPORT_BUFFER_BYTES):
+        self.path = path
+        self.format = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower(), "jsonl")
+        self.count = 0
+        self._buffer_bytes = buffer_bytes
+        self._chunks = []
+        self._buffered = 0
+        self._fieldnames = None
+        self._lock = threading.Lock()
+        self._fernet = None
+        if self.format == "encrypted":
+            try:
+                from cryptography.fernet import Fernet
+            except ImportError:
+                raise RuntimeError("Encrypted exports need the cryptography package (pip install cryptography)")
+            self._fernet = Fernet(key or load_key(path))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self._file = os.fdopen(fd, "ab")
+        self._new_file = self._file.tell() == 0
+
+    def _format(self, user):
+        if self.format != "csv":
+            return json.dumps(user) + "\n"
+        line = io.StringIO()
+        writer = csv.writer(line)
+        if self._fieldnames is None:
+            self._fieldnames = list(user)
+            if self._new_file:
+                writer.writerow(self._fieldnames)
+        writer.writerow([user.get(field, "") for field in self._fieldnames])
+        return line.getvalue()
+
+    def write(self, user):
+        """Queue one user's credentials, flushing when the buffer is full."""
+        with self._lock:
+            chunk = self._format(user)
+            self._chunks.append(chunk)
+            self._buffered += len(chunk)
+            self.count += 1
+            if self._buffered >= self._buffer_bytes:
+                self._flush()
+
+    def _flush(self):
+        if not self._chunks:
+            return
+        data = "".join(self._chunks).encode()
+        if self._fernet:
+            data = self._fernet.encrypt(data) + b"\n"
+        self._file.write(data)
+        self._file.flush()
+        self._chunks.clear()
+        self._buffered = 0
+
+    def flush(self):
+        """Write everything buffered so far."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flush and close the export file."""
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_decrypted(path, key=None):
+    """Yield the JSON Lines records of an encrypted export; the key must already exist."""
+    key = key or read_key(path)
+    if not key:
+        raise RuntimeError(f"No key to decrypt {path}: set {EXPORT_KEY_ENV} or put the key in {path}.key")
+    from cryptography.fernet import Fernet
+
+    fernet = Fernet(key)
+    with open(path, "rb") as f:
+        for token in f:
+            if token.strip():
+                yield from fernet.decrypt(token.strip()).decode().splitlines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Work with credential export files.")
+    parser.add_argument("command", choices=["decrypt"])
+    parser.add_argument("path")
+    args = parser.parse_args()
+    try:
+        for line in iter_decrypted(args.path):
+            sys.stdout.write(line + "\n")
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cryptographically secure passwords and collision-free resource names for every provider module."""
+import functools
+import itertools
+import secrets
+import string
+from collections import namedtuple
+
+# `min_classes` of lowercase, uppercase, digits and symbols must appear in every password
+PasswordPolicy = namedtuple("PasswordPolicy", ["length", "symbols", "min_classes"])
+
+DEFAULT_PASSWORD_POLICY = PasswordPolicy(length=12, symbols="!@#$%^&*", min_classes=4)
+
+PASSWORD_POLICIES = {
+    # IAM account policies commonly require every character class
+    "aws": PasswordPolicy(length=16, symbols="!@#$%^&*", min_classes=4),
+    # RAM login profiles: 8-32 characters, all classes by default
+    "alibaba": PasswordPolicy(length=16, symbols="!@#$%^&*", min_classes=4),
+    # Azure AD requires 3 of the 4 classes; 16 characters clears its strength checks
+    "azure": PasswordPolicy(length=16, symbols="!@#$%^&*", min_classes=3),
+    # OCI console passwords must carry every class
+    "oci": PasswordPolicy(length=16, symbols="!@#$%^&*", min_classes=4),
+    # chpasswd reads "name:password" lines, so ':' must never appear
+    "local": PasswordPolicy(length=12, symbols="!@#$%^&*", min_classes=4),
+}
+
+# Per-process random tag plus a counter: unique within a run, and runs do not collide
+_name_counter = itertools.count(1)
+_RUN_TAG = secrets.token_hex(3)
+
+
+def password_policy(provider=None):
+    """Return the password policy for a provider, or the default one."""
+    return PASSWORD_POLICIES.get(provider, DEFAULT_PASSWORD_POLICY)
+
+
+@functools.lru_cache(maxsize=None)
+def _translation(alphabet):
+    """Build a bytes.translate table mapping random bytes onto `alphabet` without modulo bias.
+
+    Bytes at or above the largest multiple of len(alphabet) are deleted
+    instead of mapped (rejection sampling), so every character is equally likely.
+    """
+    limit = 256 - 256 % len(alphabet)
+    table = bytes(ord(alphabet[b % len(alphabet)]) if b < limit else 0 for b in range(256))
+    return table, bytes(range(limit, 256)), limit
+
+
+def generate_passwords(count, provider=None):
+    """Return `count` passwords that satisfy a provider's policy.
+
+    Characters come from one secrets.token_bytes buffer per round, mapped
+    onto the alphabet by bytes.translate, so the per-character work happens
+    in C. Passwords missing required character classes are drawn again.
+    """
+    policy = password_policy(provider)
+    classes = [string.ascii_lowercase, string.ascii_uppercase, string.digits, policy.symbols]
+    alphabet = "".join(classes)
+    table, rejected, limit = _translation(alphabet)
+    class_sets = [frozenset(chars) for chars in classes if chars]
+    length = policy.length
+
+    passwords = []
+    while len(passwords) < count:
+        needed = (count - len(passwords)) * length
+        # Oversample for the rejected bytes and the passwords that fail the policy
+        raw = secrets.token_bytes(needed * 256 // limit + needed // 2 + length)
+        chars = raw.translate(table, rejected).decode("ascii")
+        candidates = [chars[start:start + length] for start in range(0, len(chars) - length + 1, length)]
+        passwords.extend(
+            password for password in candidates
+            if sum(not char_set.isdisjoint(password) for char_set in class_sets) >= policy.min_classes
+        )
+    return passwords[:count]
+
+
+def generate_password(provider=None):
+    """Return one password that satisfies a provider's policy."""
+    return generate_passwords(1, provider)[0]
+
+
+def unique_name(prefix):
+    """Return `<prefix>-<run tag><counter>`, unique for the life of the process.
+
+    The counter rules out collisions within a run and the random run tag
+    keeps separate runs apart, unlike a random 4-digit suffix, which
+    collides after roughly a hundred names.
+    """
+    return f"{prefix}-{_RUN_TAG}{next(_name_counter)}"
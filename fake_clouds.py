@@ -0,0 +1,1512 @@
+"""In-process stand-ins for the cloud SDK clients used by the simulation scripts."""
+import bisect
+import copy
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+class FakeClientError(Exception):
+    """Mimic botocore's ClientError, which carries the error code in `response`."""
+
+    def __init__(self, code, operation_name):
+        super().__init__(f"An error occurred ({code}) when calling the {operation_name} operation")
+        self.response = {"Error": {"Code": code, "Message": f"{operation_name} failed"}}
+
+
+class FakeService:
+    """Latency and throttling injection shared by the fake clients.
+
+    Every call sleeps `latency` seconds and is then rejected with the
+    provider's throttling error at `throttle_rate`, drawn from a seeded
+    generator so runs are repeatable.
+    """
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def throttling_error(self, operation_name):
+        """Return the exception this provider raises when it throttles a call."""
+        raise NotImplementedError
+
+    def _call(self, operation_name):
+        """Simulate one round-trip, raising a throttling error at the configured rate."""
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise self.throttling_error(operation_name)
+
+
+class StubIAMClient(FakeService):
+    """Thread-safe stand-in for boto3's IAM client with fixed per-call latency."""
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None):
+        super().__init__(latency, throttle_rate, seed)
+        self.users = {}
+
+    def throttling_error(self, operation_name):
+        return FakeClientError("Throttling", operation_name)
+
+    def create_user(self, UserName):
+        self._call("CreateUser")
+        with self._lock:
+            if UserName in self.users:
+                raise FakeClientError("EntityAlreadyExists", "CreateUser")
+            self.users[UserName] = {"Policies": [], "AccessKeys": [], "LoginProfile": False}
+        return {"User": {"UserName": UserName}}
+
+    def create_login_profile(self, UserName, Password, PasswordResetRequired=False):
+        self._call("CreateLoginProfile")
+        with self._lock:
+            self.users[UserName]["LoginProfile"] = True
+        return {"LoginProfile": {"UserName": UserName}}
+
+    def attach_user_policy(self, UserName, PolicyArn):
+        self._call("AttachUserPolicy")
+        with self._lock:
+            self.users[UserName]["Policies"].append(PolicyArn)
+        return {}
+
+    def create_access_key(self, UserName):
+        self._call("CreateAccessKey")
+        access_key_id = "AKIA" + uuid.uuid4().hex[:16].upper()
+        with self._lock:
+            self.users[UserName]["AccessKeys"].append(access_key_id)
+        return {
+            "AccessKey": {
+                "UserName": UserName,
+                "AccessKeyId": access_key_id,
+                "SecretAccessKey": uuid.uuid4().hex,
+            }
+        }
+
+    def list_users(self, PathPrefix="/", Marker=None, MaxItems=100):
+        self._call("ListUsers")
+        with self._lock:
+            names = sorted(self.users)
+        start = bisect.bisect_left(names, Marker) if Marker else 0
+        page = names[start:start + MaxItems]
+        response = {"Users": [{"UserName": name, "Path": "/"} for name in page], "IsTruncated": False}
+        if start + MaxItems < len(names):
+            response.update(IsTruncated=True, Marker=names[start + MaxItems])
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_users":
+            raise NotImplementedError(operation_name)
+        return FakeListUsersPaginator(self)
+
+    def list_access_keys(self, UserName):
+        self._call("ListAccessKeys")
+        with self._lock:
+            user = self._user(UserName, "ListAccessKeys")
+            return {"AccessKeyMetadata": [{"AccessKeyId": key} for key in user["AccessKeys"]]}
+
+    def list_attached_user_policies(self, UserName):
+        self._call("ListAttachedUserPolicies")
+        with self._lock:
+            user = self._user(UserName, "ListAttachedUserPolicies")
+            return {"AttachedPolicies": [{"PolicyArn": arn} for arn in user["Policies"]]}
+
+    def _user(self, UserName, operation_name):
+        if UserName not in self.users:
+            raise FakeClientError("NoSuchEntity", operation_name)
+        return self.users[UserName]
+
+    def delete_access_key(self, UserName, AccessKeyId):
+        self._call("DeleteAccessKey")
+        with self._lock:
+            user = self._user(UserName, "DeleteAccessKey")
+            if AccessKeyId not in user["AccessKeys"]:
+                raise FakeClientError("NoSuchEntity", "DeleteAccessKey")
+            user["AccessKeys"].remove(AccessKeyId)
+        return {}
+
+    def detach_user_policy(self, UserName, PolicyArn):
+        self._call("DetachUserPolicy")
+        with self._lock:
+            user = self._user(UserName, "DetachUserPolicy")
+            if PolicyArn not in user["Policies"]:
+                raise FakeClientError("NoSuchEntity", "DetachUserPolicy")
+            user["Policies"].remove(PolicyArn)
+        return {}
+
+    def delete_login_profile(self, UserName):
+        self._call("DeleteLoginProfile")
+        with self._lock:
+            user = self._user(UserName, "DeleteLoginProfile")
+            if not user["LoginProfile"]:
+                raise FakeClientError("NoSuchEntity", "DeleteLoginProfile")
+            user["LoginProfile"] = False
+        return {}
+
+    def delete_user(self, UserName):
+        self._call("DeleteUser")
+        with self._lock:
+            user = self._user(UserName, "DeleteUser")
+            # Like IAM, refuse to delete a user that still has attached entities
+            if user["AccessKeys"] or user["Policies"] or user["LoginProfile"]:
+                raise FakeClientError("DeleteConflict", "DeleteUser")
+            del self.users[UserName]
+        return {}
+
+
+class FakeSTSClient(FakeService):
+    """Stand-in for boto3's STS client."""
+
+    def __init__(self, account_id="123456789012", latency=0.01, throttle_rate=0.0, seed=None, trusted_accounts=None):
+        super().__init__(latency, throttle_rate, seed)
+        self.account_id = account_id
+        # Accounts whose roles can be assumed; None trusts every account
+        self.trusted_accounts = trusted_accounts
+        self.assumed = 0
+
+    def throttling_error(self, operation_name):
+        return FakeClientError("Throttling", operation_name)
+
+    def get_caller_identity(self):
+        self._call("GetCallerIdentity")
+        return {
+            "UserId": "AIDAFAKECALLER",
+            "Account": self.account_id,
+            "Arn": f"arn:aws:iam::{self.account_id}:user/fake-caller",
+        }
+
+    def assume_role(self, RoleArn, RoleSessionName, DurationSeconds=3600):
+        self._call("AssumeRole")
+        account_id = RoleArn.split(":")[4]
+        if self.trusted_accounts is not None and account_id not in self.trusted_accounts:
+            raise FakeClientError("AccessDenied", "AssumeRole")
+        with self._lock:
+            self.assumed += 1
+            serial = self.assumed
+        return {
+            "Credentials": {
+                # Key IDs carry the account, so FakeAWSAccounts can route a session to it
+                "AccessKeyId": f"ASIA{account_id}{serial:04d}",
+                "SecretAccessKey": f"fake-secret-{serial}",
+                "SessionToken": f"fake-token-{serial}",
+                "Expiration": datetime.now(timezone.utc) + timedelta(seconds=DurationSeconds),
+            },
+            "AssumedRoleUser": {"Arn": f"arn:aws:sts::{account_id}:assumed-role/{RoleSessionName}"},
+        }
+
+
+class FakeBotoSession:
+    """Stand-in for boto3.Session: hands out the fake clients of one account in one region."""
+
+    def __init__(self, accounts, account_id, region_name=None):
+        self.accounts = accounts
+        self.account_id = account_id
+        self.region_name = region_name
+
+    def client(self, service_name, config=None):
+        return self.accounts.create_client(service_name, self.account_id, self.region_name, config)
+
+
+class FakeAWSAccounts:
+    """A set of fake AWS accounts behind a boto3.Session factory.
+
+    `session(**credentials)` returns a session for the first account, or
+    for the account an assumed-role key was issued in. Each client creation
+    sleeps `client_creation_time`, standing in for loading the service
+    model and opening a first TLS connection. IAM and STS clients are kept
+    per account and CloudFormation clients per account and region.
+    """
+
+    def __init__(self, account_ids=("123456789012",), latency=0.01, throttle_rate=0.0, seed=None,
+                 client_creation_time=0.0):
+        self.account_ids = list(account_ids)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self.client_creation_time = client_creation_time
+        self.sessions_created = 0
+        self.clients_created = 0
+        self.pool_sizes = []
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def session(self, aws_access_key_id=None, aws_secret_access_key=None, aws_session_token=None,
+                region_name=None):
+        account_id = aws_access_key_id[4:16] if aws_access_key_id else self.account_ids[0]
+        with self._lock:
+            self.sessions_created += 1
+        return FakeBotoSession(self, account_id, region_name)
+
+    def service(self, service_name, account_id, region_name=None):
+        """Return the fake behind a service in an account, creating it on first use."""
+        key = (service_name, account_id, region_name if service_name == "cloudformation" else None)
+        with self._lock:
+            if key not in self.clients:
+                if service_name == "iam":
+                    client = StubIAMClient(self.latency, self.throttle_rate, self.seed)
+                elif service_name == "sts":
+                    client = FakeSTSClient(account_id, self.latency, trusted_accounts=self.account_ids)
+                elif service_name == "cloudformation":
+                    client = FakeCloudFormationClient(self.latency, self.throttle_rate, self.seed)
+                else:
+                    raise NotImplementedError(service_name)
+                self.clients[key] = client
+            return self.clients[key]
+
+    def create_client(self, service_name, account_id, region_name=None, config=None):
+        time.sleep(self.client_creation_time)
+        with self._lock:
+            self.clients_created += 1
+            self.pool_sizes.append(getattr(config, "max_pool_connections", None))
+        return self.service(service_name, account_id, region_name)
+
+    @property
+    def sts_calls(self):
+        """Return the STS calls made across every account."""
+        with self._lock:
+            return sum(client.calls for (service_name, _, _), client in self.clients.items() if service_name == "sts")
+
+
+def install_fake_botocore():
+    """Register a stand-in `botocore.config.Config` when botocore is not installed."""
+    import importlib.util
+    import sys
+    from types import ModuleType
+
+    if importlib.util.find_spec("botocore") is not None:
+        return
+    botocore = sys.modules.setdefault("botocore", ModuleType("botocore"))
+    config = ModuleType("botocore.config")
+    config.Config = lambda **options: SimpleNamespace(**options)
+    botocore.config = config
+    sys.modules["botocore.config"] = config
+
+
+class FakeListUsersPaginator:
+    """Stand-in for boto3's list_users paginator, following Marker across pages."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, PathPrefix="/", PaginationConfig=None):
+        page_size = (PaginationConfig or {}).get("PageSize", 100)
+        marker = None
+        while True:
+            page = self.client.list_users(PathPrefix=PathPrefix, Marker=marker, MaxItems=page_size)
+            yield page
+            if not page["IsTruncated"]:
+                return
+            marker = page["Marker"]
+
+
+class FakeCloudFormationClient(FakeService):
+    """Stand-in for boto3's CloudFormation client.
+
+    Stacks finish creating or deleting `operation_time` seconds after the
+    call. Templates are checked against the CloudFormation limits, and
+    Fn::ForEach loops over CommaDelimitedList parameters are expanded to
+    count the resources a stack holds.
+    """
+
+    MAX_TEMPLATE_BODY_BYTES = 51_200
+    MAX_PARAMETER_BYTES = 4096
+    MAX_RESOURCES = 500
+    PAGE_SIZE = 100
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None, operation_time=0.0):
+        super().__init__(latency, throttle_rate, seed)
+        self.operation_time = operation_time
+        self.stacks = {}
+        self.buckets = {}
+
+    def throttling_error(self, operation_name):
+        return FakeClientError("Throttling", operation_name)
+
+    @staticmethod
+    def _expand(template, parameters):
+        resources = {}
+        for logical_id, resource in template.get("Resources", {}).items():
+            if not logical_id.startswith("Fn::ForEach::"):
+                resources[logical_id] = resource
+                continue
+            identifier, collection, fragment = resource
+            for value in parameters[collection["Ref"]].split(","):
+                for template_id, item in fragment.items():
+                    expanded_id = template_id.replace(f"&{{{identifier}}}", re.sub(r"[^A-Za-z0-9]", "", value))
+                    properties = json.loads(json.dumps(item.get("Properties", {})).replace(
+                        json.dumps({"Ref": identifier}), json.dumps(value)
+                    ))
+                    resources[expanded_id] = dict(item, Properties=properties, Owner=value)
+        return resources
+
+    def _bucket_name(self, resource, parameters, owner):
+        name = resource["Properties"].get("BucketName")
+        if isinstance(name, dict):
+            name = name["Fn::Sub"].replace("${UserName}", owner)
+            for key, value in parameters.items():
+                name = name.replace(f"${{{key}}}", value)
+        return name
+
+    def create_stack(self, StackName, TemplateBody, Parameters=None, Capabilities=None, Tags=None, **kwargs):
+        self._call("CreateStack")
+        if len(TemplateBody.encode()) > self.MAX_TEMPLATE_BODY_BYTES:
+            raise FakeClientError("ValidationError", "CreateStack")
+        template = json.loads(TemplateBody)
+        if "Transform" in template and "CAPABILITY_AUTO_EXPAND" not in (Capabilities or []):
+            raise FakeClientError("InsufficientCapabilitiesException", "CreateStack")
+        parameters = {
+            key: str(spec["Default"]) for key, spec in template.get("Parameters", {}).items() if "Default" in spec
+        }
+        for parameter in Parameters or []:
+            if len(parameter["ParameterValue"].encode()) > self.MAX_PARAMETER_BYTES:
+                raise FakeClientError("ValidationError", "CreateStack")
+            parameters[parameter["ParameterKey"]] = parameter["ParameterValue"]
+        resources = self._expand(template, parameters)
+        if len(resources) > self.MAX_RESOURCES:
+            raise FakeClientError("ValidationError", "CreateStack")
+        with self._lock:
+            if StackName in self.stacks:
+                raise FakeClientError("AlreadyExistsException", "CreateStack")
+            failure = None
+            buckets = []
+            for logical_id, resource in resources.items():
+                if resource["Type"] == "AWS::S3::Bucket":
+                    name = self._bucket_name(resource, parameters, resource.get("Owner"))
+                    if name in self.buckets:
+                        failure = (logical_id, f"{name} already exists")
+                    buckets.append(name)
+            if not failure:
+                for name in buckets:
+                    self.buckets[name] = StackName
+            stack_id = f"arn:aws:cloudformation:us-east-1:123456789012:stack/{StackName}/{uuid.uuid4()}"
+            self.stacks[StackName] = {
+                "StackId": stack_id,
+                "Resources": {} if failure else resources,
+                "Buckets": [] if failure else buckets,
+                "Failure": failure,
+                "Tags": Tags or [],
+                "ReadyAt": time.monotonic() + self.operation_time,
+                "DeletedAt": None,
+            }
+        return {"StackId": stack_id}
+
+    def _status(self, stack):
+        now = time.monotonic()
+        if stack["DeletedAt"] is not None:
+            return "DELETE_COMPLETE" if now >= stack["DeletedAt"] else "DELETE_IN_PROGRESS"
+        if now < stack["ReadyAt"]:
+            return "CREATE_IN_PROGRESS"
+        return "ROLLBACK_COMPLETE" if stack["Failure"] else "CREATE_COMPLETE"
+
+    def _live_stacks(self):
+        live = {}
+        for name, stack in list(self.stacks.items()):
+            if self._status(stack) == "DELETE_COMPLETE":
+                del self.stacks[name]
+                for bucket in stack["Buckets"]:
+                    self.buckets.pop(bucket, None)
+            else:
+                live[name] = stack
+        return live
+
+    def describe_stacks(self, StackName=None, NextToken=None):
+        self._call("DescribeStacks")
+        with self._lock:
+            stacks = self._live_stacks()
+            if StackName:
+                if StackName not in stacks:
+                    raise FakeClientError("ValidationError", "DescribeStacks")
+                names = [StackName]
+            else:
+                names = sorted(stacks)
+            start = int(NextToken or 0)
+            page = {"Stacks": [
+                {"StackName": name, "StackId": stacks[name]["StackId"], "StackStatus": self._status(stacks[name])}
+                for name in names[start:start + self.PAGE_SIZE]
+            ]}
+        if start + self.PAGE_SIZE < len(names):
+            page["NextToken"] = str(start + self.PAGE_SIZE)
+        return page
+
+    def describe_stack_events(self, StackName):
+        self._call("DescribeStackEvents")
+        with self._lock:
+            stack = self._live_stacks().get(StackName)
+            if stack is None:
+                raise FakeClientError("ValidationError", "DescribeStackEvents")
+            events = [{"LogicalResourceId": StackName, "ResourceStatus": self._status(stack)}]
+            if stack["Failure"]:
+                logical_id, reason = stack["Failure"]
+                events.append({"LogicalResourceId": logical_id, "ResourceStatus": "CREATE_FAILED",
+                               "ResourceStatusReason": reason})
+        return {"StackEvents": events}
+
+    def delete_stack(self, StackName):
+        self._call("DeleteStack")
+        with self._lock:
+            stack = self._live_stacks().get(StackName)
+            # Deleting a stack that does not exist succeeds, as in CloudFormation
+            if stack is not None and stack["DeletedAt"] is None:
+                stack["DeletedAt"] = time.monotonic() + self.operation_time
+        return {}
+
+    def get_paginator(self, operation_name):
+        if operation_name != "describe_stacks":
+            raise NotImplementedError(operation_name)
+        return FakeDescribeStacksPaginator(self)
+
+    def live_resources(self):
+        """Return how many resources the stacks not yet deleted hold."""
+        with self._lock:
+            return sum(len(stack["Resources"]) for stack in self._live_stacks().values())
+
+
+class FakeDescribeStacksPaginator:
+    """Stand-in for boto3's describe_stacks paginator, following NextToken across pages."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            page = self.client.describe_stacks(NextToken=token, **kwargs)
+            yield page
+            token = page.get("NextToken")
+            if not token:
+                return
+
+
+class FakeHttpError(Exception):
+    """Mimic googleapiclient's HttpError, which exposes the HTTP status as `resp.status`."""
+
+    def __init__(self, status, reason):
+        super().__init__(f'<HttpError {status} "{reason}">')
+        self.resp = SimpleNamespace(status=status, reason=reason)
+
+
+class FakeHttpRequest:
+    """Deferred call returned by the fake GCP resources; runs when executed."""
+
+    def __init__(self, service, handler):
+        self.service = service
+        self.handler = handler
+
+    def execute(self):
+        self.service.round_trip()
+        return self.handler()
+
+
+class FakeBatchHttpRequest:
+    """Stand-in for googleapiclient's BatchHttpRequest: many calls, one round trip."""
+
+    MAX_BATCH_SIZE = 1000
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if len(self.requests) >= self.MAX_BATCH_SIZE:
+            raise ValueError(f"Exceeded maximum calls ({self.MAX_BATCH_SIZE}) in a batch request.")
+        request_id = request_id or str(len(self.requests) + 1)
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        self.service.round_trip()
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = request.handler(), None
+            except FakeHttpError as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeGCPIAMService:
+    """Stand-in for `build('iam', 'v1')` holding one project's IAM policy and service accounts.
+
+    The same object serves as the `projects()` and `serviceAccounts()`
+    resources. `conflict_rate` simulates another writer updating the policy
+    between a read and a write, so setIamPolicy fails with a 409 the way the
+    real API does on an etag mismatch. `throttle_rate` rejects whole HTTP
+    requests with a 429.
+    """
+
+    def __init__(self, latency=0.01, conflict_rate=0.0, seed=None, throttle_rate=0.0):
+        self.latency = latency
+        self.conflict_rate = conflict_rate
+        self.throttle_rate = throttle_rate
+        self.requests = 0
+        self.conflicts = 0
+        self.throttled = 0
+        self.service_accounts = {}
+        self._version = 1
+        self._policy = {"bindings": [], "etag": "BwX1"}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def round_trip(self):
+        """Simulate one HTTP request to the IAM API."""
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise FakeHttpError(429, "rateLimitExceeded")
+
+    @property
+    def policy(self):
+        with self._lock:
+            return copy.deepcopy(self._policy)
+
+    def projects(self):
+        return self
+
+    def serviceAccounts(self):
+        return self
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatchHttpRequest(self, callback)
+
+    def getIamPolicy(self, resource):
+        return FakeHttpRequest(self, lambda: self.policy)
+
+    def setIamPolicy(self, resource, body):
+        def handler():
+            with self._lock:
+                if self._random.random() < self.conflict_rate:
+                    self._version += 1
+                    self._policy["etag"] = f"BwX{self._version}"
+                if body["policy"].get("etag") != self._policy["etag"]:
+                    self.conflicts += 1
+                    raise FakeHttpError(409, "There were concurrent policy changes.")
+                self._version += 1
+                self._policy = copy.deepcopy(body["policy"])
+                self._policy["etag"] = f"BwX{self._version}"
+                return copy.deepcopy(self._policy)
+        return FakeHttpRequest(self, handler)
+
+    def create(self, name, body):
+        def handler():
+            project_id = name.split("/")[-1]
+            email = f"{body['accountId']}@{project_id}.iam.gserviceaccount.com"
+            with self._lock:
+                if email in self.service_accounts:
+                    raise FakeHttpError(409, f"Service account {body['accountId']} already exists.")
+                self.service_accounts[email] = {"email": email, "name": f"{name}/serviceAccounts/{email}"}
+                return dict(self.service_accounts[email])
+        return FakeHttpRequest(self, handler)
+
+    def delete(self, name):
+        def handler():
+            email = name.split("/")[-1]
+            with self._lock:
+                if self.service_accounts.pop(email, None) is None:
+                    raise FakeHttpError(404, f"Service account {email} not found.")
+                return {}
+        return FakeHttpRequest(self, handler)
+
+    def list(self, name, pageSize=100, pageToken=None):
+        def handler():
+            with self._lock:
+                emails = sorted(self.service_accounts)
+                start = bisect.bisect_left(emails, pageToken) if pageToken else 0
+                page = [dict(self.service_accounts[email]) for email in emails[start:start + pageSize]]
+                response = {"accounts": page}
+                if start + pageSize < len(emails):
+                    response["nextPageToken"] = emails[start + pageSize]
+                return response
+        request = FakeHttpRequest(self, handler)
+        request.list_args = (name, pageSize)
+        return request
+
+    def list_next(self, previous_request, previous_response):
+        if "nextPageToken" not in previous_response:
+            return None
+        name, page_size = previous_request.list_args
+        return self.list(name, page_size, previous_response["nextPageToken"])
+
+
+class FakeServerException(Exception):
+    """Mimic aliyunsdkcore's ServerException, which exposes the RAM error code."""
+
+    def __init__(self, code, message, http_status=400):
+        super().__init__(f"HTTP Status: {http_status} Error:{code} {message}")
+        self.code = code
+        self.http_status = http_status
+
+    def get_error_code(self):
+        return self.code
+
+    def get_http_status(self):
+        return self.http_status
+
+
+class FakeRamRequest:
+    """Stand-in for an aliyunsdkram request class; `set_X(value)` records parameter X."""
+
+    action_name = None
+
+    def __init__(self):
+        self._params = {}
+
+    def __getattr__(self, name):
+        if name.startswith("set_"):
+            return lambda value: self._params.__setitem__(name[4:], value)
+        raise AttributeError(name)
+
+    def get_action_name(self):
+        return self.action_name
+
+    def get_query_params(self):
+        return self._params
+
+
+RAM_ACTIONS = [
+    "CreateUser", "CreateAccessKey", "AttachPolicyToUser", "DetachPolicyFromUser",
+    "DeleteAccessKey", "DeleteUser", "ListUsers", "ListAccessKeys", "ListPoliciesForUser",
+]
+
+
+def install_fake_ram_requests():
+    """Register stand-in aliyunsdkram request modules when the real SDK is not installed."""
+    import importlib.util
+    import sys
+    from types import ModuleType
+
+    if importlib.util.find_spec("aliyunsdkram") is not None:
+        return
+    package = "aliyunsdkram.request.v20150501"
+    for parent in ("aliyunsdkram", "aliyunsdkram.request", package):
+        sys.modules.setdefault(parent, ModuleType(parent))
+    for action in RAM_ACTIONS:
+        class_name = f"{action}Request"
+        module = ModuleType(f"{package}.{class_name}")
+        setattr(module, class_name, type(class_name, (FakeRamRequest,), {"action_name": action}))
+        sys.modules[module.__name__] = module
+
+
+class FakeAcsClient:
+    """Thread-safe stand-in for AcsClient serving the RAM actions the simulation uses.
+
+    Requests beyond `qps_quota` in any one-second window fail with
+    Throttling.User, the way RAM enforces its per-account API quota;
+    `throttle_rate` rejects a random share of the remaining requests too.
+    """
+
+    def __init__(self, latency=0.01, qps_quota=None, throttle_rate=0.0, seed=None):
+        self.latency = latency
+        self.qps_quota = qps_quota
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.throttled = 0
+        self.users = {}
+        self._window = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _admit(self, action):
+        """Count the call against the quota window, raising when it is exhausted."""
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise FakeServerException("Throttling.User", f"Request was denied due to flow control ({action}).")
+            if self.qps_quota is None:
+                return
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.qps_quota:
+                self.throttled += 1
+                raise FakeServerException(
+                    "Throttling.User", f"Request was denied due to user flow control ({action})."
+                )
+            self._window.append(now)
+
+    def do_action_with_exception(self, request):
+        action = request.get_action_name()
+        params = request.get_query_params()
+        self._admit(action)
+        time.sleep(self.latency)
+        user_name = params.get("UserName")
+        request_id = str(uuid.uuid4()).upper()
+        with self._lock:
+            user = self.users.get(user_name)
+            if action == "ListUsers":
+                names = sorted(self.users)
+                start = bisect.bisect_left(names, params["Marker"]) if params.get("Marker") else 0
+                page_size = int(params.get("MaxItems", 100))
+                page = names[start:start + page_size]
+                body = {"RequestId": request_id, "IsTruncated": start + page_size < len(names),
+                        "Users": {"User": [{"UserName": name, "UserId": self.users[name]["UserId"]}
+                                           for name in page]}}
+                if body["IsTruncated"]:
+                    body["Marker"] = names[start + page_size]
+            elif action == "CreateUser":
+                if user:
+                    raise FakeServerException("EntityAlreadyExists.User", "The user already exists.", 409)
+                self.users[user_name] = {"UserId": uuid.uuid4().hex[:16], "AccessKeys": [], "Policies": set()}
+                body = {"RequestId": request_id, "User": {
+                    "UserId": self.users[user_name]["UserId"], "UserName": user_name,
+                    "DisplayName": params.get("DisplayName", user_name),
+                }}
+            elif user is None:
+                raise FakeServerException("EntityNotExist.User", "The user does not exist.", 404)
+            elif action == "CreateAccessKey":
+                access_key_id = "LTAI" + uuid.uuid4().hex[:20]
+                user["AccessKeys"].append(access_key_id)
+                body = {"RequestId": request_id, "AccessKey": {
+                    "AccessKeyId": access_key_id, "AccessKeySecret": uuid.uuid4().hex, "Status": "Active",
+                }}
+            elif action == "AttachPolicyToUser":
+                user["Policies"].add(params["PolicyName"])
+                body = {"RequestId": request_id}
+            elif action == "ListAccessKeys":
+                body = {"RequestId": request_id, "AccessKeys": {"AccessKey": [
+                    {"AccessKeyId": key, "Status": "Active"} for key in user["AccessKeys"]
+                ]}}
+            elif action == "ListPoliciesForUser":
+                body = {"RequestId": request_id, "Policies": {"Policy": [
+                    {"PolicyName": name, "PolicyType": "System"} for name in sorted(user["Policies"])
+                ]}}
+            elif action == "DetachPolicyFromUser":
+                user["Policies"].discard(params["PolicyName"])
+                body = {"RequestId": request_id}
+            elif action == "DeleteAccessKey":
+                if params.get("UserAccessKeyId") not in user["AccessKeys"]:
+                    raise FakeServerException(
+                        "EntityNotExist.User.AccessKey", "The access key does not exist.", 404
+                    )
+                user["AccessKeys"].remove(params["UserAccessKeyId"])
+                body = {"RequestId": request_id}
+            elif action == "DeleteUser":
+                if user["AccessKeys"] or user["Policies"]:
+                    raise FakeServerException("DeleteConflict.User", "The user still has keys or policies.", 409)
+                del self.users[user_name]
+                body = {"RequestId": request_id}
+            else:
+                raise FakeServerException("InvalidAction.NotFound", f"Unsupported action {action}.", 404)
+        return json.dumps(body).encode()
+
+
+class FakePasswdBackend:
+    """Stand-in for `subprocess.run` that applies user-management commands to a fake passwd file.
+
+    Supports the useradd/userdel/chpasswd/newusers/xargs invocations made by
+    local_server_user_simulation, with home directories created under
+    `root`. Like the real tools, every command rewrites the passwd file, and
+    every process the real command line would start is spawned for real
+    (as `true`) so process-creation cost shows up in timings.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.passwd_file = os.path.join(root, "passwd")
+        self.processes = 0
+        self.sudo_calls = 0
+        self.users = {}
+        self._next_uid = 1000
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "home"), exist_ok=True)
+
+    def _spawn(self):
+        """Start a real short-lived process to account for fork/exec cost."""
+        self.processes += 1
+        subprocess.run(["true"], check=True)
+
+    def _write_passwd(self):
+        with open(self.passwd_file, "w") as f:
+            for name, entry in self.users.items():
+                f.write(f"{name}:x:{entry['uid']}:{entry['uid']}::/home/{name}:/bin/bash\n")
+
+    def _add_user(self, name):
+        if name in self.users:
+            return False
+        self.users[name] = {"uid": self._next_uid, "password": None}
+        self._next_uid += 1
+        os.makedirs(os.path.join(self.root, "home", name), exist_ok=True)
+        return True
+
+    def _delete_user(self, name):
+        if self.users.pop(name, None) is None:
+            return False
+        shutil.rmtree(os.path.join(self.root, "home", name), ignore_errors=True)
+        return True
+
+    def getpwnam(self, name):
+        """Stand-in for `pwd.getpwnam` over the fake passwd file."""
+        with self._lock:
+            if name not in self.users:
+                raise KeyError(f"getpwnam(): name not found: '{name}'")
+            return SimpleNamespace(pw_name=name, pw_uid=self.users[name]["uid"], pw_dir=f"/home/{name}")
+
+    def _execute(self, command, stdin):
+        """Apply one command and return its exit status."""
+        self._spawn()
+        program = command[0]
+        if program == "useradd":
+            status = 0 if self._add_user(command[-1]) else 9
+        elif program == "userdel":
+            status = 0 if self._delete_user(command[-1]) else 6
+        elif program == "newusers":
+            with open(command[1]) as f:
+                names = [line.split(":", 1)[0] for line in f if line.strip()]
+            status = 0 if all([self._add_user(name) for name in names]) else 1
+        elif program == "chpasswd":
+            for line in stdin.decode().splitlines():
+                name, password = line.split(":", 1)
+                if name not in self.users:
+                    return 1
+                self.users[name]["password"] = password
+            status = 0
+        elif program == "xargs":
+            # xargs -r -n 1 <command...>: one child process per input line
+            child = command[command.index("-n") + 2:]
+            statuses = [self._execute(child + [name], None) for name in stdin.decode().split()]
+            return 123 if any(statuses) else 0
+        else:
+            raise ValueError(f"Unsupported command: {program}")
+        self._write_passwd()
+        return status
+
+    def __call__(self, args, check=False, input=None, **kwargs):
+        command = list(args)
+        with self._lock:
+            if command[0] == "sudo":
+                self.sudo_calls += 1
+                self._spawn()
+                command = command[1:]
+            status = self._execute(command, input)
+        if check and status:
+            raise subprocess.CalledProcessError(status, args)
+        return subprocess.CompletedProcess(args, status)
+
+
+class FakeApiException(Exception):
+    """Mimic ibm_cloud_sdk_core's ApiException, which carries the HTTP status as `code`."""
+
+    def __init__(self, code, message):
+        super().__init__(f"Error: {message}, Status code: {code}")
+        self.code = code
+        self.message = message
+
+
+class FakeDetailedResponse:
+    """Stand-in for ibm_cloud_sdk_core's DetailedResponse."""
+
+    def __init__(self, result, status_code=200):
+        self.result = result
+        self.status_code = status_code
+
+    def get_result(self):
+        return self.result
+
+
+class FakeIamIdentityV1(FakeService):
+    """Thread-safe stand-in for ibm_platform_services.IamIdentityV1's API key calls."""
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None):
+        super().__init__(latency, throttle_rate, seed)
+        self.api_keys = {}
+
+    def throttling_error(self, operation_name):
+        return FakeApiException(429, f"Too many requests ({operation_name})")
+
+    def create_api_key(self, name, iam_id, description=None, account_id=None, apikey=None):
+        self._call("create_api_key")
+        api_key_id = f"ApiKey-{uuid.uuid4()}"
+        api_key = {"id": api_key_id, "name": name, "iam_id": iam_id, "description": description,
+                   "account_id": account_id, "apikey": apikey or uuid.uuid4().hex}
+        with self._lock:
+            self.api_keys[api_key_id] = api_key
+        return FakeDetailedResponse(dict(api_key), 201)
+
+    def delete_api_key(self, id):
+        self._call("delete_api_key")
+        with self._lock:
+            if self.api_keys.pop(id, None) is None:
+                raise FakeApiException(404, f"API key {id} not found")
+        return FakeDetailedResponse(None, 204)
+
+    def list_api_keys(self, account_id=None, pagesize=None, pagetoken=None, **kwargs):
+        self._call("list_api_keys")
+        page_size = pagesize or 20
+        with self._lock:
+            ids = sorted(self.api_keys)
+            start = bisect.bisect_left(ids, pagetoken) if pagetoken else 0
+            page = [{key: value for key, value in self.api_keys[api_key_id].items() if key != "apikey"}
+                    for api_key_id in ids[start:start + page_size]]
+        result = {"limit": page_size, "apikeys": page}
+        if start + page_size < len(ids):
+            result["next"] = ("https://iam.cloud.ibm.com/v1/apikeys"
+                              f"?pagesize={page_size}&pagetoken={ids[start + page_size]}")
+        return FakeDetailedResponse(result)
+
+
+class FakeOCIServiceError(Exception):
+    """Mimic oci.exceptions.ServiceError, which carries `status` and `code`."""
+
+    def __init__(self, status, code, message):
+        super().__init__(f"{{'status': {status}, 'code': '{code}', 'message': '{message}'}}")
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class FakeOCIModel:
+    """Stand-in for the oci model classes: keyword arguments become attributes."""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeOCIResponse:
+    """Stand-in for oci.response.Response."""
+
+    def __init__(self, data, next_page=None):
+        self.data = data
+        self.next_page = next_page
+        self.has_next_page = next_page is not None
+
+
+class FakeOCIIdentityClient(FakeService):
+    """Thread-safe stand-in for oci.identity.IdentityClient's user, group and policy calls.
+
+    Like OCI, new users start in CREATING and deleted users in DELETING;
+    they turn ACTIVE, or drop out of listings, `settle_time` seconds later.
+    """
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None, settle_time=0.0):
+        super().__init__(latency, throttle_rate, seed)
+        self.settle_time = settle_time
+        self.users = {}
+        self.groups = {}
+        self.policies = {}
+        self.memberships = {}
+
+    def throttling_error(self, operation_name):
+        return FakeOCIServiceError(429, "TooManyRequests", f"Too many requests for {operation_name}")
+
+    def _state(self, user):
+        settled = time.monotonic() - user["changed_at"] >= self.settle_time
+        if user["state"] == "CREATING" and settled:
+            user["state"] = "ACTIVE"
+        elif user["state"] == "DELETING" and settled:
+            user["state"] = "DELETED"
+        return user["state"]
+
+    def _missing(self, kind, ocid):
+        return FakeOCIServiceError(404, "NotAuthorizedOrNotFound", f"{kind} {ocid} not found")
+
+    def create_user(self, create_user_details):
+        self._call("CreateUser")
+        with self._lock:
+            if any(user["name"] == create_user_details.name and user["state"] != "DELETED"
+                   for user in self.users.values()):
+                raise FakeOCIServiceError(409, "Conflict", f"User {create_user_details.name} already exists")
+            ocid = f"ocid1.user.oc1..{uuid.uuid4().hex}"
+            self.users[ocid] = {"name": create_user_details.name, "state": "CREATING",
+                                "changed_at": time.monotonic()}
+        return FakeOCIResponse(FakeOCIModel(id=ocid, name=create_user_details.name, lifecycle_state="CREATING"))
+
+    def delete_user(self, user_id):
+        self._call("DeleteUser")
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None or self._state(user) == "DELETED":
+                raise self._missing("User", user_id)
+            if any(membership["user_id"] == user_id for membership in self.memberships.values()):
+                raise FakeOCIServiceError(409, "Conflict", f"User {user_id} is still a group member")
+            user.update(state="DELETING", changed_at=time.monotonic())
+        return FakeOCIResponse(None)
+
+    def list_users(self, compartment_id, page=None, limit=100, **kwargs):
+        self._call("ListUsers")
+        with self._lock:
+            ids = sorted(ocid for ocid, user in self.users.items() if self._state(user) != "DELETED")
+            start = bisect.bisect_left(ids, page) if page else 0
+            data = [FakeOCIModel(id=ocid, name=self.users[ocid]["name"], lifecycle_state=self.users[ocid]["state"])
+                    for ocid in ids[start:start + limit]]
+        return FakeOCIResponse(data, ids[start + limit] if start + limit < len(ids) else None)
+
+    def create_group(self, create_group_details):
+        self._call("CreateGroup")
+        ocid = f"ocid1.group.oc1..{uuid.uuid4().hex}"
+        with self._lock:
+            self.groups[ocid] = create_group_details.name
+        return FakeOCIResponse(FakeOCIModel(id=ocid, name=create_group_details.name))
+
+    def delete_group(self, group_id):
+        self._call("DeleteGroup")
+        with self._lock:
+            if group_id not in self.groups:
+                raise self._missing("Group", group_id)
+            if any(membership["group_id"] == group_id for membership in self.memberships.values()):
+                raise FakeOCIServiceError(409, "Conflict", f"Group {group_id} still has members")
+            del self.groups[group_id]
+        return FakeOCIResponse(None)
+
+    def create_policy(self, create_policy_details):
+        self._call("CreatePolicy")
+        ocid = f"ocid1.policy.oc1..{uuid.uuid4().hex}"
+        with self._lock:
+            self.policies[ocid] = create_policy_details.name
+        return FakeOCIResponse(FakeOCIModel(id=ocid, name=create_policy_details.name))
+
+    def delete_policy(self, policy_id):
+        self._call("DeletePolicy")
+        with self._lock:
+            if self.policies.pop(policy_id, None) is None:
+                raise self._missing("Policy", policy_id)
+        return FakeOCIResponse(None)
+
+    def add_user_to_group(self, add_user_to_group_details):
+        self._call("AddUserToGroup")
+        ocid = f"ocid1.groupmembership.oc1..{uuid.uuid4().hex}"
+        with self._lock:
+            if add_user_to_group_details.group_id not in self.groups:
+                raise self._missing("Group", add_user_to_group_details.group_id)
+            self.memberships[ocid] = {"user_id": add_user_to_group_details.user_id,
+                                      "group_id": add_user_to_group_details.group_id}
+        return FakeOCIResponse(FakeOCIModel(id=ocid, **self.memberships[ocid]))
+
+    def remove_user_from_group(self, user_group_membership_id):
+        self._call("RemoveUserFromGroup")
+        with self._lock:
+            if self.memberships.pop(user_group_membership_id, None) is None:
+                raise self._missing("Membership", user_group_membership_id)
+        return FakeOCIResponse(None)
+
+    def list_user_group_memberships(self, compartment_id, user_id=None, group_id=None, page=None, **kwargs):
+        self._call("ListUserGroupMemberships")
+        with self._lock:
+            data = [FakeOCIModel(id=ocid, **membership) for ocid, membership in sorted(self.memberships.items())
+                    if user_id in (None, membership["user_id"]) and group_id in (None, membership["group_id"])]
+        return FakeOCIResponse(data)
+
+
+def fake_list_call_get_all_results_generator(list_func_ref, yield_mode, *args, **kwargs):
+    """Stand-in for oci.pagination.list_call_get_all_results_generator."""
+    page = None
+    while True:
+        response = list_func_ref(*args, page=page, **kwargs)
+        if yield_mode == "record":
+            yield from response.data
+        else:
+            yield response
+        if not response.has_next_page:
+            return
+        page = response.next_page
+
+
+def install_fake_oci(identity_client, tenancy="ocid1.tenancy.oc1..fake"):
+    """Register a stand-in `oci` package whose IdentityClient is always `identity_client`."""
+    import sys
+    from types import ModuleType
+
+    oci = ModuleType("oci")
+    oci.config = SimpleNamespace(from_file=lambda *args, **kwargs: {"tenancy": tenancy})
+    models = SimpleNamespace(**{
+        name: type(name, (FakeOCIModel,), {})
+        for name in ("CreateUserDetails", "CreateGroupDetails", "CreatePolicyDetails", "AddUserToGroupDetails")
+    })
+    oci.identity = SimpleNamespace(IdentityClient=lambda config, **kwargs: identity_client, models=models)
+    oci.pagination = SimpleNamespace(
+        list_call_get_all_results_generator=fake_list_call_get_all_results_generator
+    )
+    oci.exceptions = SimpleNamespace(ServiceError=FakeOCIServiceError)
+    sys.modules["oci"] = oci
+    return oci
+
+
+class FakeHttpResponseError(Exception):
+    """Mimic azure.core's HttpResponseError, which carries `status_code` and `error.code`."""
+
+    def __init__(self, status_code, code, message):
+        super().__init__(f"({code}) {message}")
+        self.status_code = status_code
+        self.error = SimpleNamespace(code=code, message=message)
+        self.message = message
+
+
+class FakePoller:
+    """Stand-in for azure.core's LROPoller: the operation finishes `duration` seconds after it starts."""
+
+    def __init__(self, operation, duration=0.0):
+        self._operation = operation
+        self._ready_at = time.monotonic() + duration
+        self._result = None
+        self._done = False
+        self._lock = threading.Lock()
+
+    def done(self):
+        return time.monotonic() >= self._ready_at
+
+    def status(self):
+        return "Succeeded" if self.done() else "InProgress"
+
+    def wait(self, timeout=None):
+        remaining = self._ready_at - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining if timeout is None else min(timeout, remaining))
+
+    def result(self, timeout=None):
+        self.wait(timeout)
+        with self._lock:
+            if not self._done:
+                self._result = self._operation()
+                self._done = True
+        return self._result
+
+
+class FakeAzureService(FakeService):
+    """Shared state and throttling for the fake Azure management clients."""
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None, operation_time=0.0):
+        super().__init__(latency, throttle_rate, seed)
+        self.operation_time = operation_time
+
+    def throttling_error(self, operation_name):
+        return FakeHttpResponseError(429, "TooManyRequests", f"Too many requests for {operation_name}")
+
+
+class FakeResourceGroupsOperations:
+    """Stand-in for ResourceManagementClient.resource_groups."""
+
+    def __init__(self, service):
+        self.service = service
+        self.groups = {}
+
+    def create_or_update(self, resource_group_name, parameters):
+        self.service._call("ResourceGroups_CreateOrUpdate")
+        location = parameters["location"] if isinstance(parameters, dict) else parameters.location
+        with self.service._lock:
+            # Updating an existing group keeps its resources, as in ARM
+            group = self.groups.setdefault(resource_group_name, {"name": resource_group_name, "resources": []})
+            group["location"] = location
+        return SimpleNamespace(name=resource_group_name, location=location)
+
+    def check_existence(self, resource_group_name):
+        self.service._call("ResourceGroups_CheckExistence")
+        with self.service._lock:
+            return resource_group_name in self.groups
+
+    def list(self):
+        self.service._call("ResourceGroups_List")
+        with self.service._lock:
+            return [SimpleNamespace(name=group["name"], location=group["location"])
+                    for group in self.groups.values()]
+
+    def begin_delete(self, resource_group_name):
+        self.service._call("ResourceGroups_Delete")
+        with self.service._lock:
+            if resource_group_name not in self.groups:
+                raise FakeHttpResponseError(404, "ResourceGroupNotFound",
+                                            f"Resource group '{resource_group_name}' could not be found.")
+
+        def delete():
+            with self.service._lock:
+                self.groups.pop(resource_group_name, None)
+        return FakePoller(delete, self.service.operation_time)
+
+
+def expand_template_resources(properties):
+    """Return a (type, copy index) per resource an ARM deployment would create, expanding copy loops.
+
+    Copy counts may be literal or `[length(parameters('name'))]`.
+    """
+    template = properties["template"] if isinstance(properties, dict) else properties.template
+    parameters = properties.get("parameters", {}) if isinstance(properties, dict) else properties.parameters
+    resources = []
+    for resource in template.get("resources", []):
+        count = resource.get("copy", {}).get("count", 1)
+        if isinstance(count, str):
+            match = re.fullmatch(r"\[length\(parameters\('(\w+)'\)\)\]", count)
+            if not match or match.group(1) not in parameters:
+                raise FakeHttpResponseError(400, "InvalidTemplate", f"Cannot evaluate copy count {count}.")
+            count = len(parameters[match.group(1)]["value"])
+        if count > 800:
+            raise FakeHttpResponseError(400, "InvalidTemplate", "A copy loop can have at most 800 iterations.")
+        resources.extend((resource["type"], index) for index in range(count))
+    if len(resources) > 800:
+        raise FakeHttpResponseError(400, "InvalidTemplate", "A template can deploy at most 800 resources.")
+    return resources
+
+
+class FakeDeploymentsOperations:
+    """Stand-in for ResourceManagementClient.deployments; records what each template would create."""
+
+    def __init__(self, service, resource_groups):
+        self.service = service
+        self.resource_groups = resource_groups
+        self.deployments = {}
+
+    def begin_create_or_update(self, resource_group_name, deployment_name, parameters):
+        self.service._call("Deployments_CreateOrUpdate")
+        with self.service._lock:
+            if resource_group_name not in self.resource_groups.groups:
+                raise FakeHttpResponseError(404, "ResourceGroupNotFound",
+                                            f"Resource group '{resource_group_name}' could not be found.")
+        properties = parameters["properties"] if isinstance(parameters, dict) else parameters.properties
+
+        resources = expand_template_resources(properties)
+
+        def deploy():
+            with self.service._lock:
+                self.deployments[(resource_group_name, deployment_name)] = properties
+                self.resource_groups.groups[resource_group_name]["resources"].extend(resources)
+            return SimpleNamespace(name=deployment_name,
+                                   properties=SimpleNamespace(provisioning_state="Succeeded", outputs={}))
+        return FakePoller(deploy, self.service.operation_time)
+
+
+class FakeResourceManagementClient(FakeAzureService):
+    """Stand-in for azure.mgmt.resource.ResourceManagementClient."""
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None, operation_time=0.0):
+        super().__init__(latency, throttle_rate, seed, operation_time)
+        self.resource_groups = FakeResourceGroupsOperations(self)
+        self.deployments = FakeDeploymentsOperations(self, self.resource_groups)
+
+
+class FakeRoleAssignmentsOperations:
+    """Stand-in for AuthorizationManagementClient.role_assignments."""
+
+    def __init__(self, service):
+        self.service = service
+        self.assignments = {}
+
+    def create(self, scope, role_assignment_name, parameters):
+        self.service._call("RoleAssignments_Create")
+        principal_id = parameters["principal_id"] if isinstance(parameters, dict) else parameters.principal_id
+        assignment_id = f"{scope}/providers/Microsoft.Authorization/roleAssignments/{role_assignment_name}"
+        with self.service._lock:
+            if assignment_id in self.assignments:
+                raise FakeHttpResponseError(409, "RoleAssignmentExists", "The role assignment already exists.")
+            self.assignments[assignment_id] = {"scope": scope, "principal_id": principal_id}
+        return SimpleNamespace(id=assignment_id, name=role_assignment_name, scope=scope,
+                               principal_id=principal_id)
+
+    def delete(self, scope, role_assignment_name):
+        self.service._call("RoleAssignments_Delete")
+        assignment_id = f"{scope}/providers/Microsoft.Authorization/roleAssignments/{role_assignment_name}"
+        with self.service._lock:
+            assignment = self.assignments.pop(assignment_id, None)
+        return SimpleNamespace(id=assignment_id) if assignment else None
+
+    def list_for_scope(self, scope, **kwargs):
+        self.service._call("RoleAssignments_ListForScope")
+        with self.service._lock:
+            return [SimpleNamespace(id=assignment_id, name=assignment_id.rsplit("/", 1)[-1], **assignment)
+                    for assignment_id, assignment in self.assignments.items() if assignment["scope"] == scope]
+
+
+class FakeAuthorizationManagementClient(FakeAzureService):
+    """Stand-in for azure.mgmt.authorization.AuthorizationManagementClient."""
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None):
+        super().__init__(latency, throttle_rate, seed)
+        self.role_assignments = FakeRoleAssignmentsOperations(self)
+
+
+class FakeTokenCredential:
+    """Stand-in for azure.identity.ClientSecretCredential that counts token requests."""
+
+    def __init__(self, token="fake-graph-token", lifetime=3600):
+        self.token = token
+        self.lifetime = lifetime
+        self.token_requests = 0
+
+    def get_token(self, *scopes, **kwargs):
+        self.token_requests += 1
+        return SimpleNamespace(token=self.token, expires_on=int(time.time()) + self.lifetime)
+
+
+class _GraphRequestHandler(BaseHTTPRequestHandler):
+    """Hand every HTTP request to the FakeGraphServer that owns the listening socket."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like graph.microsoft.com
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        status, payload, headers = self.server.graph.handle_http(
+            self.command, self.path, self.headers.get("Authorization"), body
+        )
+        data = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+
+class FakeGraphServer:
+    """Local HTTP stand-in for the Microsoft Graph users, groups and $batch endpoints.
+
+    Serves `http://127.0.0.1:<port>/v1.0` once started. Every HTTP request
+    sleeps `latency` seconds; each operation, including each one inside a
+    $batch, is throttled with a 429 at `throttle_rate`, as Graph throttles
+    batched requests individually.
+    """
+
+    MAX_BATCH_SIZE = 20
+    MAX_MEMBERS_PER_PATCH = 20
+
+    def __init__(self, latency=0.01, throttle_rate=0.0, seed=None, token="fake-graph-token", page_size=100):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.token = token
+        self.page_size = page_size
+        self.endpoint = None
+        self.http_requests = 0
+        self.batches = 0
+        self.operations = 0
+        self.throttled = 0
+        self.users = {}
+        self.groups = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        """Start serving on a free local port and return the Graph endpoint URL."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _GraphRequestHandler)
+        self._server.daemon_threads = True
+        self._server.graph = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self._server.server_address[1]}/v1.0"
+        return self.endpoint
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @staticmethod
+    def _error(status, code, message, headers=None):
+        return status, {"error": {"code": code, "message": message}}, headers or {}
+
+    def handle_http(self, method, path, authorization, body):
+        """Serve one HTTP request and return (status, JSON body, headers)."""
+        time.sleep(self.latency)
+        with self._lock:
+            self.http_requests += 1
+        if authorization != f"Bearer {self.token}":
+            return self._error(401, "InvalidAuthenticationToken", "Access token is empty or invalid.")
+        if not path.startswith("/v1.0/"):
+            return self._error(404, "Request_ResourceNotFound", f"Unknown path {path}.")
+        path = path[len("/v1.0"):]
+        if method == "POST" and path == "/$batch":
+            requests = (body or {}).get("requests", [])
+            if len(requests) > self.MAX_BATCH_SIZE:
+                return self._error(400, "BadRequest", f"A batch can hold at most {self.MAX_BATCH_SIZE} requests.")
+            with self._lock:
+                self.batches += 1
+            responses = []
+            for request in requests:
+                status, payload, headers = self.handle_operation(request["method"], request["url"], request.get("body"))
+                responses.append({"id": request["id"], "status": status, "headers": headers, "body": payload})
+            return 200, {"responses": responses}, {}
+        return self.handle_operation(method, path, body)
+
+    def handle_operation(self, method, url, body):
+        """Apply one Graph operation and return (status, JSON body, headers)."""
+        with self._lock:
+            self.operations += 1
+            if self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                return self._error(429, "TooManyRequests", "Too many requests.", {"Retry-After": "0"})
+        parts = urlsplit(url)
+        segments = parts.path.strip("/").split("/")
+        with self._lock:
+            if segments == ["users"] and method == "POST":
+                return self._create_user(body)
+            if segments == ["users"] and method == "GET":
+                return self._list_users(parse_qs(parts.query))
+            if segments[0] == "users" and len(segments) == 2 and method == "DELETE":
+                if self.users.pop(segments[1], None) is None:
+                    return self._error(404, "Request_ResourceNotFound", f"User {segments[1]} does not exist.")
+                for group in self.groups.values():
+                    group["members"].discard(segments[1])
+                return 204, None, {}
+            if segments == ["groups"] and method == "POST":
+                group_id = str(uuid.uuid4())
+                self.groups[group_id] = {"id": group_id, "displayName": body["displayName"], "members": set()}
+                return 201, {"id": group_id, "displayName": body["displayName"]}, {}
+            if segments[0] == "groups" and len(segments) == 2 and segments[1] in self.groups:
+                group = self.groups[segments[1]]
+                if method == "DELETE":
+                    del self.groups[segments[1]]
+                    return 204, None, {}
+                if method == "PATCH":
+                    return self._add_members(group, body.get("members@odata.bind", []))
+            if segments[0] == "groups" and len(segments) == 2:
+                return self._error(404, "Request_ResourceNotFound", f"Group {segments[1]} does not exist.")
+        return self._error(400, "BadRequest", f"Unsupported request {method} {url}.")
+
+    def _create_user(self, body):
+        upn = body["userPrincipalName"]
+        if any(user["userPrincipalName"] == upn for user in self.users.values()):
+            return self._error(400, "Request_BadRequest",
+                               "Another object with the same value for property userPrincipalName already exists.")
+        user_id = str(uuid.uuid4())
+        self.users[user_id] = {"id": user_id, "userPrincipalName": upn, "displayName": body.get("displayName")}
+        return 201, dict(self.users[user_id]), {}
+
+    def _list_users(self, query):
+        top = int(query.get("$top", [self.page_size])[0])
+        prefix = None
+        if "$filter" in query:
+            match = re.fullmatch(r"startswith\(userPrincipalName,'(.*)'\)", query["$filter"][0])
+            prefix = match.group(1) if match else None
+        ids = sorted(user_id for user_id, user in self.users.items()
+                     if prefix is None or user["userPrincipalName"].startswith(prefix))
+        start = bisect.bisect_left(ids, query["$skiptoken"][0]) if "$skiptoken" in query else 0
+        page = {"value": [dict(self.users[user_id]) for user_id in ids[start:start + top]]}
+        if start + top < len(ids):
+            next_query = {"$top": top, "$skiptoken": ids[start + top]}
+            if "$filter" in query:
+                next_query["$filter"] = query["$filter"][0]
+            page["@odata.nextLink"] = f"{self.endpoint}/users?{urlencode(next_query)}"
+        return 200, page, {}
+
+    def _add_members(self, group, member_urls):
+        if len(member_urls) > self.MAX_MEMBERS_PER_PATCH:
+            return self._error(400, "Request_BadRequest",
+                               f"At most {self.MAX_MEMBERS_PER_PATCH} members can be added in one request.")
+        member_ids = [member_url.rstrip("/").rsplit("/", 1)[-1] for member_url in member_urls]
+        missing = [member_id for member_id in member_ids if member_id not in self.users]
+        if missing:
+            return self._error(404, "Request_ResourceNotFound", f"Directory object {missing[0]} does not exist.")
+        group["members"].update(member_ids)
+        return 204, None, {}
@@ -1,145 +1,362 @@
-import random
-import string
-import time
-from datetime import datetime, timedelta
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-
-# Load your GCP service account key file
-SERVICE_ACCOUNT_FILE = 'path/to/your-service-account-key.json'
-
-# Authenticate using the service account
-credentials = service_account.Credentials.from_service_account_file(
-    SERVICE_ACCOUNT_FILE
-)
-cloud_identity_client = build('cloudidentity', 'v1', credentials=credentials)
-iam_client = build('iam', 'v1', credentials=credentials)
-project_id = "your-gcp-project-id"
-
-# List of Supported Services
-SUPPORTED_SERVICES = [
-    "Google Compute Engine", "Google Cloud Storage", "Google Cloud SQL", 
-    "Google Kubernetes Engine", "Cloud Functions", "Cloud Monitoring", 
-    "Cloud IAM", "Cloud Pub/Sub", "Cloud BigQuery", "Cloud Spanner"
-]
-
-def generate_password():
-    """Generate a random password for IAM users."""
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(random.choice(characters) for _ in range(12))
-
-def create_service_account(sa_name, project_id):
-    """Create a GCP service account."""
-    try:
-        sa_email = f"{sa_name}@{project_id}.iam.gserviceaccount.com"
-        iam_client.projects().serviceAccounts().create(
-            name=f"projects/{project_id}",
-            body={
-                "accountId": sa_name,
-                "serviceAccount": {"displayName": sa_name}
-            }
-        ).execute()
-        print(f"Service account {sa_email} created.")
-        return sa_email
-    except Exception as e:
-        print(f"Error creating service account {sa_name}: {e}")
-        return None
-
-def assign_role_to_service_account(sa_email, role, project_id):
-    """Assign a role to a GCP service account."""
-    try:
-        policy = iam_client.projects().getIamPolicy(resource=project_id).execute()
-        bindings = policy.get('bindings', [])
-        bindings.append({"role": role, "members": [f"serviceAccount:{sa_email}"]})
-        policy['bindings'] = bindings
-
-        iam_client.projects().setIamPolicy(
-            resource=project_id,
-            body={"policy": policy}
-        ).execute()
-        print(f"Assigned role {role} to {sa_email}.")
-    except Exception as e:
-        print(f"Error assigning role to {sa_email}: {e}")
-
-def deploy_service(service_name, sa_email):
-    """Simulate the deployment of GCP services for a service account."""
-    print(f"Deploying {service_name} for service account {sa_email}...")
-    if service_name == "Google Compute Engine":
-        print(f"Simulated Compute Engine instance deployment for {sa_email}.")
-    elif service_name == "Google Cloud Storage":
-        bucket_name = f"{sa_email.split('@')[0]}-bucket-{random.randint(1000, 9999)}"
-        print(f"Simulated Cloud Storage bucket creation: {bucket_name}.")
-    else:
-        print(f"{service_name} deployment simulation completed.")
-
-def display_service_account_details(service_accounts):
-    """Display service account details."""
-    print("\nService Account Details:")
-    print("=" * 50)
-    for sa in service_accounts:
-        print(f"Service Account: {sa['email']}")
-        print(f"Password: {sa['password']}")
-        print("=" * 50)
-
-def main():
-    print("Supported GCP Services:")
-    for idx, service in enumerate(SUPPORTED_SERVICES, start=1):
-        print(f"{idx}. {service}")
-    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
-    services_input = input("Services: ").strip()
-    
-    try:
-        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
-        selected_services = [SUPPORTED_SERVICES[i] for i in selected_indices if 0 <= i < len(SUPPORTED_SERVICES)]
-    except ValueError:
-        print("Invalid input. Please enter valid service numbers.")
-        return
-    
-    if not selected_services:
-        print("No services selected. Exiting.")
-        return
-
-    sa_count = int(input("Enter the number of service accounts to create: "))
-    duration_days = int(input("Enter the number of days to run services: "))
-    duration_hours = int(input("Enter the number of hours to run services: "))
-
-    service_accounts = []
-    for i in range(sa_count):
-        sa_name = f"sa-{i+1}"
-        sa_email = create_service_account(sa_name, project_id)
-        if sa_email:
-            password = generate_password()
-            assign_role_to_service_account(sa_email, "roles/editor", project_id)
-            service_accounts.append({"email": sa_email, "password": password})
-
-    # Display service account details
-    display_service_account_details(service_accounts)
-
-    # Deploy services for each service account
-    for sa in service_accounts:
-        for service in selected_services:
-            deploy_service(service, sa["email"])
-
-    # Simulate resource lifecycle
-    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
-    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    while datetime.now() < end_time:
-        time.sleep(10)  # Simulating active resources
-
-    print("\nTime's up! Cleaning up service accounts...")
-
-    # Delete service accounts
-    for sa in service_accounts:
-        try:
-            iam_client.projects().serviceAccounts().delete(
-                name=f"projects/{project_id}/serviceAccounts/{sa['email']}"
-            ).execute()
-            print(f"Deleted service account: {sa['email']}")
-        except Exception as e:
-            print(f"Error deleting service account {sa['email']}: {e}")
-
-    print("\nCleanup completed.")
-
-if __name__ == "__main__":
-    main()
+import random
+import re
+import time
+from cloud_provider import CloudProvider, lazy_client, load_service_catalog, run_cli
+from credential_generator import generate_password, generate_passwords, unique_name
+from credential_export import MAX_DISPLAYED_USERS, print_truncation_note, redact
+from rate_limiter import ConcurrencyGovernor, is_throttling_error
+
+# Load your GCP service account key file
+SERVICE_ACCOUNT_FILE = 'path/to/your-service-account-key.json'
+project_id = "your-gcp-project-id"
+
+# Authenticate using the service account (on first use)
+@lazy_client
+def get_credentials():
+    """Return the process-wide service account credentials."""
+    from google.oauth2 import service_account
+    return service_account.Credentials.from_service_account_file(
+        SERVICE_ACCOUNT_FILE
+    )
+
+@lazy_client
+def get_cloud_identity_client():
+    """Return the process-wide Cloud Identity API client."""
+    from googleapiclient.discovery import build
+    return build('cloudidentity', 'v1', credentials=get_credentials())
+
+@lazy_client
+def get_iam_client():
+    """Return the process-wide IAM API client."""
+    from googleapiclient.discovery import build
+    return build('iam', 'v1', credentials=get_credentials())
+
+# List of Supported Services
+SUPPORTED_SERVICES = load_service_catalog("gcp")
+
+# Project role granted to every cohort service account
+COHORT_ROLE = "roles/editor"
+
+# IAM policy read-modify-write settings
+MAX_POLICY_RETRIES = 5
+POLICY_RETRY_BASE_DELAY = 0.5  # Seconds; doubled on every retry
+POLICY_CONFLICT_STATUSES = {409, 412}  # etag no longer matches the stored policy
+
+# Bulk service account settings
+MAX_BATCH_SIZE = 100  # Calls packed into one HTTP batch request
+MAX_BATCH_RETRIES = 5
+BATCH_RETRY_BASE_DELAY = 1.0  # Seconds; doubled on every retry
+RETRYABLE_STATUSES = {429, 500, 503}
+LIST_PAGE_SIZE = 100  # Largest page serviceAccounts.list returns
+
+# Every IAM API call goes through this governor, which adapts concurrency to throttling
+iam_governor = ConcurrencyGovernor()
+
+def create_service_account(sa_name, project_id):
+    """Create a GCP service account."""
+    try:
+        sa_email = f"{sa_name}@{project_id}.iam.gserviceaccount.com"
+        iam_governor.call(get_iam_client().projects().serviceAccounts().create(
+            name=f"projects/{project_id}",
+            body={
+                "accountId": sa_name,
+                "serviceAccount": {"displayName": sa_name}
+            }
+        ).execute)
+        print(f"Service account {sa_email} created.")
+        return sa_email
+    except Exception as e:
+        print(f"Error creating service account {sa_name}: {e}")
+        return None
+
+def execute_in_batches(requests_by_id):
+    """Send API calls packed into HTTP batch requests and return {request_id: error}.
+
+    The error is None for calls that succeeded. Calls rejected with a
+    retryable status (rate limiting, transient server errors) are resent in
+    a later batch with exponential backoff. Each batch holds one
+    iam_governor slot and counts as throttled if any call in it was.
+    """
+    errors = {}
+
+    def callback(request_id, response, exception):
+        errors[request_id] = exception
+
+    pending = list(requests_by_id)
+    for attempt in range(MAX_BATCH_RETRIES):
+        for start in range(0, len(pending), MAX_BATCH_SIZE):
+            chunk = pending[start:start + MAX_BATCH_SIZE]
+            batch = get_iam_client().new_batch_http_request(callback=callback)
+            for request_id in chunk:
+                batch.add(requests_by_id[request_id], request_id=request_id)
+            started = iam_governor.acquire()
+            try:
+                batch.execute()
+            except Exception as e:
+                for request_id in chunk:
+                    errors.setdefault(request_id, e)
+            iam_governor.release(
+                started, any(is_throttling_error(errors.get(request_id)) for request_id in chunk)
+            )
+        pending = [
+            request_id for request_id in pending
+            if getattr(getattr(errors[request_id], 'resp', None), 'status', None) in RETRYABLE_STATUSES
+        ]
+        if not pending or attempt == MAX_BATCH_RETRIES - 1:
+            break
+        delay = BATCH_RETRY_BASE_DELAY * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay))
+        for request_id in pending:
+            del errors[request_id]
+    return errors
+
+def create_service_accounts_in_bulk(sa_names, project_id):
+    """Create many GCP service accounts through batch requests and return {sa_name: error}."""
+    service_accounts = get_iam_client().projects().serviceAccounts()
+    requests_by_id = {
+        sa_name: service_accounts.create(
+            name=f"projects/{project_id}",
+            body={
+                "accountId": sa_name,
+                "serviceAccount": {"displayName": sa_name}
+            }
+        )
+        for sa_name in sa_names
+    }
+    errors = execute_in_batches(requests_by_id)
+    for sa_name in sa_names:
+        if errors[sa_name] is None:
+            print(f"Service account {sa_name}@{project_id}.iam.gserviceaccount.com created.")
+        else:
+            print(f"Error creating service account {sa_name}: {errors[sa_name]}")
+    return errors
+
+def delete_service_accounts_in_bulk(sa_emails, project_id):
+    """Delete many GCP service accounts through batch requests and return {sa_email: error}.
+
+    Their COHORT_ROLE members are removed from the project policy first,
+    in one read-modify-write, so no binding outlives its account.
+    """
+    revoke_roles_in_batch({COHORT_ROLE: service_account_members(sa_emails)}, project_id)
+    service_accounts = get_iam_client().projects().serviceAccounts()
+    requests_by_id = {
+        sa_email: service_accounts.delete(
+            name=f"projects/{project_id}/serviceAccounts/{sa_email}"
+        )
+        for sa_email in sa_emails
+    }
+    errors = execute_in_batches(requests_by_id)
+    for sa_email in sa_emails:
+        if errors[sa_email] is None:
+            print(f"Deleted service account: {sa_email}")
+        else:
+            print(f"Error deleting service account {sa_email}: {errors[sa_email]}")
+    return errors
+
+def merge_policy_bindings(policy, role_members):
+    """Merge members into the policy's unconditional binding for each role."""
+    bindings = policy.setdefault('bindings', [])
+    bindings_by_role = {
+        binding['role']: binding for binding in bindings if 'condition' not in binding
+    }
+    for role, members in role_members.items():
+        binding = bindings_by_role.get(role)
+        if binding is None:
+            binding = {"role": role, "members": []}
+            bindings.append(binding)
+            bindings_by_role[role] = binding
+        existing = set(binding['members'])
+        for member in members:
+            if member not in existing:
+                binding['members'].append(member)
+                existing.add(member)
+    return policy
+
+def remove_policy_members(policy, role_members):
+    """Remove members from the policy's unconditional binding for each role, dropping emptied bindings.
+
+    A member whose account was already deleted is listed as
+    `deleted:<member>?uid=...`; that form is removed too.
+    """
+    bindings = policy.get('bindings', [])
+    for binding in bindings:
+        if 'condition' in binding or binding['role'] not in role_members:
+            continue
+        members = set(role_members[binding['role']])
+        binding['members'] = [
+            member for member in binding['members']
+            if member not in members and member.split('?uid=')[0].removeprefix('deleted:') not in members
+        ]
+    policy['bindings'] = [binding for binding in bindings if binding['members']]
+    return policy
+
+def service_account_members(sa_emails):
+    """Return the policy member strings of service accounts."""
+    return [f"serviceAccount:{sa_email}" for sa_email in sa_emails]
+
+def is_policy_conflict(error):
+    """Return True if setIamPolicy was rejected because another writer changed the policy."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return status in POLICY_CONFLICT_STATUSES
+
+def update_project_policy(update, project_id):
+    """Apply `update(policy)` to the project policy in one read-modify-write; raise on failure.
+
+    The policy read carries an etag, so a concurrent update makes
+    setIamPolicy fail instead of silently overwriting it; the update is
+    then retried on a fresh copy of the policy.
+    """
+    for attempt in range(MAX_POLICY_RETRIES):
+        try:
+            policy = iam_governor.call(
+                get_iam_client().projects().getIamPolicy(resource=project_id).execute
+            )
+            update(policy)
+            iam_governor.call(get_iam_client().projects().setIamPolicy(
+                resource=project_id,
+                body={"policy": policy}
+            ).execute)
+            return
+        except Exception as e:
+            if not is_policy_conflict(e) or attempt == MAX_POLICY_RETRIES - 1:
+                raise
+            delay = POLICY_RETRY_BASE_DELAY * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay))
+
+def assign_roles_in_batch(role_members, project_id):
+    """Grant roles to many members with a single read-modify-write of the project policy.
+
+    `role_members` maps each role to the members that should hold it.
+    """
+    member_count = sum(len(members) for members in role_members.values())
+    try:
+        update_project_policy(lambda policy: merge_policy_bindings(policy, role_members), project_id)
+    except Exception as e:
+        print(f"Error assigning roles to {member_count} member(s): {e}")
+        return False
+    print(f"Assigned {len(role_members)} role(s) to {member_count} member(s).")
+    return True
+
+def revoke_roles_in_batch(role_members, project_id):
+    """Remove many members from role bindings with a single read-modify-write of the project policy."""
+    member_count = sum(len(members) for members in role_members.values())
+    if not member_count:
+        return True
+    try:
+        update_project_policy(lambda policy: remove_policy_members(policy, role_members), project_id)
+    except Exception as e:
+        print(f"Error revoking roles from {member_count} member(s): {e}")
+        return False
+    print(f"Revoked {len(role_members)} role(s) from {member_count} member(s).")
+    return True
+
+def assign_role_to_service_account(sa_email, role, project_id):
+    """Assign a role to a GCP service account."""
+    if assign_roles_in_batch({role: [f"serviceAccount:{sa_email}"]}, project_id):
+        print(f"Assigned role {role} to {sa_email}.")
+
+def deploy_service(service_name, sa_email):
+    """Simulate the deployment of GCP services for a service account."""
+    print(f"Deploying {service_name} for service account {sa_email}...")
+    if service_name == "Google Compute Engine":
+        print(f"Simulated Compute Engine instance deployment for {sa_email}.")
+    elif service_name == "Google Cloud Storage":
+        bucket_name = unique_name(f"{sa_email.split('@')[0]}-bucket")
+        print(f"Simulated Cloud Storage bucket creation: {bucket_name}.")
+        return bucket_name
+    else:
+        print(f"{service_name} deployment simulation completed.")
+
+def iter_service_account_emails(project_id):
+    """Yield the email of every service account in a project, one list page at a time."""
+    service_accounts = get_iam_client().projects().serviceAccounts()
+    request = service_accounts.list(name=f"projects/{project_id}", pageSize=LIST_PAGE_SIZE)
+    while request is not None:
+        response = iam_governor.call(request.execute)
+        for account in response.get("accounts", []):
+            yield account["email"]
+        request = service_accounts.list_next(previous_request=request, previous_response=response)
+
+def display_service_account_details(service_accounts):
+    """Display service account details with secrets redacted."""
+    print("\nService Account Details:")
+    print("=" * 50)
+    for sa in service_accounts[:MAX_DISPLAYED_USERS]:
+        print(f"Service Account: {sa['email']}")
+        print(f"Password: {redact(sa['password'])}")
+        print("=" * 50)
+    print_truncation_note(service_accounts)
+
+def delete_service_account(sa_email, project_id):
+    """Remove a GCP service account from the cohort role, delete it and return True on success."""
+    revoke_roles_in_batch({COHORT_ROLE: service_account_members([sa_email])}, project_id)
+    try:
+        iam_governor.call(get_iam_client().projects().serviceAccounts().delete(
+            name=f"projects/{project_id}/serviceAccounts/{sa_email}"
+        ).execute)
+        print(f"Deleted service account: {sa_email}")
+        return True
+    except Exception as e:
+        print(f"Error deleting service account {sa_email}: {e}")
+        return False
+
+class GCPProvider(CloudProvider):
+    """GCP IAM service account implementation of the provider interface."""
+
+    name = "gcp"
+    label = "GCP"
+    user_label = "service accounts"
+    user_prefix = "sa"
+    user_id_field = "email"
+    services = SUPPORTED_SERVICES
+
+    def create_user(self, user_name):
+        sa_email = create_service_account(user_name, project_id)
+        if not sa_email:
+            return None
+        return {"email": sa_email, "password": generate_password("gcp")}
+
+    def create_users(self, user_names):
+        errors = create_service_accounts_in_bulk(user_names, project_id)
+        created = [sa_name for sa_name in user_names if errors[sa_name] is None]
+        users = [
+            {"email": f"{sa_name}@{project_id}.iam.gserviceaccount.com", "password": password}
+            for sa_name, password in zip(created, generate_passwords(len(created), "gcp"))
+        ]
+        for user in users:
+            self.export_credentials(user)
+        return users
+
+    def attach_policy(self, user):
+        assign_role_to_service_account(user["email"], COHORT_ROLE, project_id)
+
+    def attach_policies(self, users):
+        members = service_account_members(user["email"] for user in users)
+        if members:
+            assign_roles_in_batch({COHORT_ROLE: members}, project_id)
+
+    def deploy(self, service_name, user):
+        return deploy_service(service_name, user["email"])
+
+    def delete(self, user):
+        return delete_service_account(user["email"], project_id)
+
+    def delete_users(self, users):
+        errors = delete_service_accounts_in_bulk([user["email"] for user in users], project_id)
+        return {sa_email: error is None for sa_email, error in errors.items()}
+
+    def display(self, users):
+        display_service_account_details(users)
+
+    def list_cloud_users(self):
+        return ({"email": email} for email in iter_service_account_emails(project_id))
+
+    def is_managed(self, user):
+        account_id = user["email"].split("@")[0]
+        return re.fullmatch(self.managed_name_pattern(), account_id) is not None
+
+def main():
+    run_cli(GCPProvider())
+
+if __name__ == "__main__":
+    main()
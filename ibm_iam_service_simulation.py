@@ -1,132 +1,167 @@
-import random
-import string
-import time
-from datetime import datetime, timedelta
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-from ibm_platform_services import IamIdentityV1, ResourceControllerV2
-
-# Constants
-IBM_API_KEY = "your-ibm-api-key"
-IBM_RESOURCE_GROUP = "your-resource-group-id"
-IBM_REGION = "us-south"  # Replace with your region
-
-# Supported IBM Cloud Services
-SUPPORTED_SERVICES = [
-    "IBM Cloud Object Storage", "IBM Cloud Kubernetes Service",
-    "IBM Cloud Databases", "IBM Watson Assistant",
-    "IBM Cloud Functions", "IBM Cloud Monitoring",
-    "IBM Cloud Internet Services", "IBM Cloud Virtual Servers"
-]
-
-# Authenticate with IAM
-authenticator = IAMAuthenticator(IBM_API_KEY)
-iam_client = IamIdentityV1(authenticator=authenticator)
-resource_controller = ResourceControllerV2(authenticator=authenticator)
-
-def generate_password():
-    """Generate a random password for IAM users."""
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(random.choice(characters) for _ in range(12))
-
-def create_iam_user(user_name):
-    """Create an API key for an IAM user."""
-    try:
-        response = iam_client.create_api_key(
-            name=f"{user_name}-apikey",
-            iam_id=user_name,
-            description=f"API key for {user_name}"
-        ).get_result()
-        print(f"API key created for user {user_name}.")
-        return response
-    except Exception as e:
-        print(f"Error creating API key for {user_name}: {e}")
-        return None
-
-def assign_service_role(api_key_id, service_name):
-    """Simulate assigning a role to a user for a service."""
-    print(f"Assigning role for service {service_name} using API key {api_key_id}...")
-    # Simulate role assignment
-    print(f"Role assigned for {service_name}.")
-
-def deploy_service(service_name, user_name):
-    """Simulate the deployment of IBM Cloud services."""
-    print(f"Deploying {service_name} for user {user_name}...")
-    if service_name == "IBM Cloud Object Storage":
-        bucket_name = f"user-{user_name}-bucket-{random.randint(1000, 9999)}"
-        print(f"Simulated Cloud Object Storage bucket creation: {bucket_name}.")
-    elif service_name == "IBM Cloud Virtual Servers":
-        print(f"Simulated Virtual Server deployment for {user_name}.")
-    else:
-        print(f"{service_name} deployment simulation completed.")
-
-def display_iam_details(users):
-    """Display IAM user details."""
-    print("\nIAM User Details:")
-    print("=" * 50)
-    for user in users:
-        print(f"User Name: {user['user_name']}")
-        print(f"API Key: {user['api_key']}")
-        print("=" * 50)
-
-def main():
-    print("Supported IBM Cloud Services:")
-    for idx, service in enumerate(SUPPORTED_SERVICES, start=1):
-        print(f"{idx}. {service}")
-    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
-    services_input = input("Services: ").strip()
-    
-    try:
-        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
-        selected_services = [SUPPORTED_SERVICES[i] for i in selected_indices if 0 <= i < len(SUPPORTED_SERVICES)]
-    except ValueError:
-        print("Invalid input. Please enter valid service numbers.")
-        return
-    
-    if not selected_services:
-        print("No services selected. Exiting.")
-        return
-
-    iam_user_count = int(input("Enter the number of IAM users to create: "))
-    duration_days = int(input("Enter the number of days to run services: "))
-    duration_hours = int(input("Enter the number of hours to run services: "))
-
-    users = []
-    for i in range(iam_user_count):
-        user_name = f"user-{i+1}"
-        api_key_data = create_iam_user(user_name)
-        if api_key_data:
-            users.append({
-                "user_name": user_name,
-                "api_key": api_key_data.get("apikey"),
-                "api_key_id": api_key_data.get("id"),
-            })
-
-    # Display IAM user details
-    display_iam_details(users)
-
-    # Deploy services for each IAM user
-    for user in users:
-        for service in selected_services:
-            deploy_service(service, user["user_name"])
-
-    # Simulate resource lifecycle
-    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
-    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    while datetime.now() < end_time:
-        time.sleep(10)  # Simulating active resources
-
-    print("\nTime's up! Cleaning up IAM users...")
-
-    # Clean up IAM users (delete API keys)
-    for user in users:
-        try:
-            iam_client.delete_api_key(id=user["api_key_id"])
-            print(f"Deleted API key for user: {user['user_name']}")
-        except Exception as e:
-            print(f"Error deleting API key for user {user['user_name']}: {e}")
-
-    print("\nCleanup completed.")
-
-if __name__ == "__main__":
-    main()
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+from cloud_provider import CloudProvider, lazy_client, load_service_catalog, run_cli
+from credential_generator import unique_name
+from credential_export import MAX_DISPLAYED_USERS, print_truncation_note, redact
+from rate_limiter import ConcurrencyGovernor
+
+# Constants
+IBM_API_KEY = "your-ibm-api-key"
+IBM_RESOURCE_GROUP = "your-resource-group-id"
+IBM_REGION = "us-south"  # Replace with your region
+IBM_ACCOUNT_ID = "your-account-id"
+LIST_PAGE_SIZE = 100  # Largest page list_api_keys returns
+MAX_IAM_WORKERS = 32  # iam_governor decides how many calls are really in flight
+
+# Supported IBM Cloud Services
+SUPPORTED_SERVICES = load_service_catalog("ibm")
+
+# Every IAM Identity call goes through this governor, which adapts concurrency to throttling
+iam_governor = ConcurrencyGovernor()
+
+# Authenticate with IAM (on first use)
+@lazy_client
+def get_authenticator():
+    """Return the process-wide IAM authenticator."""
+    from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+    return IAMAuthenticator(IBM_API_KEY)
+
+@lazy_client
+def get_iam_client():
+    """Return the process-wide IAM Identity client."""
+    from ibm_platform_services import IamIdentityV1
+    return IamIdentityV1(authenticator=get_authenticator())
+
+@lazy_client
+def get_resource_controller():
+    """Return the process-wide Resource Controller client."""
+    from ibm_platform_services import ResourceControllerV2
+    return ResourceControllerV2(authenticator=get_authenticator())
+
+def create_iam_user(user_name):
+    """Create an API key for an IAM user."""
+    try:
+        response = iam_governor.call(
+            get_iam_client().create_api_key,
+            name=f"{user_name}-apikey",
+            iam_id=user_name,
+            description=f"API key for {user_name}"
+        ).get_result()
+        print(f"API key created for user {user_name}.")
+        return response
+    except Exception as e:
+        print(f"Error creating API key for {user_name}: {e}")
+        return None
+
+def assign_service_role(api_key_id, service_name):
+    """Simulate assigning a role to a user for a service."""
+    print(f"Assigning role for service {service_name} using API key {api_key_id}...")
+    # Simulate role assignment
+    print(f"Role assigned for {service_name}.")
+
+def deploy_service(service_name, user_name):
+    """Simulate the deployment of IBM Cloud services."""
+    print(f"Deploying {service_name} for user {user_name}...")
+    if service_name == "IBM Cloud Object Storage":
+        bucket_name = unique_name(f"user-{user_name}-bucket")
+        print(f"Simulated Cloud Object Storage bucket creation: {bucket_name}.")
+        return bucket_name
+    elif service_name == "IBM Cloud Virtual Servers":
+        print(f"Simulated Virtual Server deployment for {user_name}.")
+    else:
+        print(f"{service_name} deployment simulation completed.")
+
+def display_iam_details(users):
+    """Display IAM user details with secrets redacted."""
+    print("\nIAM User Details:")
+    print("=" * 50)
+    for user in users[:MAX_DISPLAYED_USERS]:
+        print(f"User Name: {user['user_name']}")
+        print(f"API Key: {redact(user['api_key'])}")
+        print("=" * 50)
+    print_truncation_note(users)
+
+def delete_iam_user(user):
+    """Delete the API key issued to an IAM user and return True on success."""
+    try:
+        iam_governor.call(get_iam_client().delete_api_key, id=user["api_key_id"])
+        print(f"Deleted API key for user: {user['user_name']}")
+        return True
+    except Exception as e:
+        print(f"Error deleting API key for user {user['user_name']}: {e}")
+        return False
+
+def iter_api_keys(account_id=IBM_ACCOUNT_ID):
+    """Yield every API key in the account, following list_api_keys page tokens."""
+    pagetoken = None
+    while True:
+        result = iam_governor.call(
+            get_iam_client().list_api_keys,
+            account_id=account_id, pagesize=LIST_PAGE_SIZE, pagetoken=pagetoken
+        ).get_result()
+        yield from result.get("apikeys", [])
+        next_url = result.get("next")
+        pagetoken = parse_qs(urlparse(next_url).query).get("pagetoken", [None])[0] if next_url else None
+        if not pagetoken:
+            return
+
+class IBMProvider(CloudProvider):
+    """IBM Cloud IAM implementation of the provider interface."""
+
+    name = "ibm"
+    label = "IBM Cloud"
+    user_label = "IAM users"
+    user_id_field = "user_name"
+    resource_fields = {"api_key_id": "api_key"}
+    reconcile_resource_type = "api_key"
+    reconcile_field = "api_key_id"
+    services = SUPPORTED_SERVICES
+
+    def create_user(self, user_name):
+        api_key_data = create_iam_user(user_name)
+        if not api_key_data:
+            return None
+        return {
+            "user_name": user_name,
+            "api_key": api_key_data.get("apikey"),
+            "api_key_id": api_key_data.get("id"),
+        }
+
+    def create_users(self, user_names):
+        users = []
+        with ThreadPoolExecutor(max_workers=MAX_IAM_WORKERS) as executor:
+            for user in executor.map(self.create_user, user_names):
+                if user:
+                    self.export_credentials(user)
+                    users.append(user)
+        return users
+
+    def deploy(self, service_name, user):
+        return deploy_service(service_name, user["user_name"])
+
+    def delete(self, user):
+        return delete_iam_user(user)
+
+    def delete_users(self, users):
+        with ThreadPoolExecutor(max_workers=MAX_IAM_WORKERS) as executor:
+            return dict(zip((user["user_name"] for user in users), executor.map(delete_iam_user, users)))
+
+    def display(self, users):
+        display_iam_details(users)
+
+    def list_cloud_users(self):
+        for api_key in iter_api_keys():
+            name = api_key.get("name", "")
+            yield {"user_name": name[:-len("-apikey")] if name.endswith("-apikey") else name,
+                   "api_key_name": name, "api_key_id": api_key["id"]}
+
+    def is_managed(self, user):
+        # Only keys created by create_iam_user, named "<user>-apikey"
+        return re.fullmatch(rf"{self.managed_name_pattern()}-apikey", user["api_key_name"]) is not None
+
+def main():
+    run_cli(IBMProvider())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Embedded SQLite inventory of provisioned resources shared by every provider module.
+
+Each user, key, policy, group and bucket is recorded with its provider,
+cohort and expiry time, so cleanup, resume and "what is still live" queries
+are indexed lookups instead of full cloud listings.
+
+    python inventory_store.py live [--provider aws]
+    python inventory_store.py expired
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+from lifecycle_scheduler import SECRET_FIELDS
+
+DEFAULT_INVENTORY_FILE = "inventory.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    id INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    cohort TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    details TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    deleted_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_resources_live_identity
+    ON resources (provider, resource_type, resource_id) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_resources_provider_expiry
+    ON resources (provider, expires_at) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_resources_cohort ON resources (cohort);
+"""
+
+
+class InventoryStore:
+    """Thread-safe handle on the inventory database.
+
+    The database runs in WAL mode so readers never block the provisioning
+    threads that write to it. Each thread gets its own connection.
+    """
+
+    def __init__(self, path=DEFAULT_INVENTORY_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def record(self, provider, cohort, records, expires_at=None):
+        """Record `(resource_type, resource_id, details)` tuples for a cohort in one transaction.
+
+        A live resource recorded again (for example a cohort re-registered
+        after a restart) is updated in place rather than duplicated.
+        """
+        now = time.time()
+        rows = [
+            (provider, cohort, resource_type, str(resource_id), json.dumps(_strip_secrets(details)),
+             now, expires_at)
+            for resource_type, resource_id, details in records
+        ]
+        with self._connection() as connection:
+            connection.executemany(
+                """
+                INSERT INTO resources
+                    (provider, cohort, resource_type, resource_id, details, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (provider, resource_type, resource_id) WHERE deleted_at IS NULL
+                DO UPDATE SET cohort = excluded.cohort, details = excluded.details,
+                              expires_at = excluded.expires_at
+                """,
+                rows,
+            )
+
+    def mark_deleted(self, provider, resource_type, resource_ids):
+        """Mark live resources as deleted."""
+        now = time.time()
+        with self._connection() as connection:
+            connection.executemany(
+                """
+                UPDATE resources SET deleted_at = ?
+                WHERE provider = ? AND resource_type = ? AND resource_id = ? AND deleted_at IS NULL
+                """,
+                [(now, provider, resource_type, str(resource_id)) for resource_id in resource_ids],
+            )
+
+    def mark_cohort_deleted(self, cohort):
+        """Mark every live resource of a cohort as deleted."""
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE resources SET deleted_at = ? WHERE cohort = ? AND deleted_at IS NULL",
+                (time.time(), cohort),
+            )
+
+    def live_resources(self, provider=None, cohort=None, resource_type=None):
+        """Yield live resources as dicts, optionally filtered by provider, cohort and type."""
+        clauses, params = ["deleted_at IS NULL"], []
+        for column, value in (("provider", provider), ("cohort", cohort), ("resource_type", resource_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        query = f"SELECT * FROM resources WHERE {' AND '.join(clauses)}"
+        for row in self._connection().execute(query, params):
+            yield _row_to_dict(row)
+
+    def expired_resources(self, provider=None, now=None):
+        """Yield live resources whose expiry time has passed, soonest first."""
+        now = time.time() if now is None else now
+        if provider is None:
+            query, params = (
+                "SELECT * FROM resources WHERE deleted_at IS NULL AND expires_at <= ? ORDER BY expires_at",
+                (now,),
+            )
+        else:
+            query, params = (
+                "SELECT * FROM resources WHERE provider = ? AND deleted_at IS NULL AND expires_at <= ? "
+                "ORDER BY expires_at",
+                (provider, now),
+            )
+        for row in self._connection().execute(query, params):
+            yield _row_to_dict(row)
+
+    def live_cohorts(self, provider=None):
+        """Return a per-cohort count of live resources with the cohort's expiry time."""
+        query = """
+            SELECT provider, cohort, resource_type, COUNT(*) AS count, MIN(expires_at) AS expires_at
+            FROM resources WHERE deleted_at IS NULL {provider_filter}
+            GROUP BY provider, cohort, resource_type ORDER BY expires_at
+        """
+        if provider is None:
+            rows = self._connection().execute(query.format(provider_filter=""))
+        else:
+            rows = self._connection().execute(query.format(provider_filter="AND provider = ?"), (provider,))
+        return [dict(row) for row in rows]
+
+
+def _strip_secrets(details):
+    """Drop credential fields before anything is written to disk."""
+    return {key: value for key, value in (details or {}).items() if key not in SECRET_FIELDS}
+
+
+def _row_to_dict(row):
+    resource = dict(row)
+    resource["details"] = json.loads(resource["details"]) if resource["details"] else {}
+    return resource
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the provisioning inventory.")
+    parser.add_argument("query", choices=["live", "expired"])
+    parser.add_argument("--provider")
+    parser.add_argument("--inventory", default=DEFAULT_INVENTORY_FILE)
+    args = parser.parse_args()
+
+    store = InventoryStore(args.inventory)
+    if args.query == "live":
+        for row in store.live_cohorts(args.provider):
+            expires = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["expires_at"])) \
+                if row["expires_at"] else "never"
+            print(f"{row['provider']:<8} {row['cohort']:<20} {row['resource_type']:<16} "
+                  f"{row['count']:>6}  expires {expires}")
+    else:
+        for resource in store.expired_resources(args.provider):
+            print(f"{resource['provider']:<8} {resource['cohort']:<20} "
+                  f"{resource['resource_type']:<16} {resource['resource_id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Latency percentile summaries for provisioning reports and benchmarks."""
+import math
+
+
+def percentile(sorted_samples, fraction):
+    """Return the nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize_latencies(samples):
+    """Summarize latencies in seconds as count, p50, p90, p99 and max."""
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 0.50),
+        "p90": percentile(ordered, 0.90),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1] if ordered else None,
+    }
+
+
+def format_latency_summary(summary):
+    """Render a latency summary in milliseconds on one line."""
+    if not summary["count"]:
+        return "no samples"
+    return "  ".join(
+        f"{key} {summary[key] * 1000:.1f} ms" for key in ("p50", "p90", "p99", "max")
+    )
@@ -0,0 +1,162 @@
+"""Heap-ordered expiry table that cleans up provisioned cohorts when they expire."""
+import contextlib
+import fcntl
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+
+# Credential fields that must never be written to the state file
+SECRET_FIELDS = {"Password", "password", "SecretAccessKey", "AccessKeySecret", "api_key"}
+
+# Seconds to wait before retrying a cohort whose cleanup raised
+CLEANUP_RETRY_DELAY = 60
+
+
+def owner_is_running(pid):
+    """Return True if the process that owns a cohort is still running on this host."""
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class LifecycleScheduler:
+    """Track cohort expiry times and run cleanup for each batch as it expires.
+
+    Cohorts are kept in a min-heap keyed on their expiry timestamp, so the
+    scheduler sleeps exactly until the next cohort is due instead of polling.
+    Every change is written to `state_file`, and cohorts are only dropped
+    from it once their cleanup has finished, so a restarted process picks up
+    where the previous one stopped.
+
+    Several processes may share one state file. Each change is merged into
+    the file under an exclusive lock, and every cohort records the process
+    that owns it. A process only cleans up the cohorts it added, plus those
+    whose owner is no longer running.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self._cohorts = {}
+        self._heap = []
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._load()
+
+    @contextlib.contextmanager
+    def _locked_state(self):
+        """Hold the state file's lock and yield its current contents; write back what the caller leaves."""
+        with open(f"{self.state_file}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            cohorts = {}
+            if os.path.exists(self.state_file):
+                with open(self.state_file) as f:
+                    cohorts = json.load(f)
+            yield cohorts
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, "w") as f:
+                json.dump(cohorts, f)
+            os.replace(temp_file, self.state_file)
+
+    def _load(self):
+        """Take over the cohorts of processes that are no longer running."""
+        with self._locked_state() as cohorts:
+            for cohort_id, cohort in cohorts.items():
+                if not owner_is_running(cohort.get("owner")):
+                    cohort["owner"] = os.getpid()
+                    self._cohorts[cohort_id] = cohort
+                    heapq.heappush(self._heap, (cohort["expires_at"], cohort_id))
+        if self._cohorts:
+            print(f"Restored {len(self._cohorts)} cohort(s) from {self.state_file}.")
+
+    def _save(self, cohort_id):
+        """Merge one cohort's current entry, or its removal, into the state file."""
+        with self._locked_state() as cohorts:
+            if cohort_id in self._cohorts:
+                cohorts[cohort_id] = self._cohorts[cohort_id]
+            else:
+                cohorts.pop(cohort_id, None)
+
+    def add_cohort(self, provider, end_time, resources, cohort_id=None):
+        """Register provisioned resources for cleanup at `end_time` and return the cohort ID."""
+        cohort_id = cohort_id or f"{provider}-{uuid.uuid4().hex[:8]}"
+        cohort = {
+            "provider": provider,
+            "expires_at": end_time.timestamp(),
+            "owner": os.getpid(),
+            "resources": [
+                {key: value for key, value in resource.items() if key not in SECRET_FIELDS}
+                for resource in resources
+            ],
+        }
+        with self._condition:
+            self._cohorts[cohort_id] = cohort
+            heapq.heappush(self._heap, (cohort["expires_at"], cohort_id))
+            self._save(cohort_id)
+            self._condition.notify()
+        return cohort_id
+
+    def pending_cohorts(self):
+        """Return the number of cohorts still awaiting cleanup."""
+        with self._condition:
+            return len(self._cohorts)
+
+    def stop(self):
+        """Wake up `run()` and make it return without cleaning anything else."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def _pop_expired(self, now):
+        """Pop every cohort whose expiry time has passed."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, cohort_id = heapq.heappop(self._heap)
+            if cohort_id in self._cohorts:
+                expired.append((cohort_id, self._cohorts[cohort_id]))
+        return expired
+
+    def _wait_for_expired(self, stop_when_empty):
+        """Block until at least one cohort is due; return None when there is nothing left to do."""
+        with self._condition:
+            while not self._stopped:
+                if not self._heap:
+                    if stop_when_empty:
+                        return None
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay <= 0:
+                    return self._pop_expired(time.time())
+                self._condition.wait(timeout=delay)
+            return None
+
+    def run(self, cleanup, stop_when_empty=True):
+        """Call `cleanup(provider, resources, cohort_id)` for each cohort as it expires.
+
+        With `stop_when_empty` the call returns once every cohort has been
+        cleaned up; otherwise it keeps waiting for new cohorts until `stop()`.
+        """
+        while True:
+            expired = self._wait_for_expired(stop_when_empty)
+            if expired is None:
+                return
+            for cohort_id, cohort in expired:
+                try:
+                    cleanup(cohort["provider"], cohort["resources"], cohort_id)
+                except Exception as e:
+                    print(f"Error cleaning up cohort {cohort_id}: {e}")
+                    with self._condition:
+                        heapq.heappush(self._heap, (time.time() + CLEANUP_RETRY_DELAY, cohort_id))
+                    continue
+                with self._condition:
+                    self._cohorts.pop(cohort_id, None)
+                    self._save(cohort_id)
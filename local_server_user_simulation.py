@@ -1,116 +1,215 @@
-import os
-import random
-import string
-import subprocess
-from datetime import datetime, timedelta
-import time
-
-# Supported Services (simulated)
-SUPPORTED_SERVICES = [
-    "Web Server", "Database Server", "File Storage", 
-    "Backup Service", "Monitoring Service", "Compute Workload"
-]
-
-def generate_password():
-    """Generate a random password for local users."""
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(random.choice(characters) for _ in range(12))
-
-def create_local_user(user_name):
-    """Create a local user with a generated password."""
-    password = generate_password()
-    try:
-        # Create user (Linux example)
-        subprocess.run(['sudo', 'useradd', '-m', user_name], check=True)
-        subprocess.run(['sudo', 'chpasswd'], input=f"{user_name}:{password}".encode(), check=True)
-        print(f"Created local user: {user_name}")
-        return {"UserName": user_name, "Password": password}
-    except subprocess.CalledProcessError as e:
-        print(f"Error creating user {user_name}: {e}")
-        return None
-
-def deploy_service(service_name, user_name):
-    """Simulate the deployment of services."""
-    print(f"Deploying {service_name} for user {user_name}...")
-    if service_name == "Web Server":
-        print(f"Simulated web server deployment for user {user_name}.")
-    elif service_name == "Database Server":
-        print(f"Simulated database server deployment for user {user_name}.")
-    elif service_name == "File Storage":
-        user_dir = f"/home/{user_name}/storage"
-        os.makedirs(user_dir, exist_ok=True)
-        print(f"Simulated file storage setup at {user_dir}.")
-    else:
-        print(f"{service_name} deployment simulation completed.")
-
-def delete_local_user(user_name):
-    """Delete a local user."""
-    try:
-        subprocess.run(['sudo', 'userdel', '-r', user_name], check=True)
-        print(f"Deleted local user: {user_name}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error deleting user {user_name}: {e}")
-
-def display_user_details(users):
-    """Display local user credentials."""
-    print("\nLocal User Details:")
-    print("=" * 50)
-    for user in users:
-        print(f"User Name: {user['UserName']}")
-        print(f"Password: {user['Password']}")
-        print("=" * 50)
-
-def main():
-    print("Supported Local Server Services:")
-    for idx, service in enumerate(SUPPORTED_SERVICES, start=1):
-        print(f"{idx}. {service}")
-    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
-    services_input = input("Services: ").strip()
-    
-    try:
-        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
-        selected_services = [SUPPORTED_SERVICES[i] for i in selected_indices if 0 <= i < len(SUPPORTED_SERVICES)]
-    except ValueError:
-        print("Invalid input. Please enter valid service numbers.")
-        return
-    
-    if not selected_services:
-        print("No services selected. Exiting.")
-        return
-
-    user_count = int(input("Enter the number of local users to create: "))
-    duration_days = int(input("Enter the number of days to run services: "))
-    duration_hours = int(input("Enter the number of hours to run services: "))
-
-    users = []
-    for i in range(user_count):
-        user_name = f"user-{i+1}"
-        credentials = create_local_user(user_name)
-        if credentials:
-            users.append(credentials)
-
-    # Display user details
-    display_user_details(users)
-
-    # Deploy services for each user
-    for user in users:
-        for service in selected_services:
-            deploy_service(service, user["UserName"])
-
-    # Simulate resource lifecycle
-    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
-    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    while datetime.now() < end_time:
-        time.sleep(10)  # Simulating active resources
-
-    print("\nTime's up! Cleaning up local users...")
-
-    # Delete local users
-    for user in users:
-        delete_local_user(user["UserName"])
-
-    print("\nCleanup completed.")
-
-if __name__ == "__main__":
-    main()
+import os
+import pwd
+import secrets
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cloud_provider import CloudProvider, load_service_catalog, run_cli
+from credential_generator import generate_password, generate_passwords
+from credential_export import MAX_DISPLAYED_USERS, print_truncation_note, redact
+from latency_stats import format_latency_summary, summarize_latencies
+
+# Supported Services (simulated)
+SUPPORTED_SERVICES = load_service_catalog("local")
+
+# Storage provisioning settings
+STORAGE_ROOT = "/home"
+STORAGE_QUOTA_BYTES = 1024 ** 3  # Size of each user's quota image; 0 disables it
+PREALLOCATE_STORAGE = False  # Reserve the blocks up front instead of leaving the image sparse
+MAX_STORAGE_WORKERS = 16
+
+# Every command and account lookup goes through these hooks so a fake passwd
+# backend can stand in for the system one
+run_command = subprocess.run
+get_passwd_entry = pwd.getpwnam
+
+def user_exists(user_name):
+    """Return True if a local account with this name exists."""
+    try:
+        get_passwd_entry(user_name)
+    except KeyError:
+        return False
+    return True
+
+def create_local_user(user_name):
+    """Create a local user with a generated password."""
+    password = generate_password("local")
+    try:
+        # Create user (Linux example)
+        run_command(['sudo', 'useradd', '-m', user_name], check=True)
+        run_command(['sudo', 'chpasswd'], input=f"{user_name}:{password}".encode(), check=True)
+        print(f"Created local user: {user_name}")
+        return {"UserName": user_name, "Password": password}
+    except subprocess.CalledProcessError as e:
+        print(f"Error creating user {user_name}: {e}")
+        return None
+
+def create_local_users_in_bulk(user_names):
+    """Create a cohort of local users with one newusers call and one chpasswd stream.
+
+    The newusers batch file only holds throwaway placeholder passwords; the
+    real ones are streamed to chpasswd over stdin so they never touch disk.
+    If either command fails partway, the accounts it did create are
+    deleted again; any that cannot be are returned so they are recorded
+    and cleaned up with the cohort. Names that already exist are skipped,
+    since newusers would overwrite those accounts.
+    """
+    existing = {user_name for user_name in user_names if user_exists(user_name)}
+    for user_name in sorted(existing):
+        print(f"Error creating user {user_name}: the account already exists.")
+    user_names = [user_name for user_name in user_names if user_name not in existing]
+    if not user_names:
+        return []
+    passwords = generate_passwords(len(user_names), "local")
+    users = [{"UserName": user_name, "Password": password} for user_name, password in zip(user_names, passwords)]
+    # newusers format: name:password:uid:gid:gecos:home:shell (empty uid/gid take the next free IDs)
+    with tempfile.NamedTemporaryFile("w", prefix="newusers-", suffix=".txt", delete=False) as batch_file:
+        for user in users:
+            name = user["UserName"]
+            batch_file.write(f"{name}:{secrets.token_urlsafe(16)}::::/home/{name}:/bin/bash\n")
+    try:
+        run_command(['sudo', 'newusers', batch_file.name], check=True)
+        password_stream = "".join(f"{user['UserName']}:{user['Password']}\n" for user in users)
+        run_command(['sudo', 'chpasswd'], input=password_stream.encode(), check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error creating {len(users)} local users: {e}")
+        created = [user for user in users if user_exists(user["UserName"])]
+        if not created:
+            return []
+        print(f"Rolling back {len(created)} local users created before the error.")
+        results = delete_local_users_in_bulk([user["UserName"] for user in created])
+        return [user for user in created if not results[user["UserName"]]]
+    finally:
+        os.unlink(batch_file.name)
+    print(f"Created {len(users)} local users.")
+    return users
+
+def deploy_service(service_name, user_name):
+    """Simulate the deployment of services."""
+    print(f"Deploying {service_name} for user {user_name}...")
+    if service_name == "Web Server":
+        print(f"Simulated web server deployment for user {user_name}.")
+    elif service_name == "Database Server":
+        print(f"Simulated database server deployment for user {user_name}.")
+    elif service_name == "File Storage":
+        provision_user_storage(user_name)
+        print(f"Simulated file storage setup at {os.path.join(STORAGE_ROOT, user_name, 'storage')}.")
+    else:
+        print(f"{service_name} deployment simulation completed.")
+
+def provision_user_storage(user_name, base_dir=STORAGE_ROOT, quota_bytes=STORAGE_QUOTA_BYTES,
+                           preallocate=PREALLOCATE_STORAGE):
+    """Create a user's storage directory and fixed-size quota image; return the seconds taken."""
+    start = time.perf_counter()
+    user_dir = os.path.join(base_dir, user_name, "storage")
+    os.makedirs(user_dir, exist_ok=True)
+    if quota_bytes:
+        # The image stands in for a quota: sparse by default, fully allocated on request
+        with open(os.path.join(user_dir, "quota.img"), "wb") as image:
+            if preallocate:
+                os.posix_fallocate(image.fileno(), 0, quota_bytes)
+            else:
+                image.truncate(quota_bytes)
+    return time.perf_counter() - start
+
+def provision_storage_in_parallel(user_names, base_dir=STORAGE_ROOT, quota_bytes=STORAGE_QUOTA_BYTES,
+                                  preallocate=PREALLOCATE_STORAGE, max_workers=MAX_STORAGE_WORKERS):
+    """Provision storage for a whole cohort in a thread pool and return {user_name: seconds}.
+
+    Users whose storage could not be created map to None. Latency
+    percentiles for the cohort are printed once all users are done.
+    """
+    def provision(user_name):
+        try:
+            return provision_user_storage(user_name, base_dir, quota_bytes, preallocate)
+        except OSError as e:
+            print(f"Error provisioning storage for {user_name}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        latencies = dict(zip(user_names, executor.map(provision, user_names)))
+    summary = summarize_latencies([latency for latency in latencies.values() if latency is not None])
+    print(f"Provisioned storage for {summary['count']} of {len(user_names)} users under {base_dir}: "
+          f"{format_latency_summary(summary)}")
+    return latencies
+
+def delete_local_user(user_name):
+    """Delete a local user and return True on success."""
+    try:
+        run_command(['sudo', 'userdel', '-r', user_name], check=True)
+        print(f"Deleted local user: {user_name}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Error deleting user {user_name}: {e}")
+        return False
+
+def delete_local_users_in_bulk(user_names):
+    """Delete a cohort of local users through a single sudo invocation and return {user name: deleted}."""
+    # xargs runs userdel once per name it reads, all under the one sudo session
+    result = run_command(
+        ['sudo', 'xargs', '-r', '-n', '1', 'userdel', '-r'],
+        input="".join(f"{user_name}\n" for user_name in user_names).encode()
+    )
+    if result.returncode == 0:
+        print(f"Deleted {len(user_names)} local users.")
+        return dict.fromkeys(user_names, True)
+    # xargs only reports that some userdel failed, so check which accounts are still there
+    results = {user_name: not user_exists(user_name) for user_name in user_names}
+    print(f"Error deleting {sum(1 for deleted in results.values() if not deleted)} of {len(user_names)} "
+          f"local users (exit status {result.returncode}).")
+    return results
+
+def display_user_details(users):
+    """Display local user details with passwords redacted."""
+    print("\nLocal User Details:")
+    print("=" * 50)
+    for user in users[:MAX_DISPLAYED_USERS]:
+        print(f"User Name: {user['UserName']}")
+        print(f"Password: {redact(user['Password'])}")
+        print("=" * 50)
+    print_truncation_note(users)
+
+class LocalProvider(CloudProvider):
+    """Local Linux server implementation of the provider interface."""
+
+    name = "local"
+    label = "Local Server"
+    user_label = "local users"
+    services = SUPPORTED_SERVICES
+
+    def create_user(self, user_name):
+        return create_local_user(user_name)
+
+    def create_users(self, user_names):
+        users = create_local_users_in_bulk(user_names)
+        for user in users:
+            self.export_credentials(user)
+        return users
+
+    def deploy(self, service_name, user):
+        deploy_service(service_name, user["UserName"])
+
+    def deploy_services(self, services, users):
+        if "File Storage" in services:
+            provision_storage_in_parallel([user["UserName"] for user in users])
+            services = [service for service in services if service != "File Storage"]
+        super().deploy_services(services, users)
+
+    def delete(self, user):
+        return delete_local_user(user["UserName"])
+
+    def delete_users(self, users):
+        return delete_local_users_in_bulk([user["UserName"] for user in users])
+
+    def display(self, users):
+        display_user_details(users)
+
+    def list_cloud_users(self):
+        return ({"UserName": entry.pw_name} for entry in pwd.getpwall())
+
+def main():
+    run_cli(LocalProvider())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Provision cohorts on several clouds in parallel from a single process.
+
+Example: bring up an AWS, GCP and OCI lab side by side for two hours::
+
+    python multi_cloud_orchestrator.py --cohort aws:1,2:10 --cohort gcp:2:5 \\
+        --cohort oci:1:5 --hours 2
+
+or run every cohort described in spec files (see cohort_spec.py)::
+
+    python multi_cloud_orchestrator.py --spec nightly_labs.yaml
+"""
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from cloud_provider import start_cohort
+from cohort_spec import load_cohorts, resolve_services
+from credential_export import DEFAULT_EXPORT_EXTENSION, CredentialExporter, add_credentials_format_argument
+from inventory_store import DEFAULT_INVENTORY_FILE, InventoryStore
+from lifecycle_scheduler import LifecycleScheduler
+
+# Provider name -> (module, provider class)
+PROVIDER_MODULES = {
+    "aws": ("aws_service_selector", "AWSProvider"),
+    "alibaba": ("alibaba_ram_service_simulation", "AlibabaProvider"),
+    "azure": ("azure_service_deployer", "AzureProvider"),
+    "gcp": ("gcp_iam_service_simulation", "GCPProvider"),
+    "ibm": ("ibm_iam_service_simulation", "IBMProvider"),
+    "local": ("local_server_user_simulation", "LocalProvider"),
+    "oci": ("oci_iam_service_simulation", "OCIProvider"),
+}
+
+# Cohorts from every provider share one expiry table
+LIFECYCLE_STATE_FILE = "lifecycle_state_orchestrator.json"
+
+# Cohorts provisioned at the same time; each one runs its own worker pools
+MAX_CONCURRENT_COHORTS = 8
+
+
+def load_provider(name):
+    """Import a provider module on demand and return an instance of its provider class."""
+    if name not in PROVIDER_MODULES:
+        raise ValueError(f"Unknown provider '{name}'. Choose from: {', '.join(PROVIDER_MODULES)}")
+    module_name, class_name = PROVIDER_MODULES[name]
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)()
+
+
+def parse_cohort(value):
+    """Parse a `provider:service numbers:user count` cohort argument."""
+    try:
+        name, services_input, user_count = value.split(":")
+        numbers = [int(i.strip()) for i in services_input.split(",")]
+        return {"provider": name, "services": numbers, "user_count": int(user_count)}
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Invalid cohort '{value}'. Expected provider:services:count, e.g. aws:1,2:10"
+        )
+
+
+def provision(provider, cohort, inventory=None, cohort_id=None, expires_at=None,
+              credentials_extension=DEFAULT_EXPORT_EXTENSION):
+    """Provision one cohort on its provider and return the created users.
+
+    Credentials go to `credentials_<cohort id><credentials_extension>`.
+    """
+    if not provider.prepare():
+        return []
+    services = resolve_services(provider, cohort["services"])
+    if not services:
+        print(f"No valid services selected for {provider.label} cohort {cohort_id}.")
+        return []
+    with CredentialExporter(f"credentials_{cohort_id}{credentials_extension}") as credential_sink:
+        return provider.provision_cohort(
+            services, cohort["user_count"], inventory, cohort_id, expires_at, credential_sink
+        )
+
+
+def run_cohorts(cohorts, end_time=None, state_file=LIFECYCLE_STATE_FILE,
+                inventory_file=DEFAULT_INVENTORY_FILE, max_parallel=MAX_CONCURRENT_COHORTS,
+                credentials_extension=DEFAULT_EXPORT_EXTENSION):
+    """Provision cohorts concurrently, then clean each one up as it expires.
+
+    Cohorts carrying their own `end_time` (from a spec) keep it; the rest
+    expire at `end_time`. At most `max_parallel` cohorts provision at once.
+    Each cohort's credentials are exported to its own file in the
+    format named by `credentials_extension`.
+    """
+    scheduler = LifecycleScheduler(state_file)
+    inventory = InventoryStore(inventory_file)
+    providers = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(cohorts), max_parallel))) as executor:
+        futures = {}
+        for cohort in cohorts:
+            # Each cohort gets its own provider instance so prefixes and settings never mix
+            provider = load_provider(cohort["provider"])
+            providers.setdefault(provider.name, provider)
+            cohort_id = start_cohort(provider, cohort.get("user_prefix"))
+            cohort_end = cohort.get("end_time", end_time)
+            future = executor.submit(
+                provision, provider, cohort, inventory, cohort_id, cohort_end.timestamp(),
+                credentials_extension
+            )
+            futures[future] = (provider, cohort_id, cohort_end)
+        for future in as_completed(futures):
+            provider, cohort_id, cohort_end = futures[future]
+            try:
+                users = future.result()
+            except Exception as e:
+                print(f"Error provisioning {provider.label} cohort: {e}")
+                continue
+            if users:
+                scheduler.add_cohort(provider.name, cohort_end, users, cohort_id)
+                print(f"Scheduled {provider.label} cohort {cohort_id} ({len(users)} users) "
+                      f"until {cohort_end.strftime('%Y-%m-%d %H:%M:%S')}.")
+
+    def cleanup(name, resources, cohort_id):
+        if name not in providers:
+            providers[name] = load_provider(name)
+        providers[name].cleanup_users(resources, inventory, cohort_id)
+
+    # Cohorts restored from the state file are cleaned up alongside the new ones
+    scheduler.run(cleanup)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Provision cohorts on several clouds in parallel from a single process."
+    )
+    parser.add_argument(
+        "--cohort", action="append", type=parse_cohort, default=[],
+        help="provider:service numbers:user count, e.g. aws:1,2:10 (repeatable)"
+    )
+    parser.add_argument(
+        "--spec", action="append", default=[],
+        help="JSON or YAML spec file describing cohorts (repeatable)"
+    )
+    parser.add_argument("--days", type=int, default=0, help="Days to run services")
+    parser.add_argument("--hours", type=int, default=1, help="Hours to run services")
+    parser.add_argument("--parallel", type=int, default=MAX_CONCURRENT_COHORTS,
+                        help="Cohorts to provision at the same time")
+    parser.add_argument("--state-file", default=LIFECYCLE_STATE_FILE)
+    parser.add_argument("--inventory", default=DEFAULT_INVENTORY_FILE, help="SQLite inventory file")
+    add_credentials_format_argument(parser)
+    args = parser.parse_args()
+
+    cohorts = list(args.cohort)
+    try:
+        for path in args.spec:
+            cohorts.extend(load_cohorts(path))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    end_time = datetime.now() + timedelta(days=args.days, hours=args.hours)
+    run_cohorts(cohorts, end_time, args.state_file, args.inventory, args.parallel,
+                f".{args.credentials_format}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,159 +1,385 @@
-import random
-import string
-import time
-from datetime import datetime, timedelta
-import oci
-
-# Configuration
-OCI_CONFIG_FILE = "~/.oci/config"  # Path to your OCI config file
-OCI_PROFILE_NAME = "DEFAULT"      # Profile name in the config file
-
-# Supported OCI Services
-SUPPORTED_SERVICES = [
-    "Compute Instance", "Object Storage Bucket",
-    "Autonomous Database", "Functions Service",
-    "Monitoring", "Virtual Cloud Network (VCN)",
-    "Block Volume", "API Gateway"
-]
-
-# Initialize OCI Clients
-config = oci.config.from_file(OCI_CONFIG_FILE, OCI_PROFILE_NAME)
-identity_client = oci.identity.IdentityClient(config)
-
-# Retrieve Tenancy OCID
-tenancy_ocid = config["tenancy"]
-
-
-def generate_password():
-    """Generate a random password for IAM users."""
-    characters = string.ascii_letters + string.digits + "!@#$%^&*"
-    return ''.join(random.choice(characters) for _ in range(12))
-
-
-def create_iam_user(user_name):
-    """Create an OCI IAM user and API key."""
-    try:
-        # Create IAM user
-        user_details = oci.identity.models.CreateUserDetails(
-            compartment_id=tenancy_ocid,
-            name=user_name,
-            description=f"User {user_name}"
-        )
-        user = identity_client.create_user(user_details).data
-        print(f"Created IAM user: {user.name}")
-
-        # Generate a random password
-        password = generate_password()
-        return {
-            "UserName": user.name,
-            "UserId": user.id,
-            "Password": password
-        }
-    except Exception as e:
-        print(f"Error creating IAM user {user_name}: {e}")
-        return None
-
-
-def assign_policy_to_user(user_id, policy_name="AllowUserToManageResources"):
-    """Assign a policy to an IAM user."""
-    try:
-        policy_statement = f"Allow user {user_id} to manage all-resources in tenancy"
-        policy_details = oci.identity.models.CreatePolicyDetails(
-            compartment_id=tenancy_ocid,
-            name=policy_name,
-            description=f"Policy for user {user_id}",
-            statements=[policy_statement]
-        )
-        policy = identity_client.create_policy(policy_details).data
-        print(f"Assigned policy {policy.name} to user {user_id}.")
-    except Exception as e:
-        print(f"Error assigning policy to user {user_id}: {e}")
-
-
-def deploy_service(service_name, user_name):
-    """Simulate the deployment of OCI services."""
-    print(f"Deploying {service_name} for user {user_name}...")
-    if service_name == "Compute Instance":
-        print(f"Simulated Compute Instance deployment for user {user_name}.")
-    elif service_name == "Object Storage Bucket":
-        bucket_name = f"user-{user_name}-bucket-{random.randint(1000, 9999)}"
-        print(f"Simulated Object Storage Bucket creation: {bucket_name}.")
-    else:
-        print(f"{service_name} deployment simulation completed.")
-
-
-def delete_iam_user(user):
-    """Delete an IAM user."""
-    try:
-        identity_client.delete_user(user["UserId"])
-        print(f"Deleted IAM user: {user['UserName']}")
-    except Exception as e:
-        print(f"Error deleting IAM user {user['UserName']}: {e}")
-
-
-def display_iam_details(users):
-    """Display IAM user credentials."""
-    print("\nIAM User Details:")
-    print("=" * 50)
-    for user in users:
-        print(f"User Name: {user['UserName']}")
-        print(f"Password: {user['Password']}")
-        print("=" * 50)
-
-
-def main():
-    print("Supported OCI Services:")
-    for idx, service in enumerate(SUPPORTED_SERVICES, start=1):
-        print(f"{idx}. {service}")
-    print("\nEnter the numbers of the services to deploy (comma-separated, e.g., 1,2,5):")
-    services_input = input("Services: ").strip()
-    
-    try:
-        selected_indices = [int(i.strip()) - 1 for i in services_input.split(",")]
-        selected_services = [SUPPORTED_SERVICES[i] for i in selected_indices if 0 <= i < len(SUPPORTED_SERVICES)]
-    except ValueError:
-        print("Invalid input. Please enter valid service numbers.")
-        return
-    
-    if not selected_services:
-        print("No services selected. Exiting.")
-        return
-
-    iam_user_count = int(input("Enter the number of IAM users to create: "))
-    duration_days = int(input("Enter the number of days to run services: "))
-    duration_hours = int(input("Enter the number of hours to run services: "))
-
-    users = []
-    for i in range(iam_user_count):
-        user_name = f"user-{i+1}"
-        credentials = create_iam_user(user_name)
-        if credentials:
-            assign_policy_to_user(credentials["UserId"])
-            users.append(credentials)
-
-    # Display IAM user details
-    display_iam_details(users)
-
-    # Deploy services for each IAM user
-    for user in users:
-        for service in selected_services:
-            deploy_service(service, user["UserName"])
-
-    # Simulate resource lifecycle
-    end_time = datetime.now() + timedelta(days=duration_days, hours=duration_hours)
-    print(f"\nResources will run until: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    while datetime.now() < end_time:
-        time.sleep(10)  # Simulating active resources
-
-    print("\nTime's up! Cleaning up IAM users...")
-
-    # Delete IAM users
-    for user in users:
-        delete_iam_user(user)
-
-    print("\nCleanup completed.")
-
-
-if __name__ == "__main__":
-    main()
+import functools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cloud_provider import CloudProvider, lazy_client, load_service_catalog, run_cli
+from credential_generator import generate_password, unique_name
+from credential_export import MAX_DISPLAYED_USERS, print_truncation_note, redact
+from rate_limiter import ConcurrencyGovernor
+
+# Configuration
+OCI_CONFIG_FILE = "~/.oci/config"  # Path to your OCI config file
+OCI_PROFILE_NAME = "DEFAULT"      # Profile name in the config file
+
+# Supported OCI Services
+SUPPORTED_SERVICES = load_service_catalog("oci")
+
+# Cohort group/policy settings
+COHORT_POLICY_STATEMENT = "Allow group {group_name} to manage all-resources in tenancy"
+MAX_IDENTITY_WORKERS = 32  # iam_governor decides how many calls are really in flight
+
+# Lifecycle tracking settings
+USER_POLL_INTERVAL = 5  # Seconds between tenancy-wide user listings
+USER_STATE_TIMEOUT = 600  # Seconds to wait for users to settle
+
+# Every Identity call, list pages included, goes through this governor, which adapts to throttling
+iam_governor = ConcurrencyGovernor()
+
+# OCI clients are not safe to share between threads, so each worker gets its own
+_thread_clients = threading.local()
+
+# Initialize OCI Clients (on first use)
+@lazy_client
+def get_config():
+    """Return the process-wide OCI configuration."""
+    import oci
+    return oci.config.from_file(OCI_CONFIG_FILE, OCI_PROFILE_NAME)
+
+
+def get_identity_client():
+    """Return this thread's OCI Identity client, creating it on first use."""
+    if not hasattr(_thread_clients, "identity_client"):
+        import oci
+        _thread_clients.identity_client = oci.identity.IdentityClient(get_config())
+    return _thread_clients.identity_client
+
+
+def get_tenancy_ocid():
+    """Retrieve the tenancy OCID from the OCI configuration."""
+    return get_config()["tenancy"]
+
+
+def create_iam_user(user_name):
+    """Create an OCI IAM user and API key."""
+    import oci
+
+    try:
+        # Create IAM user
+        user_details = oci.identity.models.CreateUserDetails(
+            compartment_id=get_tenancy_ocid(),
+            name=user_name,
+            description=f"User {user_name}"
+        )
+        user = iam_governor.call(get_identity_client().create_user, user_details).data
+        print(f"Created IAM user: {user.name}")
+
+        # Generate a random password
+        password = generate_password("oci")
+        return {
+            "UserName": user.name,
+            "UserId": user.id,
+            "Password": password
+        }
+    except Exception as e:
+        print(f"Error creating IAM user {user_name}: {e}")
+        return None
+
+
+def iter_users(compartment_id):
+    """Yield every user in a compartment, fetching each list_users page in an iam_governor slot."""
+    import oci
+
+    list_users = functools.partial(iam_governor.call, get_identity_client().list_users)
+    yield from oci.pagination.list_call_get_all_results_generator(list_users, "record", compartment_id)
+
+
+def iter_user_states(compartment_id):
+    """Yield (user OCID, lifecycle state) for every user, one page of list_users at a time."""
+    for user in iter_users(compartment_id):
+        yield user.id, user.lifecycle_state
+
+
+def wait_for_user_states(user_ids, target_state, timeout=USER_STATE_TIMEOUT, interval=USER_POLL_INTERVAL):
+    """Wait until every user reaches `target_state` and return {user OCID: last seen state}.
+
+    One paginated list_users sweep per interval serves every tracked user,
+    instead of a GET per user per poll. When waiting for DELETED, users that
+    no longer appear in the listing count as deleted.
+    """
+    pending = set(user_ids)
+    states = dict.fromkeys(pending, "UNKNOWN")
+    deadline = time.monotonic() + timeout
+    while pending:
+        seen = set()
+        for user_id, state in iter_user_states(get_tenancy_ocid()):
+            if user_id in pending:
+                seen.add(user_id)
+                states[user_id] = state
+                if state == target_state:
+                    pending.discard(user_id)
+        if target_state == "DELETED":
+            for user_id in pending - seen:
+                states[user_id] = "DELETED"
+            pending &= seen
+        if not pending or time.monotonic() >= deadline:
+            break
+        time.sleep(interval)
+    return states
+
+
+def create_iam_users_async(user_names, max_workers=MAX_IDENTITY_WORKERS):
+    """Create IAM users concurrently and return those that reached ACTIVE.
+
+    Users that never become ACTIVE are deleted again; any whose delete is
+    refused are returned too, so they are recorded and cleaned up with the
+    rest of the cohort instead of leaking. If the users cannot be listed,
+    every created user is returned for the same reason.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        created = [user for user in executor.map(create_iam_user, user_names) if user]
+    try:
+        states = wait_for_user_states([user["UserId"] for user in created], "ACTIVE")
+    except Exception as e:
+        print(f"Error listing IAM users: {e}; keeping all {len(created)} created users.")
+        return created
+    users = []
+    unsettled = []
+    for user in created:
+        if states[user["UserId"]] == "ACTIVE":
+            users.append(user)
+        else:
+            print(f"IAM user {user['UserName']} did not become ACTIVE (state: {states[user['UserId']]}); "
+                  f"deleting it.")
+            unsettled.append(user)
+    if unsettled:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            deleted = list(executor.map(delete_iam_user, unsettled))
+        users.extend(user for user, ok in zip(unsettled, deleted) if not ok)
+    return users
+
+
+def delete_iam_users_async(users, max_workers=MAX_IDENTITY_WORKERS):
+    """Delete IAM users concurrently and wait until they are gone; return {user name: state}.
+
+    Only users whose delete was accepted are waited on; the rest are
+    reported as DELETE_FAILED straight away.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        accepted = [user for user, ok in zip(users, executor.map(delete_iam_user, users)) if ok]
+    states = wait_for_user_states([user["UserId"] for user in accepted], "DELETED")
+    results = {user["UserName"]: states.get(user["UserId"], "DELETE_FAILED") for user in users}
+    for user in accepted:
+        if states[user["UserId"]] != "DELETED":
+            print(f"IAM user {user['UserName']} was not deleted (state: {states[user['UserId']]}).")
+    return results
+
+
+def create_cohort_group(group_name):
+    """Create the IAM group that every user of a cohort joins and return its OCID."""
+    import oci
+
+    group_details = oci.identity.models.CreateGroupDetails(
+        compartment_id=get_tenancy_ocid(),
+        name=group_name,
+        description=f"Users of cohort {group_name}"
+    )
+    group = iam_governor.call(get_identity_client().create_group, group_details).data
+    print(f"Created IAM group: {group.name}")
+    return group.id
+
+
+def create_cohort_policy(group_name, policy_name):
+    """Create the single policy that grants a cohort group its permissions and return its OCID."""
+    import oci
+
+    policy_details = oci.identity.models.CreatePolicyDetails(
+        compartment_id=get_tenancy_ocid(),
+        name=policy_name,
+        description=f"Policy for group {group_name}",
+        statements=[COHORT_POLICY_STATEMENT.format(group_name=group_name)]
+    )
+    policy = iam_governor.call(get_identity_client().create_policy, policy_details).data
+    print(f"Assigned policy {policy.name} to group {group_name}.")
+    return policy.id
+
+
+def add_user_to_group(user, group_id):
+    """Add an IAM user to a group and return the membership OCID."""
+    import oci
+
+    try:
+        membership_details = oci.identity.models.AddUserToGroupDetails(
+            user_id=user["UserId"],
+            group_id=group_id
+        )
+        membership = iam_governor.call(
+            get_identity_client().add_user_to_group, membership_details
+        ).data
+        return membership.id
+    except Exception as e:
+        print(f"Error adding user {user['UserName']} to group: {e}")
+        return None
+
+
+def assign_cohort_policy(users, max_workers=MAX_IDENTITY_WORKERS):
+    """Grant a cohort its permissions through one group and one policy.
+
+    The group and policy are created once per cohort, whatever its size;
+    only the group memberships scale with the number of users, and those
+    are added concurrently. Each user dict is annotated with the group,
+    policy and membership OCIDs so cleanup can find them again; the group
+    is recorded as soon as it exists, so a failed policy never leaks it.
+    """
+    cohort_name = f"cohort-{uuid.uuid4().hex[:8]}"
+    group_name = f"{cohort_name}-group"
+    try:
+        group_id = create_cohort_group(group_name)
+        for user in users:
+            user["GroupId"] = group_id
+        policy_id = create_cohort_policy(group_name, f"{cohort_name}-policy")
+    except Exception as e:
+        print(f"Error creating group and policy for {cohort_name}: {e}")
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(add_user_to_group, user, group_id): user for user in users}
+        for future in as_completed(futures):
+            user = futures[future]
+            user["PolicyId"] = policy_id
+            user["MembershipId"] = future.result()
+    added = sum(1 for user in users if user["MembershipId"])
+    print(f"Added {added} of {len(users)} users to group {group_name}.")
+
+
+def remove_user_from_group(membership_id):
+    """Remove one group membership."""
+    try:
+        iam_governor.call(get_identity_client().remove_user_from_group, membership_id)
+    except Exception as e:
+        print(f"Error removing group membership {membership_id}: {e}")
+
+
+def remove_user_from_all_groups(user):
+    """Remove every group membership a user has, for users whose memberships were never recorded."""
+    import oci
+
+    try:
+        memberships = oci.pagination.list_call_get_all_results_generator(
+            get_identity_client().list_user_group_memberships, "record", get_tenancy_ocid(),
+            user_id=user["UserId"]
+        )
+        for membership in memberships:
+            remove_user_from_group(membership.id)
+    except Exception as e:
+        print(f"Error listing group memberships of {user['UserName']}: {e}")
+
+
+def delete_cohort_policy(users, max_workers=MAX_IDENTITY_WORKERS):
+    """Delete the cohort policy, memberships and group recorded on the users."""
+    identity_client = get_identity_client()
+    for policy_id in {user["PolicyId"] for user in users if user.get("PolicyId")}:
+        try:
+            iam_governor.call(identity_client.delete_policy, policy_id)
+        except Exception as e:
+            print(f"Error deleting policy {policy_id}: {e}")
+
+    memberships = [user["MembershipId"] for user in users if user.get("MembershipId")]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(remove_user_from_group, memberships))
+
+    for group_id in {user["GroupId"] for user in users if user.get("GroupId")}:
+        try:
+            iam_governor.call(identity_client.delete_group, group_id)
+            print(f"Deleted IAM group: {group_id}")
+        except Exception as e:
+            print(f"Error deleting group {group_id}: {e}")
+
+
+def deploy_service(service_name, user_name):
+    """Simulate the deployment of OCI services."""
+    print(f"Deploying {service_name} for user {user_name}...")
+    if service_name == "Compute Instance":
+        print(f"Simulated Compute Instance deployment for user {user_name}.")
+    elif service_name == "Object Storage Bucket":
+        bucket_name = unique_name(f"user-{user_name}-bucket")
+        print(f"Simulated Object Storage Bucket creation: {bucket_name}.")
+        return bucket_name
+    else:
+        print(f"{service_name} deployment simulation completed.")
+
+
+def delete_iam_user(user):
+    """Delete an IAM user and return True if the delete was accepted."""
+    try:
+        iam_governor.call(get_identity_client().delete_user, user["UserId"])
+        print(f"Deleted IAM user: {user['UserName']}")
+        return True
+    except Exception as e:
+        print(f"Error deleting IAM user {user['UserName']}: {e}")
+        return False
+
+
+def display_iam_details(users):
+    """Display IAM user details with passwords redacted."""
+    print("\nIAM User Details:")
+    print("=" * 50)
+    for user in users[:MAX_DISPLAYED_USERS]:
+        print(f"User Name: {user['UserName']}")
+        print(f"Password: {redact(user['Password'])}")
+        print("=" * 50)
+    print_truncation_note(users)
+
+
+class OCIProvider(CloudProvider):
+    """OCI IAM implementation of the provider interface."""
+
+    name = "oci"
+    label = "OCI"
+    user_label = "IAM users"
+    resource_fields = {"GroupId": "group", "PolicyId": "policy", "MembershipId": "group_membership"}
+    services = SUPPORTED_SERVICES
+
+    def create_user(self, user_name):
+        return create_iam_user(user_name)
+
+    def create_users(self, user_names):
+        users = create_iam_users_async(user_names)
+        for user in users:
+            self.export_credentials(user)
+        return users
+
+    def attach_policy(self, user):
+        assign_cohort_policy([user])
+
+    def attach_policies(self, users):
+        if users:
+            assign_cohort_policy(users)
+
+    def deploy(self, service_name, user):
+        return deploy_service(service_name, user["UserName"])
+
+    def delete(self, user):
+        # Leaves the cohort group and policy in place for the remaining users
+        if user.get("MembershipId"):
+            remove_user_from_group(user["MembershipId"])
+        return delete_iam_user(user)
+
+    def delete_users(self, users):
+        delete_cohort_policy(users)
+        states = delete_iam_users_async(users)
+        return {user_name: state == "DELETED" for user_name, state in states.items()}
+
+    def display(self, users):
+        display_iam_details(users)
+
+    def list_cloud_users(self):
+        return (
+            {"UserName": user.name, "UserId": user.id}
+            for user in iter_users(get_tenancy_ocid())
+            if user.lifecycle_state != "DELETED"
+        )
+
+    def delete_orphans(self, users):
+        # OCI only deletes users that belong to no group
+        with ThreadPoolExecutor(max_workers=MAX_IDENTITY_WORKERS) as executor:
+            list(executor.map(remove_user_from_all_groups, users))
+        delete_iam_users_async(users)
+
+
+def main():
+    run_cli(OCIProvider())
+
+
+if __name__ == "__main__":
+    main()
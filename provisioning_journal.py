@@ -0,0 +1,169 @@
+"""Append-only journal of completed provisioning steps, replayed in reverse to tear resources down.
+
+Multi-step flows (user, login profile, policy, access key) record each step
+as soon as the cloud call returns. Teardown undoes a resource's recorded
+steps newest first and journals every undo, so an interrupted cleanup, or
+a flow that failed halfway, resumes exactly where it stopped.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAX_TEARDOWN_WORKERS = 10
+
+
+class ProvisioningJournal:
+    """Durable record of which provisioning steps are currently in place.
+
+    Every entry is one JSON line, flushed and fsynced before `record()`
+    returns, so a step is never lost once the call that created it has
+    been journaled. The file is opened and replayed on first use only.
+    Step details must not contain secrets.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._steps = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Replay the journal into {resource: {step: details}} of the steps still in place."""
+        if self._steps is not None:
+            return
+        self._steps = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write; everything before it is intact
+                        continue
+                    self._apply(entry)
+        self._file = open(self.path, "a")
+
+    def _apply(self, entry):
+        steps = self._steps.setdefault(entry["resource"], {})
+        if entry["event"] == "done":
+            steps[entry["step"]] = entry.get("details", {})
+        else:
+            steps.pop(entry["step"], None)
+        if not steps:
+            del self._steps[entry["resource"]]
+
+    def _append(self, entry):
+        with self._lock:
+            self._load()
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(entry)
+
+    def record(self, resource, step, **details):
+        """Journal that `step` has been completed for `resource`."""
+        self._append({"resource": resource, "step": step, "event": "done", "details": details,
+                      "time": time.time()})
+
+    def record_undone(self, resource, step):
+        """Journal that `step` has been undone for `resource`."""
+        self._append({"resource": resource, "step": step, "event": "undone", "time": time.time()})
+
+    def completed_steps(self, resource):
+        """Return the `(step, details)` pairs still in place for a resource, oldest first."""
+        with self._lock:
+            self._load()
+            return list(self._steps.get(resource, {}).items())
+
+    def resources(self):
+        """Return the resources that still have steps in place."""
+        with self._lock:
+            self._load()
+            return list(self._steps)
+
+    def compact(self):
+        """Rewrite the journal with only the steps still in place."""
+        with self._lock:
+            self._load()
+            temp_file = f"{self.path}.tmp"
+            with open(temp_file, "w") as f:
+                for resource, steps in self._steps.items():
+                    for step, details in steps.items():
+                        f.write(json.dumps({"resource": resource, "step": step, "event": "done",
+                                            "details": details}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(temp_file, self.path)
+            self._file = open(self.path, "a")
+
+
+def teardown_resource(journal, resource, undo_actions, fallback_steps=()):
+    """Undo a resource's completed steps newest first and return True once none are left.
+
+    `undo_actions` maps a step name to `undo(resource, details)`, which must
+    treat an already-missing resource as success so replays are harmless.
+    `fallback_steps` is used for resources created before they were
+    journaled. The first failing step stops the teardown; it and the
+    steps before it stay journaled for the next attempt.
+    """
+    steps = journal.completed_steps(resource) or list(fallback_steps)
+    return undo_steps(journal, resource, steps, undo_actions)
+
+
+def undo_steps(journal, resource, steps, undo_actions):
+    """Undo the given `(step, details)` pairs of a resource newest first; return True if all were undone.
+
+    Failed provisioning attempts pass only the steps they completed
+    themselves, so a live resource of the same name that belongs to
+    another cohort is never touched.
+    """
+    for step, details in reversed(steps):
+        try:
+            undo_actions[step](resource, details)
+        except Exception as e:
+            print(f"Error undoing {step} for {resource}: {e}")
+            return False
+        journal.record_undone(resource, step)
+    return True
+
+
+def teardown_resources(journal, resources, undo_actions, fallback_steps=None,
+                       max_workers=MAX_TEARDOWN_WORKERS):
+    """Tear down many resources concurrently and return {resource: torn down}.
+
+    `fallback_steps` optionally maps a resource to the steps to undo when
+    the journal has no record of it.
+    """
+    fallback_steps = fallback_steps or {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # Undo actions run in the caller's context, so context-scoped settings reach the workers
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run,
+                teardown_resource, journal, resource, undo_actions, fallback_steps.get(resource, ())
+            ): resource
+            for resource in resources
+        }
+        results = {futures[future]: future.result() for future in as_completed(futures)}
+    journal.compact()
+    return results
+
+
+def roll_back_attempts(journal, attempts, undo_actions, max_workers=MAX_TEARDOWN_WORKERS):
+    """Undo failed provisioning attempts concurrently and return {resource: rolled back}.
+
+    `attempts` maps a resource to the steps that attempt completed; the
+    journal is not consulted, so steps recorded by other cohorts stay put.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(
+                contextvars.copy_context().run, undo_steps, journal, resource, steps, undo_actions
+            ): resource
+            for resource, steps in attempts.items()
+        }
+        return {futures[future]: future.result() for future in as_completed(futures)}
@@ -0,0 +1,156 @@
+"""Client-side rate limiting shared by the provider modules."""
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow `rate` requests per second on average, with bursts of up to `capacity`.
+
+    Threads calling `acquire()` block until a token is free, so a pool of
+    workers sharing one bucket stays under a provider's QPS quota as a whole.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Error codes the provider SDKs use for request throttling
+THROTTLING_ERROR_CODES = {
+    # AWS
+    "Throttling", "ThrottlingException", "RequestLimitExceeded", "TooManyRequestsException",
+    # Alibaba Cloud
+    "Throttling.User", "Throttling.Api", "Throttling.Resource", "ServiceUnavailable",
+    # OCI, Azure, GCP
+    "TooManyRequests", "RateLimitExceeded", "rateLimitExceeded", "RESOURCE_EXHAUSTED",
+}
+# HTTP statuses that mean "slow down" whatever the SDK
+THROTTLING_STATUSES = {429, 503}
+
+# Adaptive concurrency settings
+INITIAL_CONCURRENCY = 8
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 64
+CONCURRENCY_DECREASE_FACTOR = 0.5
+MAX_THROTTLE_RETRIES = 6
+THROTTLE_BASE_DELAY = 0.5  # Seconds; doubled on every retry
+
+
+def get_error_code(error):
+    """Return the error code an SDK exception carries (boto3, Alibaba Cloud, OCI, Azure), if any."""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    get_code = getattr(error, "get_error_code", None)
+    if callable(get_code):
+        return get_code()
+    code = getattr(error, "code", None)
+    return code if isinstance(code, str) else None
+
+
+def get_http_status(error):
+    """Return the HTTP status of a failed SDK call, if the exception carries one."""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    get_status = getattr(error, "get_http_status", None)
+    if callable(get_status):
+        return get_status()
+    # OCI ServiceError.status, Azure HttpResponseError.status_code,
+    # IBM ApiException.code, googleapiclient HttpError.resp.status
+    for value in (getattr(error, "status", None), getattr(error, "status_code", None),
+                  getattr(error, "code", None), getattr(getattr(error, "resp", None), "status", None)):
+        if isinstance(value, int):
+            return value
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+    return None
+
+
+def is_throttling_error(error):
+    """Return True if any provider SDK rejected a call because of request throttling."""
+    if error is None:
+        return False
+    return get_error_code(error) in THROTTLING_ERROR_CODES or get_http_status(error) in THROTTLING_STATUSES
+
+
+class ConcurrencyGovernor:
+    """Cap in-flight calls to a provider, adapting the cap with AIMD.
+
+    Every successful call raises the limit by about one per limit's worth
+    of calls (additive increase); a throttled call halves it
+    (multiplicative decrease). Calls that were already in flight when the
+    limit was cut do not cut it again, so one burst of throttling counts
+    once. Workers can then be pooled generously: the governor settles on
+    the highest concurrency the provider sustains.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY, maximum=MAX_CONCURRENCY,
+                 decrease_factor=CONCURRENCY_DECREASE_FACTOR, max_retries=MAX_THROTTLE_RETRIES,
+                 base_delay=THROTTLE_BASE_DELAY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.in_flight = 0
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a slot is free, take it and return the call's start time."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, throttled=False):
+        """Free a slot and adjust the limit by the call's outcome."""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def call(self, operation, *args, **kwargs):
+        """Call `operation` inside a slot, retrying with jittered exponential backoff on throttling."""
+        for attempt in range(self.max_retries + 1):
+            started = self.acquire()
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                self.release(started, throttled)
+                if not throttled or attempt == self.max_retries:
+                    raise
+                # Back off outside the slot so other calls can still use it
+                delay = self.base_delay * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+                continue
+            self.release(started)
+            return result
@@ -0,0 +1,100 @@
+"""Find principals that exist in a cloud but not in the inventory, and delete them.
+
+Listing is streamed page by page and compared against the set of IDs the
+inventory expects, so memory stays flat however many principals the
+account holds. Only principals named like this tool's users
+(`user-N`, `user-<cohort token>-N`, `sa-N`, ...) are considered. Do not run it while a cohort is
+being provisioned: users that exist but are not yet recorded would be
+treated as orphans.
+
+    python reconciler.py aws --dry-run
+    python reconciler.py gcp oci
+"""
+import argparse
+
+from inventory_store import DEFAULT_INVENTORY_FILE, InventoryStore
+from multi_cloud_orchestrator import PROVIDER_MODULES, load_provider
+
+# Orphans are deleted in batches of this size while the listing continues
+ORPHAN_BATCH_SIZE = 100
+
+
+def reconcile(provider, inventory, dry_run=False, batch_size=ORPHAN_BATCH_SIZE):
+    """Diff a provider's principals against the inventory and return a summary of the drift.
+
+    Orphans (in the cloud, not in the inventory) are deleted through the
+    provider's parallel teardown. Stale inventory entries (recorded as live
+    but no longer in the cloud) are marked deleted once the listing finishes.
+    Every inventory provider name that records users of the listed account
+    (`aws` and the fan-out's `aws:<account id>`) counts as expected.
+    """
+    field = provider.reconcile_field or provider.user_id_field
+    resource_type = provider.reconcile_resource_type
+    # Resource ID -> the inventory provider name it is recorded under
+    expected = {
+        resource["resource_id"]: name
+        for name in provider.inventory_providers()
+        for resource in inventory.live_resources(name, resource_type=resource_type)
+    }
+    unseen = set(expected)
+    summary = {"listed": 0, "managed": 0, "orphans": 0, "stale": 0}
+    batch = []
+
+    def flush():
+        if batch and not dry_run:
+            provider.delete_orphans(list(batch))
+        batch.clear()
+
+    for user in provider.list_cloud_users():
+        summary["listed"] += 1
+        resource_id = user[field]
+        # Checked before the naming filter: cohorts with a custom prefix are still ours and still live
+        if resource_id in expected:
+            unseen.discard(resource_id)
+            summary["managed"] += 1
+            continue
+        if not provider.is_managed(user):
+            continue
+        summary["managed"] += 1
+        summary["orphans"] += 1
+        print(f"Orphaned {provider.label} principal: {resource_id}")
+        batch.append(user)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    summary["stale"] = len(unseen)
+    if unseen and not dry_run:
+        stale = {}
+        for resource_id in unseen:
+            stale.setdefault(expected[resource_id], set()).add(resource_id)
+        for name, resource_ids in stale.items():
+            inventory.mark_deleted(name, resource_type, resource_ids)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete cloud principals missing from the inventory.")
+    parser.add_argument("providers", nargs="+", choices=sorted(PROVIDER_MODULES))
+    parser.add_argument("--inventory", default=DEFAULT_INVENTORY_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting them")
+    args = parser.parse_args()
+
+    inventory = InventoryStore(args.inventory)
+    for name in args.providers:
+        provider = load_provider(name)
+        try:
+            summary = reconcile(provider, inventory, args.dry_run)
+        except NotImplementedError:
+            print(f"{provider.label} does not support listing its {provider.user_label}; skipped.")
+            continue
+        except Exception as e:
+            print(f"Error reconciling {provider.label}: {e}")
+            continue
+        action = "found" if args.dry_run else "deleted"
+        print(f"{provider.label}: listed {summary['listed']}, managed {summary['managed']}, "
+              f"orphans {action} {summary['orphans']}, stale inventory entries {summary['stale']}.")
+
+
+if __name__ == "__main__":
+    main()
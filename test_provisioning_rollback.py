@@ -0,0 +1,73 @@
+"""Regression tests: a failed create rolls back only what that attempt made, never another cohort's users."""
+import contextlib
+import io
+
+import aws_service_selector as aws
+from fake_clouds import FakeAcsClient, FakeClientError, StubIAMClient, install_fake_ram_requests
+from provisioning_journal import ProvisioningJournal
+from rate_limiter import ConcurrencyGovernor
+
+install_fake_ram_requests()
+import alibaba_ram_service_simulation as alibaba  # noqa: E402
+
+
+def quietly(func, *args, **kwargs):
+    """Call `func` with its console output suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def use_stub_iam(monkeypatch, tmp_path):
+    client = StubIAMClient(latency=0)
+    monkeypatch.setattr(aws, "get_iam_client", lambda: client)
+    monkeypatch.setattr(aws, "iam_governor", ConcurrencyGovernor(base_delay=0))
+    monkeypatch.setattr(aws, "provisioning_journal", ProvisioningJournal(str(tmp_path / "aws.jsonl")))
+    return client
+
+
+def use_fake_ram(monkeypatch, tmp_path):
+    client = FakeAcsClient(latency=0)
+    monkeypatch.setattr(alibaba, "get_acs_client", lambda: client)
+    monkeypatch.setattr(alibaba, "provisioning_journal", ProvisioningJournal(str(tmp_path / "alibaba.jsonl")))
+    return client
+
+
+def test_existing_iam_users_survive_a_second_cohort(monkeypatch, tmp_path):
+    client = use_stub_iam(monkeypatch, tmp_path)
+    first = quietly(aws.create_iam_users_concurrently, ["user-1", "user-2"], "123456789012")
+    second = quietly(aws.create_iam_users_concurrently, ["user-1", "user-2", "user-3"], "123456789012")
+
+    assert all(first.values())
+    assert second["user-1"] is None and second["user-2"] is None and second["user-3"]
+    assert sorted(client.users) == ["user-1", "user-2", "user-3"]
+    assert client.users["user-1"]["AccessKeys"] == [first["user-1"]["AccessKeyId"]]
+
+
+def test_failed_iam_create_rolls_back_its_own_steps(monkeypatch, tmp_path):
+    client = use_stub_iam(monkeypatch, tmp_path)
+
+    def refuse_access_key(UserName):
+        raise FakeClientError("LimitExceeded", "CreateAccessKey")
+
+    monkeypatch.setattr(client, "create_access_key", refuse_access_key)
+    assert quietly(aws.create_iam_user, "user-1", "123456789012") is None
+    assert client.users == {}
+    assert aws.provisioning_journal.resources() == []
+
+
+def test_existing_ram_users_survive_a_second_cohort(monkeypatch, tmp_path):
+    client = use_fake_ram(monkeypatch, tmp_path)
+    first = quietly(alibaba.provision_ram_users_pipelined, ["user-1", "user-2"])
+    second = quietly(alibaba.provision_ram_users_pipelined, ["user-1", "user-2"])
+
+    assert all(first.values())
+    assert not any(second.values())
+    assert sorted(client.users) == ["user-1", "user-2"]
+    assert client.users["user-1"]["AccessKeys"] == [first["user-1"]["AccessKeyId"]]
+
+
+def test_existing_ram_user_survives_sequential_create(monkeypatch, tmp_path):
+    client = use_fake_ram(monkeypatch, tmp_path)
+    assert quietly(alibaba.create_ram_user, "user-1")
+    assert quietly(alibaba.create_ram_user, "user-1") is None
+    assert list(client.users) == ["user-1"]